@@ -0,0 +1,120 @@
+"""Detail-window auto-refresh: one thread + socket per refresh against the shared ProbeScheduler.
+
+Starts `servers` local UDP responders and "opens a detail window" on each for `seconds`
+seconds at a 0.5 s refresh interval, once the old way (every tick starts a Thread that
+calls udp_command, i.e. a new socket) and once through qwcore.ProbeScheduler. Reports
+probes answered, threads and sockets created, and the CPU time used by the process.
+Halfway through, a simulated full scan reports fresh results for every server, which
+the scheduler uses to skip the refreshes the old code would have sent anyway.
+Usage: python benchmarks/bench_detail_refresh.py [servers] [seconds]
+"""
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qwcore
+
+INTERVAL = 0.5
+REPLY = b'\xff\xff\xff\xffn\\hostname\\bench\\map\\dm4\n1 5 10 25 "player" "base" 4 4 "red"\n\x00'
+
+
+def start_responders(count):
+    sockets = []
+    for _ in range(count):
+        responder = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        responder.bind(('127.0.0.1', 0))
+        sockets.append(responder)
+
+    def serve(responder):
+        while True:
+            try: _, addr = responder.recvfrom(2048)
+            except OSError: return
+            responder.sendto(REPLY, addr)
+
+    for responder in sockets: threading.Thread(target=serve, args=(responder,), daemon=True).start()
+    return sockets, [('127.0.0.1', responder.getsockname()[1]) for responder in sockets]
+
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.results = self.threads = self.sockets = 0
+        self._thread_start, self._socket_init = threading.Thread.start, socket.socket.__init__
+
+    def __enter__(self):
+        counters = self
+
+        def counting_start(thread):
+            with counters.lock: counters.threads += 1
+            counters._thread_start(thread)
+
+        def counting_init(sock, *args, **kwargs):
+            with counters.lock: counters.sockets += 1
+            counters._socket_init(sock, *args, **kwargs)
+
+        threading.Thread.start, socket.socket.__init__ = counting_start, counting_init
+        return self
+
+    def __exit__(self, *exc_info):
+        threading.Thread.start, socket.socket.__init__ = self._thread_start, self._socket_init
+
+    def result(self, *args):
+        with self.lock: self.results += 1
+
+
+def run_threaded(keys, seconds, counters):
+    def refresh(key):
+        err, response, ping_time = qwcore.udp_command(key[0], key[1], 'status 31\0')
+        if err is None: qwcore.parse_status_response(response)
+        counters.result()
+
+    threads, deadline = [], time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for key in keys:
+            thread = threading.Thread(target=refresh, args=(key,))
+            thread.start()
+            threads.append(thread)
+        time.sleep(INTERVAL)
+    # Refreshes still waiting for a reply would otherwise open their sockets during the next measurement.
+    for thread in threads: thread.join()
+
+
+def run_scheduler(keys, seconds, counters):
+    def on_result(key, err, response, ping_time):
+        if err is None: qwcore.parse_status_response(response)
+        counters.result()
+
+    stop_event = threading.Event()
+    scheduler = qwcore.ProbeScheduler(on_result, stop_event).start()
+    for key in keys: scheduler.watch(key, INTERVAL)
+    time.sleep(seconds / 2)
+    for key in keys: scheduler.note_result(key)
+    time.sleep(seconds / 2)
+    stop_event.set()
+    scheduler.close()
+    scheduler.join()
+
+
+def measure(name, runner, keys, seconds):
+    time.sleep(1.0)
+    with Counters() as counters:
+        cpu_start = time.process_time()
+        runner(keys, seconds, counters)
+        cpu = time.process_time() - cpu_start
+    print(f"  {name:<22} {counters.results:>8} {counters.threads:>8} {counters.sockets:>8} {cpu * 1e3:>9.0f}")
+
+
+def run(servers, seconds):
+    responders, keys = start_responders(servers)
+    print(f"{servers} detail windows, {seconds}s at {INTERVAL}s intervals:")
+    print(f"  {'':<22} {'results':>8} {'threads':>8} {'sockets':>8} {'CPU ms':>9}")
+    measure('thread per refresh', run_threaded, keys, seconds)
+    measure('ProbeScheduler', run_scheduler, keys, seconds)
+    for responder in responders: responder.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20, float(sys.argv[2]) if len(sys.argv) > 2 else 6.0)
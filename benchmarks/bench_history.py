@@ -0,0 +1,86 @@
+"""Write throughput and query latency of the SQLite ping history (qwhistory.PingHistoryStore).
+
+Fills a scratch database with `servers` servers probed every 10 minutes for `days` days
+(a few named players per answered probe) through the batched writer thread, then times
+the history queries and prints the query plan of each, to show they are answered from
+the rollup primary keys / indexes rather than by scanning the probes table.
+Usage: python benchmarks/bench_history.py [servers] [days]
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qwcore
+import qwhistory
+
+PROBE_INTERVAL_S = 600
+
+
+def synthetic_record(server, step):
+    if (server + step) % 11 == 0:
+        return qwcore.ServerRecord(f'10.1.{server // 256}.{server % 256}', 27500, f'server {server}', error=qwcore.ProbeError.TIMEOUT, error_detail='timeout', ping_stats={'loss': 100.0})
+    players = tuple(qwcore.PlayerRecord(j, j * 3, 10, 25, f'player{(server * 7 + j) % 500}') for j in range((server + step // 6) % 6))
+    return qwcore.ServerRecord(
+        f'10.1.{server // 256}.{server % 256}', 27500, f'server {server}', ping=20.0 + (server + step) % 40, map_name='dm4',
+        players_count=len(players), spectators_count=0, players=players, ping_stats={'loss': 0.0}
+    )
+
+
+def timed_ms(func, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def run(servers, days):
+    directory = tempfile.mkdtemp(prefix='bench_history_')
+    try:
+        path = os.path.join(directory, 'history.sqlite3')
+        store = qwhistory.PingHistoryStore(path, raw_retention_days=days + 1)
+        now = time.time()
+        steps = days * 86400 // PROBE_INTERVAL_S
+        start = time.perf_counter()
+        for step in range(steps):
+            ts = now - (steps - step) * PROBE_INTERVAL_S
+            for server in range(servers): store.record(synthetic_record(server, step), ts)
+        store.flush()
+        elapsed = time.perf_counter() - start
+        total = servers * steps
+        print(f"wrote {total} probes ({servers} servers x {days} days) in {elapsed:.2f}s: {total / elapsed:,.0f} probes/s, "
+              f"database {os.path.getsize(path) / 1e6:.1f} MB (+ WAL)")
+
+        key = ('10.1.0.5', 27500)
+        queries = [
+            ("average ping, one server, 24 h", lambda: store.average_ping(key, 24, now)),
+            ("average ping, all servers, 24 h", lambda: store.average_pings(24, now)),
+            ("peak player hours, one server, 30 d", lambda: store.peak_player_hours(key, 30, 3, now)),
+            ("raw ping series, one server, 24 h", lambda: store.ping_series(key, 24, now)),
+            ("player sightings, 7 d", lambda: store.player_sightings('player42', 7, now)),
+        ]
+        for name, query in queries: print(f"  {name:<38} {timed_ms(query):8.3f} ms")
+
+        connection = sqlite3.connect(path)
+        day_ago = now - 86400
+        plans = [
+            ('average_ping', 'SELECT sum(rtt_sum), sum(answered) FROM rollup_hourly WHERE server_id = ? AND bucket >= ?', (1, day_ago)),
+            ('average_pings', 'SELECT server_id, sum(rtt_sum) / sum(answered) FROM rollup_hourly INDEXED BY rollup_hourly_bucket WHERE bucket >= ? GROUP BY server_id', (day_ago,)),
+            ('ping_series', 'SELECT ts, rtt, loss FROM probes WHERE server_id = ? AND ts >= ? ORDER BY ts', (1, day_ago)),
+            ('player_sightings', 'SELECT p.server_id, max(p.ts) FROM probe_players pp JOIN probes p ON p.id = pp.probe_id WHERE pp.name = ? AND p.ts >= ? GROUP BY p.server_id', ('x', day_ago)),
+        ]
+        for name, sql, params in plans:
+            print(f"  plan {name}: " + '; '.join(row[-1] for row in connection.execute('EXPLAIN QUERY PLAN ' + sql, params)))
+        connection.close()
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100, int(sys.argv[2]) if len(sys.argv) > 2 else 7)
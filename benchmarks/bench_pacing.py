@@ -0,0 +1,80 @@
+"""Unpaced burst against ProbePacer pacing on a congested path.
+
+Emulates a bottleneck on loopback: `hosts` addresses (127.0.1.x) with `ports` servers
+each, all answered by one responder thread that spends SERVICE_US per datagram and
+whose sockets have small receive buffers, so a burst overflows them the way a router
+queue or a socket buffer would. Every server is alive, so every timeout is a false one.
+Scans the whole set with scan_servers unpaced and paced at a few rates, reporting false
+timeouts, the median / p95 of the per-server median RTT, scan time and the pacer stats.
+Linux only (binds 127.0.1.x). Usage: python benchmarks/bench_pacing.py [hosts] [ports]
+"""
+import os
+import selectors
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qwcore
+
+SERVICE_US = 400
+RESPONDER_RCVBUF = 8192
+REPLY = b'\xff\xff\xff\xffn\\hostname\\bench\\map\\dm4\n\x00'
+
+
+def start_responder(hosts, ports):
+    selector = selectors.DefaultSelector()
+    endpoints = []
+    for host in range(1, hosts + 1):
+        for port in range(27500, 27500 + ports):
+            responder = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            responder.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RESPONDER_RCVBUF)
+            responder.bind((f'127.0.1.{host}', port))
+            responder.setblocking(False)
+            selector.register(responder, selectors.EVENT_READ)
+            endpoints.append((f'127.0.1.{host}', port))
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            for key, _ in selector.select(0.1):
+                try: _, addr = key.fileobj.recvfrom(2048)
+                except BlockingIOError: continue
+                deadline = time.perf_counter() + SERVICE_US / 1e6
+                while time.perf_counter() < deadline: pass
+                key.fileobj.sendto(REPLY, addr)
+        for key in list(selector.get_map().values()): key.fileobj.close()
+        selector.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return endpoints, stop
+
+
+def scan(endpoints, pacer):
+    start = time.perf_counter()
+    results = qwcore.scan_servers(endpoints, 'status 31\0', 1.0, probes=3, pacer=pacer)
+    elapsed = time.perf_counter() - start
+    timeouts = sum(1 for err, _, _, _ in results.values() if err)
+    lost = sum(stats['sent'] - stats['received'] for _, _, _, stats in results.values() if stats)
+    pings = sorted(ping for _, _, ping, _ in results.values() if ping is not None)
+    p95 = pings[int(0.95 * (len(pings) - 1))] if pings else float('nan')
+    return timeouts, lost, statistics.median(pings) if pings else float('nan'), p95, elapsed
+
+
+def run(hosts, ports):
+    endpoints, stop = start_responder(hosts, ports)
+    print(f"{len(endpoints)} servers on {hosts} hosts, 3 probes each, bottleneck {1e6 / SERVICE_US:.0f} datagrams/s")
+    print(f"  {'pacing':<22} {'timeouts':>9} {'lost':>6} {'median ms':>10} {'p95 ms':>8} {'scan s':>7}")
+    for name, pacer in [('none (burst)', None), ('1000/s, 25/s per IP', qwcore.ProbePacer(1000)),
+                        ('2000/s, 25/s per IP', qwcore.ProbePacer(2000)), ('2000/s, 200/s per IP', qwcore.ProbePacer(2000, per_ip_rate=200, per_ip_burst=20))]:
+        time.sleep(1.5)
+        timeouts, lost, median, p95, elapsed = scan(endpoints, pacer)
+        print(f"  {name:<22} {timeouts:>9} {lost:>6} {median:>10.2f} {p95:>8.2f} {elapsed:>7.2f}")
+        if pacer is not None: print(f"    {pacer.describe()}")
+    stop.set()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
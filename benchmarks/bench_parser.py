@@ -0,0 +1,111 @@
+"""Microbenchmark of the status-reply parser: the previous implementation vs the current one.
+
+Replays every benchmarks/data/*.bin status reply (raw UDP payloads of 'status 31',
+header included) through the old byte-by-byte quake_chars + per-line re.match parser
+and through qwcore.parse_status_response, eager and with lazy player lines.
+
+    python benchmarks/bench_parser.py [iterations]
+    python benchmarks/bench_parser.py --record host:port [name]   # capture a live reply into benchmarks/data
+"""
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qwcore
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def legacy_quake_chars(data):
+    data = bytearray(data)
+    for i in range(len(data)):
+        if 31 < data[i] < 127: continue
+        if 143 < data[i] < 255: data[i] = data[i] - 128
+        if data[i] in qwcore.CHARSET: data[i] = qwcore.CHARSET[data[i]]
+    return data
+
+
+def legacy_isNaN(value):
+    try: int(value); return False
+    except ValueError: return True
+
+
+def legacy_parse_status_response(data):
+    try:
+        data_after_quake_chars = legacy_quake_chars(data).decode('ascii', errors='ignore')
+        lines = data_after_quake_chars[6:-2].split('\n')
+        server_info = {}
+        players = []
+        if lines:
+            first_line_raw = lines.pop(0)
+            tmp_parts = [part for part in first_line_raw.split('\\') if part]
+            i = 0
+            while i < len(tmp_parts) - 1:
+                key_candidate, value_candidate = tmp_parts[i], tmp_parts[i+1]
+                if key_candidate == 'hostname' and 'hostname' not in server_info: server_info['hostname'] = value_candidate; i += 2; continue
+                elif key_candidate == 'map' and 'map' not in server_info: server_info['map'] = value_candidate; i += 2; continue
+                elif key_candidate == 'mode' and 'mode' not in server_info: server_info['mode'] = value_candidate; i += 2; continue
+                elif value_candidate == 'hostname' and 'hostname' not in server_info: server_info['hostname'] = key_candidate; i += 2; continue
+                elif value_candidate == 'map' and 'map' not in server_info: server_info['map'] = key_candidate; i += 2; continue
+                elif value_candidate == 'mode' and 'mode' not in server_info: server_info['mode'] = key_candidate; i += 2; continue
+                try: server_info[key_candidate] = value_candidate if legacy_isNaN(value_candidate) else int(value_candidate)
+                except ValueError: pass
+                i += 2
+        for p_line in lines:
+            if not p_line.strip(): continue
+            match = re.match(r'^(-?\d+)\s+(-?[S\d]+)\s+(-?\d+)\s+(-?\d+)\s*\s*"(.*?)"\s*"(.*?)"\s*(\d+)\s*(\d+)(?:\s"(.*?)"|$)', p_line)
+            if match:
+                try:
+                    player_info = {
+                        'id': int(match.group(1)), 'frags': match.group(2) if match.group(2) == 'S' else int(match.group(2)),
+                        'time': int(match.group(3)), 'ping': int(match.group(4)), 'name': match.group(5),
+                        'skin': match.group(6), 'topcolor': int(match.group(7)), 'bottomcolor': int(match.group(8)),
+                        'team': match.group(9) if match.group(9) is not None else ''
+                    }
+                    players.append(player_info)
+                except (ValueError, TypeError): pass
+        server_info['players'] = players
+        return server_info
+    except Exception as e: return {"error": f"parse error: {str(e)}"}
+
+
+def per_call_us(func, payload, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations): func(payload)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def check(name, payload):
+    old, new = legacy_parse_status_response(payload), qwcore.parse_status_response(payload)
+    if old['players'] != new['players'] or any(new.get(key) != old.get(key) for key in qwcore.STATUS_TEXT_KEYS):
+        print(f"  ! {name}: parsers disagree on players/hostname/map/mode")
+
+
+def run(iterations):
+    paths = sorted(glob.glob(os.path.join(DATA_DIR, '*.bin')))
+    print(f"{'reply':<24} {'bytes':>6} {'legacy (us)':>12} {'current (us)':>13} {'lazy (us)':>10} {'speedup':>8}")
+    for path in paths:
+        name = os.path.basename(path)
+        with open(path, 'rb') as f: payload = f.read()
+        check(name, payload)
+        legacy = per_call_us(legacy_parse_status_response, payload, iterations)
+        current = per_call_us(qwcore.parse_status_response, payload, iterations)
+        lazy = per_call_us(lambda data: qwcore.parse_status_response(data, parse_players=False), payload, iterations)
+        print(f"{name:<24} {len(payload):>6} {legacy:>12.1f} {current:>13.1f} {lazy:>10.1f} {legacy / current:>7.1f}x")
+
+
+def record(address, name=None):
+    host, port = qwcore.parse_address_list(address, 27500)[0]
+    err, response, ping_time = qwcore.udp_command(host, port, 'status 31\0', 2.0)
+    if err: print(f"No reply from {host}:{port}: {err['error']}"); return
+    path = os.path.join(DATA_DIR, f"status_{name or f'{host}_{port}'}.bin")
+    with open(path, 'wb') as f: f.write(response)
+    print(f"Recorded {len(response)} bytes ({ping_time:.1f} ms) to {path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--record': record(*sys.argv[2:4])
+    else: run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
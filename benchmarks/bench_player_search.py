@@ -0,0 +1,65 @@
+"""Players tab search: the old per-keystroke linear scan + sort against qwcore.PlayerSearchIndex.
+
+Builds `rows` synthetic player rows (QW style names, some with colour markup or
+high-bit characters) and "types" a few queries one character at a time. The old way
+lowercases every name and re-sorts the matches on each keystroke; the index is built
+once and then narrows the previous matches as the query grows; the matches are put in
+display order by walking the sorted row list. Reports the build time and the worst and
+total time per typed query (filtering only, no Tk).
+Usage: python benchmarks/bench_player_search.py [rows]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qwcore
+
+STEMS = ['milton', 'ParadokS', 'bps', 'rikoll', 'Spike', 'xantom', 'bogojoker', 'Andeh', 'grisling', 'carapace']
+DECORATIONS = ['{}', '&cf00{}&r', '\x90{}\x91', '{}\x8d', '\xcd\xe9\xec{}']
+QUERIES = ['milton', 'paradoks', 'zzz', '[mil']
+
+
+def build_rows(count):
+    random.seed(7)
+    return [{'player_name': random.choice(DECORATIONS).format(random.choice(STEMS) + str(random.randint(0, 9999))),
+             'server_name': f'server {random.randint(0, count // 15)}'} for _ in range(count)]
+
+
+def linear(rows, search_term):
+    filtered = [p_data for p_data in rows if not search_term or search_term.lower() in p_data.get('player_name', '').lower()]
+    filtered.sort(key=lambda x: (str(x.get('server_name', '')).lower(), str(x.get('player_name', '')).lower()))
+    return filtered
+
+
+def typed(query): return [query[:length] for length in range(1, len(query) + 1)]
+
+
+def run(count):
+    rows = build_rows(count)
+    rows.sort(key=lambda x: (x['server_name'].lower(), x['player_name'].lower()))
+    start = time.perf_counter()
+    index = qwcore.PlayerSearchIndex((position, row['player_name']) for position, row in enumerate(rows))
+
+    def indexed(term):
+        matches = index.search(term)
+        return [row for position, row in enumerate(rows) if position in matches]
+
+    print(f"{count} player rows, index built in {(time.perf_counter() - start) * 1e3:.0f} ms")
+    print(f"  {'query':<10} {'matches':>8} {'linear worst':>13} {'total':>8} {'index worst':>12} {'total':>8}   (ms per keystroke)")
+    for query in QUERIES:
+        results = {}
+        for name, search in (('linear', lambda term: linear(rows, term)), ('index', indexed)):
+            times = []
+            for prefix in typed(query):
+                start = time.perf_counter()
+                matches = search(prefix)
+                times.append((time.perf_counter() - start) * 1e3)
+            results[name] = (len(matches), max(times), sum(times))
+        print(f"  {query!r:<10} {results['index'][0]:>8} {results['linear'][1]:>13.1f} {results['linear'][2]:>8.1f} {results['index'][1]:>12.1f} {results['index'][2]:>8.1f}")
+    print("linear matches the raw text only; the index also matches colour-coded and high-bit spellings ('[mil' finds the bracketed names).")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
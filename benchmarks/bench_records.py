@@ -0,0 +1,86 @@
+"""Compares the old per-server dicts with ServerRecord/PlayerRecord.
+
+Builds the same synthetic server list both ways (dicts shaped like servers_cache.json,
+numbers stored as strings and 'N/A' for missing values) and reports the memory held
+per server (tracemalloc) and the cost of the ping filter + sort done by
+_repopulate_all_trees. Usage: python benchmarks/bench_records.py [sizes...]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qwcore
+
+
+MAPS = ('dm2', 'dm4', 'dm6', 'e1m2', 'aerowalk', 'ztndm3')
+TEAMS = ('red', 'blue', '')
+
+
+def legacy_server(i):
+    players = [
+        {'id': j, 'frags': 'S' if j == 7 else (i * j) % 40, 'time': 12, 'ping': 20 + j, 'name': f'player{i}_{j}',
+         'skin': 'base', 'topcolor': 4, 'bottomcolor': 4, 'team': TEAMS[j % 3]}
+        for j in range(i % 9)
+    ]
+    ping = 'N/A' if i % 10 == 0 else ('Error: timeout' if i % 10 == 1 else f'{20 + i % 180}.{i % 100:02d}')
+    players_count = 'N/A' if ping == 'N/A' or ping.startswith('Error') else len(players)
+    return {
+        'original_ip': f'10.{i // 65536}.{i // 256 % 256}.{i % 256}', 'display_hostname': f'server {i}', 'port': 27500,
+        'ping': ping, 'map': MAPS[i % len(MAPS)], 'players_count': players_count, 'spectators_count': 0,
+        'players': players if players_count != 'N/A' else [], 'mode': 'ffa'
+    }
+
+
+def measure(build):
+    tracemalloc.start()
+    data = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return data, size
+
+
+def legacy_filter_sort(servers, threshold=80.0):
+    rows = []
+    for data in servers:
+        try:
+            ping_value = float(data['ping'])
+        except ValueError:
+            ping_value = float('inf')
+        players_count = int(data['players_count']) if data['players_count'] != 'N/A' else -1
+        if ping_value <= threshold: rows.append((ping_value, players_count, data))
+    rows.sort(key=lambda x: (x[0], -x[1]))
+    return rows
+
+
+def record_filter_sort(servers, threshold=80.0):
+    rows = []
+    for data in servers:
+        ping_value = qwcore.ping_sort_value(data)
+        players_count = data.players_count if data.players_count is not None else -1
+        if ping_value <= threshold: rows.append((ping_value, players_count, data))
+    rows.sort(key=lambda x: (x[0], -x[1]))
+    return rows
+
+
+def timed(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes):
+    print(f"{'servers':>8} {'dict B/server':>14} {'record B/server':>16} {'dict sort (ms)':>15} {'record sort (ms)':>17}")
+    for size in sizes:
+        dicts, dict_bytes = measure(lambda: [legacy_server(i) for i in range(size)])
+        records, record_bytes = measure(lambda: [qwcore.ServerRecord.from_dict(legacy_server(i)) for i in range(size)])
+        dict_time, record_time = timed(legacy_filter_sort, dicts), timed(record_filter_sort, records)
+        print(f"{size:>8} {dict_bytes / size:>14.0f} {record_bytes / size:>16.0f} {dict_time * 1e3:>15.2f} {record_time * 1e3:>17.2f}")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
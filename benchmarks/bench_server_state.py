@@ -0,0 +1,106 @@
+"""Probe-result stores under one shared lock against ServerStateStore snapshots.
+
+A "GUI" thread keeps rebuilding sorted rows from all `servers` records, as
+sort_column_by does, while a "probe" thread stores `results` probe results. With the
+shared lock the GUI holds it for the whole loop and the prober waits on it; with the
+store the GUI works on a snapshot and the prober only publishes. Reports how long the
+prober waited per result (median / p99 / max), the results stored and GUI passes done
+per second, then the cost of publishing one result by copying a plain dict against
+RecordMap.changed().
+Usage: python benchmarks/bench_server_state.py [servers] [results]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qwcore
+
+
+def make_records(count):
+    return {
+        (f'10.{i // 62500}.{i // 250 % 250}.{i % 250}', 27500): qwcore.ServerRecord(
+            f'10.{i // 62500}.{i // 250 % 250}.{i % 250}', 27500, f'server {i}', 20.0 + i % 80, map_name='dm4', players_count=i % 5
+        ) for i in range(count)
+    }
+
+
+def gui_pass(records):
+    rows = sorted(records.items(), key=lambda item: qwcore.ping_sort_value(item[1]))
+    return [(server_key, record.display_values()) for server_key, record in rows]
+
+
+def run_prober(store_result, keys, results):
+    waits = []
+    for n in range(results):
+        server_key = keys[n % len(keys)]
+        record = qwcore.ServerRecord(server_key[0], server_key[1], 'probed', 10.0 + n % 50)
+        start = time.perf_counter()
+        store_result(server_key, record)
+        waits.append(time.perf_counter() - start)
+        time.sleep(0.0005)
+    return waits
+
+
+def locked(records, results):
+    lock, stop, passes = threading.Lock(), threading.Event(), [0]
+
+    def gui():
+        while not stop.is_set():
+            with lock: gui_pass(records)
+            passes[0] += 1
+
+    def store_result(server_key, record):
+        with lock: records[server_key] = record
+
+    return measure(gui, stop, passes, store_result, list(records), results)
+
+
+def snapshots(records, results):
+    store, stop, passes = qwcore.ServerStateStore(), threading.Event(), [0]
+    store.update(lambda state: {'records': records})
+
+    def gui():
+        while not stop.is_set():
+            gui_pass(store.state.records)
+            passes[0] += 1
+
+    return measure(gui, stop, passes, lambda server_key, record: store.put_record(record), list(records), results)
+
+
+def measure(gui, stop, passes, store_result, keys, results):
+    gui_thread = threading.Thread(target=gui)
+    gui_thread.start()
+    start = time.perf_counter()
+    waits = sorted(run_prober(store_result, keys, results))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    gui_thread.join()
+    return statistics.median(waits), waits[int(0.99 * (len(waits) - 1))], waits[-1], len(waits) / elapsed, passes[0] / elapsed
+
+
+def publish_cost(records, repeats=200):
+    server_key = next(iter(records))
+    record_map = qwcore.RecordMap(records)
+    start = time.perf_counter()
+    for _ in range(repeats): copied = dict(records); copied[server_key] = None
+    dict_copy = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats): record_map.changed(((server_key, None),))
+    return dict_copy, (time.perf_counter() - start) / repeats
+
+
+def run(servers, results):
+    print(f"{servers} servers, {results} probe results stored while the GUI rebuilds all rows:")
+    print(f"  {'':<22} {'wait median us':>15} {'p99 us':>10} {'max ms':>8} {'results/s':>10} {'GUI passes/s':>13}")
+    for name, runner in [('shared lock', locked), ('ServerStateStore', snapshots)]:
+        median, p99, longest, stored, passes = runner(make_records(servers), results)
+        print(f"  {name:<22} {median * 1e6:>15.1f} {p99 * 1e6:>10.1f} {longest * 1e3:>8.2f} {stored:>10.0f} {passes:>13.1f}")
+    dict_copy, changed = publish_cost(make_records(servers))
+    print(f"publishing one result: dict copy {dict_copy * 1e6:.0f} us, RecordMap.changed {changed * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000, int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
@@ -0,0 +1,91 @@
+"""Binary snapshot (qwsnapshot) against the servers_cache.json + favorites.json pair it replaces.
+
+For each size, builds a synthetic server list (every tenth server a favorite, half of
+the servers with RTT and latency statistics) and reports file size, load time and save
+time of both formats. JSON load is iter_server_records for both files; snapshot load is
+read_snapshot, which leaves player lines unparsed until `players` is read, so the time
+to parse every player afterwards is shown separately. Finally it checks that a save
+interrupted before the rename leaves the previous snapshot readable.
+Usage: python benchmarks/bench_snapshot.py [sizes...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qwcore
+import qwsnapshot
+from bench_records import legacy_server
+
+
+def build_records(size):
+    records = []
+    for i in range(size):
+        record = qwcore.ServerRecord.from_dict(legacy_server(i))
+        if i % 2:
+            record.rtt = {'srtt': 0.02 + i % 50 / 1000, 'rttvar': 0.005, 'rto': 0.2}
+            record.ping_stats = qwcore.latency_stats([20.0 + i % 7, 21.5, 19.25], 3)
+        records.append(record)
+    return records
+
+
+def best_ms(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def load_json(cache_path, favorites_path):
+    return qwcore.load_server_records(cache_path), qwcore.load_server_records(favorites_path)
+
+
+def check_interrupted_save(path, records):
+    """Makes the rename of a save fail and checks that the snapshot on disk is still the old one."""
+    before = len(qwsnapshot.read_snapshot(path)[0])
+    original_replace = os.replace
+    def failing_replace(source, target): raise OSError("simulated crash before rename")
+    os.replace = failing_replace
+    try: qwsnapshot.write_snapshot(path, records[:10], [])
+    except OSError: pass
+    finally: os.replace = original_replace
+    leftovers = [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')]
+    return len(qwsnapshot.read_snapshot(path)[0]) == before and not leftovers
+
+
+def run(sizes):
+    print(f"{'servers':>8} {'json KB':>9} {'snap KB':>9} {'json load':>10} {'snap load':>10} {'+players':>9} {'json save':>10} {'snap save':>10}   (ms, best of 5)")
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix='bench_snapshot_')
+        try:
+            records = build_records(size)
+            favorites = records[::10]
+            cache_path, favorites_path = os.path.join(directory, 'servers_cache.json'), os.path.join(directory, 'favorites.json')
+            snapshot_path = os.path.join(directory, 'servers.qwsnap')
+
+            def save_json():
+                qwcore.save_server_records(records, cache_path)
+                qwcore.save_server_records(favorites, favorites_path)
+
+            json_save = best_ms(save_json)
+            snap_save = best_ms(lambda: qwsnapshot.write_snapshot(snapshot_path, records, favorites))
+            json_size = os.path.getsize(cache_path) + os.path.getsize(favorites_path)
+            json_load = best_ms(lambda: load_json(cache_path, favorites_path))
+            snap_load = best_ms(lambda: qwsnapshot.read_snapshot(snapshot_path))
+            servers = qwsnapshot.read_snapshot(snapshot_path)[0]
+            players = best_ms(lambda: [record.players for record in servers.values()], repeat=1)
+            print(f"{size:>8} {json_size / 1024:>9.0f} {os.path.getsize(snapshot_path) / 1024:>9.0f} {json_load:>10.1f} {snap_load:>10.1f} {players:>9.1f} {json_save:>10.1f} {snap_save:>10.1f}")
+
+            if [record.to_dict() for record in servers.values()] != [record.to_dict() for record in records]: print("  ! snapshot round trip differs")
+            if not check_interrupted_save(snapshot_path, records): print("  ! interrupted save damaged the snapshot")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    print("Round trips match and an interrupted save leaves the previous snapshot intact unless noted above.")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,101 @@
+"""Measures GUI start-up: time to the first drawn frame and time until the saved server lists are usable.
+
+Each run starts main.QuakeWorldGUI in a child process (a display is required) inside a
+scratch directory holding a synthetic servers_cache.json of the requested size and a
+favorites.json with every tenth server. All times are in ms from just before
+`import main`:
+  import       - importing main (and qwcore)
+  first frame  - first <Expose> event, i.e. the window has been drawn
+  interactive  - the saved lists are loaded and drawn (cache_loaded is set; older
+                 versions without it load everything in the constructor)
+  max stall    - longest gap between 5 ms timer ticks on the Tk thread before interactive
+Usage: python benchmarks/bench_startup.py [--runs N] [--classic-lists] [sizes...]
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+from bench_records import legacy_server
+
+MARKS = ('import', 'first_frame', 'interactive', 'max_stall')
+
+
+def child():
+    start = time.perf_counter()
+    import tkinter as tk
+    import main
+    marks = {'import': time.perf_counter() - start}
+    root = tk.Tk()
+    app = main.QuakeWorldGUI(root)
+    last_tick = [time.perf_counter()]
+    marks['max_stall'] = 0.0
+
+    def on_expose(event): marks.setdefault('first_frame', time.perf_counter() - start)
+
+    def finish():
+        print(json.dumps({name: round(value * 1e3, 1) for name, value in marks.items()}))
+        app.stop_event.set()
+        app.gui_queue.stop()
+        root.destroy()
+
+    def tick():
+        now = time.perf_counter()
+        marks['max_stall'] = max(marks['max_stall'], now - last_tick[0])
+        last_tick[0] = now
+        loaded = getattr(app, 'cache_loaded', None)
+        if 'first_frame' in marks and (loaded is None or loaded.is_set()):
+            root.update_idletasks()
+            marks['interactive'] = time.perf_counter() - start
+            root.after_idle(finish)
+            return
+        root.after(5, tick)
+
+    root.bind('<Expose>', on_expose, add='+')
+    root.after(5, tick)
+    root.mainloop()
+
+
+def prepare(directory, size, virtual):
+    servers = [legacy_server(i) for i in range(size)]
+    with open(os.path.join(directory, 'servers_cache.json'), 'w') as f: json.dump(servers, f)
+    with open(os.path.join(directory, 'favorites.json'), 'w') as f: json.dump(servers[::10], f)
+    with open(os.path.join(directory, 'settings.json'), 'w') as f: json.dump({'virtual_server_list': virtual}, f)
+    shutil.copy(os.path.join(REPO_DIR, 'uttanka.ico'), directory)
+
+
+def run(sizes, runs, virtual):
+    print(f"{'servers':>8} {'import':>8} {'first frame':>12} {'interactive':>12} {'max stall':>10}   (ms, median of {runs}, {'virtual' if virtual else 'classic'} lists)")
+    for size in sizes:
+        directory = tempfile.mkdtemp(prefix='bench_startup_')
+        try:
+            prepare(directory, size, virtual)
+            samples = []
+            for _ in range(runs):
+                result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], cwd=directory, capture_output=True, text=True, timeout=300)
+                lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+                if result.returncode or not lines: print(f"  ! run failed:\n{result.stderr[-2000:]}"); return
+                samples.append(json.loads(lines[-1]))
+            medians = [statistics.median(sample[name] for sample in samples) for name in MARKS]
+            print(f"{size:>8} {medians[0]:>8.1f} {medians[1]:>12.1f} {medians[2]:>12.1f} {medians[3]:>10.1f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ['--child']: child(); sys.exit(0)
+    runs = 3
+    if '--runs' in args:
+        index = args.index('--runs')
+        runs = int(args[index + 1])
+        del args[index:index + 2]
+    virtual = '--classic-lists' not in args
+    args = [arg for arg in args if arg != '--classic-lists']
+    run([int(arg) for arg in args] or [1000, 10000, 50000], runs, virtual)
@@ -0,0 +1,80 @@
+"""Compares per-result bookkeeping of a full scan before and after the tree index.
+
+Runs headless: the Treeview is replaced by a stand-in whose calls cost nothing, so
+the numbers show only the bookkeeping. Both sides run the same update_server_display
+and selection lookup per result; the legacy side swaps in the pre-index lookups.
+Usage: python benchmarks/bench_tree_index.py [sizes...]
+"""
+import itertools
+import os
+import sys
+import time
+from threading import Event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+class NullTreeview:
+    def __init__(self): self._ids = itertools.count(1)
+    def insert(self, parent, index, **kw): return f'I{next(self._ids):06d}'
+    def item(self, item_id, **kw): pass
+    def delete(self, *item_ids): pass
+    def detach(self, *item_ids): pass
+    def move(self, item_id, parent, index): pass
+
+
+class NullRoot:
+    def winfo_exists(self): return True
+
+
+class LegacyReconciler(main.TreeviewReconciler):
+    """The pre-index lookups: key position via list(keys).index() and item -> key via a linear next() scan."""
+    def zebra_tag(self, key):
+        return 'evenrow' if list(self.items.keys()).index(key) % 2 == 0 else 'oddrow'
+
+    def key_for(self, item_id):
+        return next((key for key, tree_item_id in self.items.items() if tree_item_id == item_id), None)
+
+
+def make_app(server_count, reconciler):
+    app = main.QuakeWorldGUI.__new__(main.QuakeWorldGUI)
+    app.root, app.stop_event, app.server_state = NullRoot(), Event(), main.ServerStateStore()
+    app.server_state.update(lambda state: {'records': {
+        (f'10.0.{i // 250}.{i % 250}', 27500): main.ServerRecord(
+            f'10.0.{i // 250}.{i % 250}', 27500, f'server {i}', 20.0 + i % 80,
+            map_name='dm4', mode='ffa', players_count=i % 5, spectators_count=0
+        ) for i in range(server_count)
+    }})
+    app.all_servers_view, app.favorites_view = reconciler(NullTreeview()), reconciler(NullTreeview())
+    app.all_servers_view.apply(app._server_tree_rows(list(app.server_state.state.records.items())))
+    return app
+
+
+def scan(app, values):
+    """One scan's bookkeeping: update_server_display per result, then the selection handler's item -> key lookup."""
+    for server_key in app.server_state.state.records:
+        app.update_server_display(server_key, values[server_key])
+        app.all_servers_view.key_for(app.all_servers_view.items[server_key])
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run(sizes):
+    print(f"{'servers':>8} {'legacy (s)':>12} {'indexed (s)':>12} {'legacy/server (us)':>20} {'indexed/server (us)':>20}")
+    for size in sizes:
+        timings = []
+        for reconciler in (LegacyReconciler, main.TreeviewReconciler):
+            app = make_app(size, reconciler)
+            values = {key: data.display_values() for key, data in app.server_state.state.records.items()}
+            timings.append(timed(scan, app, values))
+        legacy, indexed = timings
+        print(f"{size:>8} {legacy:>12.4f} {indexed:>12.4f} {legacy / size * 1e6:>20.2f} {indexed / size * 1e6:>20.2f}")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [1000, 2000, 5000])
@@ -0,0 +1,104 @@
+"""Local stand-in for a QuakeWorld master server, so --masters can be tried without the internet.
+
+Every query gets the master reply header followed by packed records (4 address bytes
+plus a big-endian port), split over several datagrams like the real masters do.
+`--game-servers N` also starts N servers on 127.0.0.1 that answer status probes and
+lists them first, so a scan of the list gets replies. `--check` runs the master on a
+free port, queries it with query_master_servers and `qwscan.py --masters`, and exits.
+Usage: python benchmarks/fake_master.py [--port 27000] [--servers N] [--game-servers N] [--per-datagram N] [--check]
+"""
+import argparse
+import json
+import os
+import selectors
+import socket
+import struct
+import subprocess
+import sys
+import time
+from threading import Event, Thread
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import qwcore
+
+
+def status_reply(n):
+    return b'\xff\xff\xff\xffn\\hostname\\fake server %d\\map\\dm%d\\maxclients\\16\n%d 10 5 %d "player%d" "base" 4 4 ""\n\0' % (n, 2 + n % 5, n, 20 + n % 60, n)
+
+
+def master_datagrams(entries, per_datagram):
+    records = [struct.pack('!4sH', socket.inet_aton(ip), port) for ip, port in entries]
+    return [qwcore.MASTER_REPLY_HEADER + b''.join(records[i:i + per_datagram]) for i in range(0, len(records), per_datagram)] or [qwcore.MASTER_REPLY_HEADER]
+
+
+def serve(master_port, servers, game_servers, per_datagram, stop, ready=None):
+    """Answers master queries on 127.0.0.1:master_port and status probes on the game servers until `stop` is set."""
+    selector = selectors.DefaultSelector()
+    master = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    master.bind(('127.0.0.1', master_port))
+    entries = []
+    for n in range(game_servers):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, [status_reply(n)])
+        entries.append(sock.getsockname())
+    entries += [(f'192.0.2.{n % 250 + 1}', 27500 + n // 250) for n in range(servers)]  # TEST-NET-1: listed, never answers.
+    master.setblocking(False)
+    selector.register(master, selectors.EVENT_READ, master_datagrams(entries, per_datagram))
+    if ready is not None: ready.append(master.getsockname()[1])
+    try:
+        while not stop.is_set():
+            for key, _ in selector.select(0.1):
+                try: _, addr = key.fileobj.recvfrom(2048)
+                except (BlockingIOError, ConnectionResetError): continue
+                for datagram in key.data: key.fileobj.sendto(datagram, addr)
+    finally:
+        for key in list(selector.get_map().values()): key.fileobj.close()
+        selector.close()
+
+
+def check(servers, game_servers, per_datagram):
+    stop, ready = Event(), []
+    thread = Thread(target=serve, args=(0, servers, game_servers, per_datagram, stop, ready), daemon=True)
+    thread.start()
+    while not ready: time.sleep(0.01)
+    master = ('127.0.0.1', ready[0])
+    try:
+        start = time.perf_counter()
+        entries, results = qwcore.query_master_servers([master])
+        print(f"query_master_servers: {len(entries)} servers from {master[0]}:{master[1]} ({results[master]}) in {time.perf_counter() - start:.2f}s")
+        command = [sys.executable, os.path.join(REPO_DIR, 'qwscan.py'), '--masters', f'{master[0]}:{master[1]}', '--timeout', '0.3', '--probes', '1', '--rate', '0']
+        print(f"running: qwscan.py {' '.join(command[2:])}")
+        scan = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=120)
+        for line in scan.stderr.splitlines(): print(f"  {line}")
+        records = json.loads(scan.stdout) if scan.returncode == 0 else []
+        answered = [record for record in records if record['ping'][:1].isdigit()]
+        print(f"qwscan --masters: exit {scan.returncode}, {len(records)} servers listed, {len(answered)} answered"
+              + (f", e.g. {answered[0]['display_hostname']!r} on {answered[0]['map']}" if answered else ""))
+        return 0 if len(entries) == servers + game_servers and len(answered) == game_servers else 1
+    finally:
+        stop.set()
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for a QuakeWorld master server.")
+    parser.add_argument('--port', type=int, default=qwcore.MASTER_SERVER_PORT, help=f"UDP port to answer master queries on (default: {qwcore.MASTER_SERVER_PORT})")
+    parser.add_argument('--servers', type=int, default=1000, help="listed servers that never answer (default: 1000)")
+    parser.add_argument('--game-servers', type=int, default=20, help="local servers that answer status probes (default: 20)")
+    parser.add_argument('--per-datagram', type=int, default=230, help="records per reply datagram (default: 230)")
+    parser.add_argument('--check', action='store_true', help="query a master on a free port with query_master_servers and qwscan.py, then exit")
+    args = parser.parse_args()
+    if args.check: return check(args.servers, args.game_servers, args.per_datagram)
+    print(f"Fake master on 127.0.0.1:{args.port}: {args.game_servers} local game servers + {args.servers} silent ones. "
+          f"Try: python qwscan.py --masters 127.0.0.1:{args.port} --rate 0. Ctrl+C to stop.")
+    stop = Event()
+    try: serve(args.port, args.servers, args.game_servers, args.per_datagram, stop)
+    except KeyboardInterrupt: stop.set()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
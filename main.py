@@ -1,16 +1,24 @@
-import socket
 import time
 import tkinter as tk
 from tkinter import ttk, messagebox
-import re
 from threading import Thread, Lock, Event, current_thread
-import subprocess
-import os
 import json
 import logging
 import sys
-import queue
-import requests
+from collections import OrderedDict
+import itertools
+import bisect
+from qwcore import (
+    RTO_INITIAL, DEFAULT_PROBES_PER_SERVER, FAVORITES_FILE, LOCAL_SERVER_LIST_FILE, SERVERS_CACHE_FILE,
+    MASTER_SERVER_PORT, DEFAULT_MASTER_SERVERS, SERVER_SORT_KEYS, ServerRecord, ServerListFetcher, _or_na,
+    dns_resolver, scan_servers, latency_stats, next_rtt_state, probe_timeout, format_ping_cell,
+    ping_sort_value, parse_server_list_lines, parse_address_list, query_master_servers, ProbeScheduler,
+    BackgroundMonitor, MONITOR_TIERS, DEFAULT_MONITOR_INTERVALS, DEFAULT_MONITOR_PROBES_PER_SECOND, probe_pacer,
+    ServerStateStore, PlayerSearchIndex, PlayerIndex, PLAYER_LEAVE, PLAYER_UPDATE, PlayerWatchlist, PresenceTracker, PRESENCE_JOINED,
+    iter_server_records, load_server_records
+)
+from qwhistory import PingHistoryStore, HistoryError, HISTORY_DB_FILE
+from qwsnapshot import SNAPSHOT_FILE, SnapshotError, read_snapshot, write_snapshot
 
 
 logging.basicConfig(
@@ -21,27 +29,24 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-UDP_TIMEOUT = 15.0
-FAVORITES_FILE = 'favorites.json'
-LOCAL_SERVER_LIST_FILE = 'eu-sv.txt'
-SERVERS_CACHE_FILE = 'servers_cache.json'
 SETTINGS_FILE = 'settings.json'
+WATCHLIST_FILE = 'watchlist.json'
+DEFAULT_LIST_REFRESH_MINUTES = 0
+DEFAULT_DETAIL_REFRESH_SECONDS = 2.0
+MIN_DETAIL_REFRESH_SECONDS = 0.5
+# A detail window's ping history line is re-read from the database at most this often (seconds).
+DETAIL_HISTORY_TTL = 30.0
+PLAYER_SEARCH_DEBOUNCE_MS = 120
+PLAYER_DELTA_TARGETED_MAX = 64
+PLAYER_COLUMNS = ('Player Name', 'Server', 'Map', 'Frags', 'Ping', 'Team')
+PRESENCE_NOTIFICATION_MS = 8000
+PRESENCE_NOTIFICATION_MAX_LINES = 6
 
 
 PING_THRESHOLD_LOW = 35.0
 PING_THRESHOLD_MEDIUM = 60.0
 
 
-CHARSET = {
-    0: 46, 1: 35, 2: 35, 3: 35, 4: 35, 5: 46, 6: 35, 7: 35, 8: 35, 9: 35,
-    11: 35, 12: 32, 13: 62, 14: 46, 15: 46, 16: 91, 17: 93, 18: 48, 19: 49,
-    20: 50, 21: 51, 22: 52, 23: 53, 24: 54, 25: 55, 26: 56, 27: 57, 28: 46,
-    29: 32, 30: 32, 31: 32, 127: 32, 128: 40, 129: 61, 130: 41, 131: 35,
-    132: 35, 133: 46, 134: 35, 135: 35, 136: 35, 137: 35, 139: 35, 140: 32,
-    141: 62, 142: 46, 143: 46,
-}
-
-
 DARK_BG = '#282c34'
 DARK_FG = '#abb2bf'
 ACCENT_COLOR = '#61afef'
@@ -67,118 +72,485 @@ MATCH_STANDBY_COLOR = '#FFA500'
 MATCH_NOT_ONGOING_COLOR = '#006400'
 
 BOT_COLOR = '#36454F'
+WATCHED_FG = '#e5c07b'
+STALE_FG = '#7f848e'
 
 MAX_VISIBLE_PLAYER_ROWS_IN_MODAL = 10
 
 
-def quake_chars(data):
-    data = bytearray(data)
-    for i in range(len(data)):
-        if 31 < data[i] < 127: continue
-        if 143 < data[i] < 255: data[i] = data[i] - 128
-        if data[i] in CHARSET: data[i] = CHARSET[data[i]]
-    return data
-
-
-def udp_command(address, port, data):
-    client = None
-    try:
-        try: ip_address = socket.gethostbyname(address)
-        except socket.gaierror as e: return {"error": f"DNS resolution failed for {address}: {e}"}, None, None
-        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        client.settimeout(UDP_TIMEOUT)
-        try: client.bind(('', 0))
-        except socket.error: pass
-        buf = b'\xFF\xFF\xFF\xFF' + data.encode('ascii')
-        send_time = time.time()
-        client.sendto(buf, (ip_address, port))
-        msg, server_addr = client.recvfrom(4096)
-        ping_time_calc = (time.time() - send_time) * 1000
-        return None, msg, ping_time_calc
-    except socket.timeout: return {"error": "timeout"}, None, None
-    except socket.error as e: return {"error": str(e)}, None, None
-    except Exception as e: return {"error": str(e)}, None, None
-    finally:
-        if client: client.close()
-
-
-def parse_status_response(data):
-    try:
-        data_after_quake_chars = quake_chars(data).decode('ascii', errors='ignore')
-        lines = data_after_quake_chars[6:-2].split('\n')
-        server_info = {}
-        players = []
-        if lines:
-            first_line_raw = lines.pop(0)
-            tmp_parts = [part for part in first_line_raw.split('\\') if part]
-            i = 0
-            while i < len(tmp_parts) - 1:
-                key_candidate, value_candidate = tmp_parts[i], tmp_parts[i+1]
-                if key_candidate == 'hostname' and 'hostname' not in server_info: server_info['hostname'] = value_candidate; i += 2; continue
-                elif key_candidate == 'map' and 'map' not in server_info: server_info['map'] = value_candidate; i += 2; continue
-                elif key_candidate == 'mode' and 'mode' not in server_info: server_info['mode'] = value_candidate; i += 2; continue
-                elif value_candidate == 'hostname' and 'hostname' not in server_info: server_info['hostname'] = key_candidate; i += 2; continue
-                elif value_candidate == 'map' and 'map' not in server_info: server_info['map'] = key_candidate; i += 2; continue
-                elif value_candidate == 'mode' and 'mode' not in server_info: server_info['mode'] = key_candidate; i += 2; continue
-                try: server_info[key_candidate] = value_candidate if isNaN(value_candidate) else int(value_candidate)
-                except ValueError: pass
-                i += 2
-        for p_line in lines:
-            if not p_line.strip(): continue
-            match = re.match(r'^(-?\d+)\s+(-?[S\d]+)\s+(-?\d+)\s+(-?\d+)\s*\s*"(.*?)"\s*"(.*?)"\s*(\d+)\s*(\d+)(?:\s"(.*?)"|$)', p_line)
-            if match:
-                try:
-                    player_info = {
-                        'id': int(match.group(1)), 'frags': match.group(2) if match.group(2) == 'S' else int(match.group(2)),
-                        'time': int(match.group(3)), 'ping': int(match.group(4)), 'name': match.group(5),
-                        'skin': match.group(6), 'topcolor': int(match.group(7)), 'bottomcolor': int(match.group(8)),
-                        'team': match.group(9) if match.group(9) is not None else ''
-                    }
-                    players.append(player_info)
-                except (ValueError, TypeError): pass
-        server_info['players'] = players
-        return server_info
-    except Exception as e: return {"error": f"parse error: {str(e)}"}
-
-
-def isNaN(value):
-    try: int(value); return False
-    except ValueError: return True
-
-
-def read_servers_from_file_raw(file_path):
-    servers = []
-    print(f"Attempting to read server list from local file: '{file_path}'")
-    try:
-        with open(file_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and ':' in line:
-                    address_or_hostname, port_str = line.split(':')
-                    port = int(port_str)
-                    if port == 30000 or port == 28000: continue
-                    try: servers.append((address_or_hostname, port)) 
-                    except ValueError: print(f"Warning: Invalid port for server '{address_or_hostname}:{port_str}'. Skipping.")
-    except FileNotFoundError: messagebox.showerror("File Error", f"Server list file '{file_path}' not found. Please ensure it exists."); return []
-    except Exception as e: messagebox.showerror("File Error", f"Error reading or parsing server list file '{file_path}': {e}"); return []
-    print(f"Loaded {len(servers)} servers from local file '{file_path}'.")
-    return servers
+GUI_FRAME_BUDGET_MS = 12
+GUI_IDLE_POLL_MS = 100
+GUI_METRICS_LOG_INTERVAL = 10.0
+
+VIRTUAL_LIST_INITIAL_ROWS = 30
+VIRTUAL_LIST_OVERSCAN = 8
+VIRTUAL_LIST_ROW_HEIGHT = 20
+VIRTUAL_LIST_WHEEL_ROWS = 3
+
+# servers_cache.json is streamed into the lists in chunks that start at this size and double each time.
+CACHE_LOAD_FIRST_CHUNK = 200
+
+
+
+class GuiDispatcher:
+    """Queue of (func, args, kwargs) tasks that worker threads hand to the Tk main thread.
+    Each pass applies tasks until the frame budget is spent; see put() for coalescing."""
+
+    WAKE_EVENT = '<<GuiDispatcherWake>>'
+
+    def __init__(self, root, budget_ms=GUI_FRAME_BUDGET_MS, idle_poll_ms=GUI_IDLE_POLL_MS):
+        self.root = root
+        self.budget = budget_ms / 1000.0
+        self.idle_poll_ms = idle_poll_ms
+        self._tasks = OrderedDict()
+        self._lock = Lock()
+        self._sequence = itertools.count()
+        self._wake_requested = Event()
+        self._drain_scheduled = False
+        self._stopped = False
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._posted = self._coalesced = self._applied = self._max_depth = 0
+        self._latency_total = self._latency_max = 0.0
+        self._metrics_since = time.perf_counter()
+
+    def start(self):
+        self.root.bind(self.WAKE_EVENT, lambda event: self._drain())
+        Thread(target=self._waker_loop, name="GuiWakerThread", daemon=True).start()
+        self.root.after(self.idle_poll_ms, self._poll)
+
+    def stop(self):
+        self._stopped = True
+        self._wake_requested.set()
+
+    def put(self, task, coalesce_key=None):
+        """Queues a task; one still pending under the same coalesce_key is replaced where it stands, keeping its turn."""
+        func, args, kwargs = task
+        with self._lock:
+            token = next(self._sequence) if coalesce_key is None else coalesce_key
+            previous = self._tasks.get(token)
+            if previous is not None: self._coalesced += 1
+            self._tasks[token] = (func, args, kwargs, previous[3] if previous is not None else time.perf_counter())
+            self._posted += 1
+            self._max_depth = max(self._max_depth, len(self._tasks))
+        self._wake_requested.set()
+
+    def qsize(self):
+        with self._lock: return len(self._tasks)
+
+    def metrics(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self._metrics_since
+            return {
+                'depth': len(self._tasks), 'max_depth': self._max_depth, 'posted': self._posted,
+                'coalesced': self._coalesced, 'applied': self._applied, 'window_s': round(elapsed, 1),
+                'avg_latency_ms': round(self._latency_total / self._applied * 1000, 2) if self._applied else 0.0,
+                'max_latency_ms': round(self._latency_max * 1000, 2)
+            }
+
+    def _waker_loop(self):
+        """Wakes the Tk loop with a <<GuiDispatcherWake>> event from this thread, so posters never block on Tk."""
+        while not self._stopped:
+            self._wake_requested.wait()
+            self._wake_requested.clear()
+            if self._stopped: break
+            try: self.root.event_generate(self.WAKE_EVENT, when='tail')
+            except (RuntimeError, tk.TclError): pass  # Tk not running (yet/anymore); the idle poll picks the tasks up.
+
+    def _poll(self):
+        if self._stopped: return
+        self._drain()
+        if time.perf_counter() - self._metrics_since >= GUI_METRICS_LOG_INTERVAL:
+            metrics = self.metrics()
+            if metrics['posted']: logger.info(f"GUI dispatcher: {metrics}")
+            with self._lock: self._reset_metrics()
+        self.root.after(self.idle_poll_ms, self._poll)
+
+    def _drain(self):
+        self._drain_scheduled = False
+        deadline = time.perf_counter() + self.budget
+        while True:
+            with self._lock:
+                if not self._tasks: return
+                _, (func, args, kwargs, enqueued_at) = self._tasks.popitem(last=False)
+            started = time.perf_counter()
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error executing GUI task in main thread: {e}. Task: {getattr(func, '__name__', func)} args={args} kwargs={kwargs}", exc_info=True)
+            with self._lock:
+                latency = started - enqueued_at
+                self._applied += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+            if time.perf_counter() >= deadline: break
+        if not self._drain_scheduled and not self._stopped:
+            self._drain_scheduled = True
+            self.root.after(1, self._drain)
+
+
+class TreeviewReconciler:
+    """Keeps a flat ttk.Treeview in sync with an ordered list of (key, values, tags) rows.
+
+    apply() compares the desired rows with what was last written and only issues
+    item/move/insert/delete calls for rows whose values, tags or position changed,
+    so selection and scroll position survive a refresh. `items` maps each row key
+    to its Treeview item id, in display order; `keys` is the reverse map and
+    `positions` the row index of each key (used for zebra striping). insert_row()
+    and remove_row() change single rows; `row_tags(tags, index)`, if given, derives
+    the tags actually shown from a row's tags and position (e.g. zebra striping), so
+    the rows below such a change get restriped.
+    """
+
+    def __init__(self, tree, row_tags=None):
+        self.tree = tree
+        self.row_tags = row_tags
+        self.items = {}
+        self.keys = {}
+        self.positions = {}
+        self._rows = {}
+
+    def _tags(self, tags, index): return tuple(self.row_tags(tags, index)) if self.row_tags else tuple(tags)
+
+    def apply(self, rows):
+        rows = [(key, tuple(values), self._tags(tags, index)) for index, (key, values, tags) in enumerate(rows)]
+        desired_keys = set(key for key, _, _ in rows)
+        stale_keys = [key for key in self.items if key not in desired_keys]
+        if stale_keys:
+            self.tree.delete(*[self.items[key] for key in stale_keys])
+            for key in stale_keys: del self.keys[self.items.pop(key)]; del self._rows[key]
+
+        # Rows on the longest run already in the right relative order stay put; only the rest are moved.
+        current_position = {key: index for index, key in enumerate(self.items)}
+        stable_keys = _longest_increasing_run([key for key, _, _ in rows if key in current_position], current_position)
+        moving_items = [self.items[key] for key, _, _ in rows if key in current_position and key not in stable_keys]
+        if moving_items: self.tree.detach(*moving_items)
+
+        for index, (key, values, tags) in enumerate(rows):
+            item_id = self.items.get(key)
+            if item_id is None:
+                item_id = self.items[key] = self.tree.insert('', index, values=values, tags=tags)
+                self.keys[item_id] = key
+                self._rows[key] = (values, tags)
+                continue
+            if key not in stable_keys: self.tree.move(item_id, '', index)
+            if self._rows[key] != (values, tags):
+                self.tree.item(item_id, values=values, tags=tags)
+                self._rows[key] = (values, tags)
+
+        ordered_items = [(key, self.items[key]) for key, _, _ in rows]
+        self.items.clear()
+        self.items.update(ordered_items)
+        self.positions = {key: index for index, (key, _) in enumerate(ordered_items)}
+
+    def __contains__(self, key): return key in self.items
+    def __len__(self): return len(self.items)
+
+    def key_for(self, item_id):
+        return self.keys.get(item_id)
+
+    def zebra_tag(self, key):
+        return 'evenrow' if self.positions.get(key, 0) % 2 == 0 else 'oddrow'
+
+    def update_row(self, key, values, tags):
+        item_id = self.items.get(key)
+        if item_id is None: return False
+        values, tags = tuple(values), self._tags(tags, self.positions.get(key, 0))
+        if self._rows.get(key) != (values, tags):
+            self.tree.item(item_id, values=values, tags=tags)
+            self._rows[key] = (values, tags)
+        return True
+
+    def insert_row(self, key, values, tags, index):
+        ordered_items = list(self.items.items())
+        values, tags = tuple(values), self._tags(tags, index)
+        item_id = self.tree.insert('', index, values=values, tags=tags)
+        ordered_items.insert(index, (key, item_id))
+        self.keys[item_id] = key
+        self._rows[key] = (values, tags)
+        self.items.clear()
+        self.items.update(ordered_items)
+        self._restripe(index + 1)
+
+    def remove_row(self, key):
+        item_id = self.items.pop(key, None)
+        if item_id is None: return False
+        index = self.positions[key]
+        self.tree.delete(item_id)
+        del self.keys[item_id]
+        del self._rows[key]
+        self._restripe(index)
+        return True
+
+    def _restripe(self, start):
+        self.positions = {key: index for index, key in enumerate(self.items)}
+        if not self.row_tags: return
+        for key, item_id in itertools.islice(self.items.items(), start, None):
+            values, tags = self._rows[key]
+            shown = self._tags(tags, self.positions[key])
+            if shown != tags:
+                self.tree.item(item_id, tags=shown)
+                self._rows[key] = (values, shown)
+
+    def ordered_keys(self):
+        return list(self.items)
+
+    def rows(self):
+        return [(key, self._rows[key][0], self._rows[key][1]) for key in self.items]
+
+    def selected_keys(self):
+        return [self.keys[item_id] for item_id in self.tree.selection() if item_id in self.keys]
+
+    def focused_key(self):
+        return self.keys.get(self.tree.focus())
+
+    def clear(self):
+        if self.items: self.tree.delete(*self.items.values())
+        self.items.clear()
+        self.keys.clear()
+        self.positions = {}
+        self._rows.clear()
+
+
+def _longest_increasing_run(keys, position):
+    """Returns the set of `keys` forming the longest subsequence whose `position` values increase (patience sorting)."""
+    tails, tail_keys, previous = [], [], {}
+    for key in keys:
+        pos = position[key]
+        slot = bisect.bisect_left(tails, pos)
+        previous[key] = tail_keys[slot - 1] if slot else None
+        if slot == len(tails): tails.append(pos); tail_keys.append(key)
+        else: tails[slot] = pos; tail_keys[slot] = key
+    run, key = set(), tail_keys[-1] if tail_keys else None
+    while key is not None: run.add(key); key = previous[key]
+    return run
+
+
+class VirtualTreeview:
+    """Drop-in alternative to TreeviewReconciler that only draws the visible rows, from a fixed pool of Treeview items.
+    `positions` maps each row key to its display index; selection and focus are kept by key across scrolling."""
+
+    def __init__(self, tree, scrollbar, overscan=VIRTUAL_LIST_OVERSCAN, row_tags=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.row_tags = row_tags
+        self.overscan = overscan
+        self.capacity = VIRTUAL_LIST_INITIAL_ROWS
+        self.offset = 0
+        self.positions = {}
+        self.keys = {}
+        self._order = []
+        self._rows = {}
+        self._slots = []
+        self._slot_rows = {}
+        self._selection = set()
+        self._focus_key = None
+        try: self.row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or VIRTUAL_LIST_ROW_HEIGHT)
+        except (ValueError, tk.TclError): self.row_height = VIRTUAL_LIST_ROW_HEIGHT
+
+        self.tree.configure(yscrollcommand='')
+        self.scrollbar.configure(command=self.yview)
+        self.tree.bind('<Configure>', self._on_configure, add='+')
+        self.tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        self.tree.bind('<Button-1>', self._on_click, add='+')
+        self.tree.bind('<MouseWheel>', lambda event: self._scroll_by(VIRTUAL_LIST_WHEEL_ROWS if event.delta < 0 else -VIRTUAL_LIST_WHEEL_ROWS))
+        self.tree.bind('<Button-4>', lambda event: self._scroll_by(-VIRTUAL_LIST_WHEEL_ROWS))
+        self.tree.bind('<Button-5>', lambda event: self._scroll_by(VIRTUAL_LIST_WHEEL_ROWS))
+        for sequence, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page_up'), ('<Next>', 'page_down'), ('<Home>', 'home'), ('<End>', 'end')):
+            self.tree.bind(sequence, lambda event, step=step: self._move_focus(step))
+
+    def apply(self, rows):
+        self._order = [key for key, _, _ in rows]
+        self._rows = {key: (tuple(values), tuple(tags)) for key, values, tags in rows}
+        self.positions.clear()
+        self.positions.update((key, index) for index, key in enumerate(self._order))
+        self._selection.intersection_update(self.positions)
+        if self._focus_key not in self.positions: self._focus_key = None
+        self.offset = max(0, min(self.offset, len(self._order) - self.capacity))
+        self._render()
+
+    def __contains__(self, key): return key in self.positions
+    def __len__(self): return len(self._order)
+
+    def key_for(self, item_id):
+        return self.keys.get(item_id)
+
+    def zebra_tag(self, key):
+        return 'evenrow' if self.positions.get(key, 0) % 2 == 0 else 'oddrow'
+
+    def _shown(self, row, index): return (row[0], tuple(self.row_tags(row[1], index))) if self.row_tags else row
+
+    def update_row(self, key, values, tags):
+        if key not in self.positions: return False
+        row = self._rows[key] = (tuple(values), tuple(tags))
+        index = self.positions[key] - self.offset
+        if 0 <= index < len(self._slots):
+            item_id = self._slots[index]
+            row = self._shown(row, self.positions[key])
+            if self._slot_rows.get(item_id) != row:
+                self.tree.item(item_id, values=row[0], tags=row[1])
+                self._slot_rows[item_id] = row
+        return True
+
+    def insert_row(self, key, values, tags, index):
+        self._order.insert(index, key)
+        self._rows[key] = (tuple(values), tuple(tags))
+        self._reindex(index)
+        if index < self.offset: self.offset += 1  # Keep the rows on screen where they are.
+        self._render()
+
+    def remove_row(self, key):
+        index = self.positions.pop(key, None)
+        if index is None: return False
+        del self._order[index]
+        del self._rows[key]
+        self._selection.discard(key)
+        if self._focus_key == key: self._focus_key = None
+        self._reindex(index)
+        if index < self.offset: self.offset -= 1
+        self.offset = max(0, min(self.offset, len(self._order) - self.capacity))
+        self._render()
+        return True
+
+    def _reindex(self, start):
+        for index in range(start, len(self._order)): self.positions[self._order[index]] = index
+
+    def ordered_keys(self):
+        return self._order
+
+    def rows(self):
+        return [(key, self._rows[key][0], self._rows[key][1]) for key in self._order]
+
+    def selected_keys(self):
+        return sorted(self._selection, key=self.positions.get)
+
+    def focused_key(self):
+        return self._focus_key
+
+    def clear(self):
+        self.apply([])
+
+    def yview(self, *args):
+        """Scrollbar command: understands the same 'moveto'/'scroll' arguments as Treeview.yview."""
+        total = len(self._order)
+        if not args: return (self.offset / total, min(1.0, (self.offset + self.capacity) / total)) if total else (0.0, 1.0)
+        if args[0] == 'moveto': self._scroll_to(int(round(float(args[1]) * total)))
+        elif args[0] == 'scroll': self._scroll_by(int(args[1]) * (max(1, self.capacity - 1) if args[2] == 'pages' else 1))
+
+    def see(self, key):
+        index = self.positions.get(key)
+        if index is None: return
+        if index < self.offset: self._scroll_to(index)
+        elif index >= self.offset + self.capacity: self._scroll_to(index - self.capacity + 1)
+
+    def _scroll_by(self, rows):
+        self._scroll_to(self.offset + rows)
+        return 'break'
+
+    def _scroll_to(self, offset):
+        offset = max(0, min(offset, len(self._order) - self.capacity))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def _render(self):
+        window = self._order[self.offset:self.offset + self.capacity + self.overscan]
+        while len(self._slots) < len(window): self._slots.append(self.tree.insert('', 'end'))
+        if len(self._slots) > len(window):
+            surplus = self._slots[len(window):]
+            self.tree.delete(*surplus)
+            del self._slots[len(window):]
+            for item_id in surplus: self._slot_rows.pop(item_id, None)
+
+        self.keys.clear()
+        selected_items, focus_item = [], None
+        for index, (item_id, key) in enumerate(zip(self._slots, window), self.offset):
+            self.keys[item_id] = key
+            row = self._shown(self._rows[key], index)
+            if self._slot_rows.get(item_id) != row:
+                self.tree.item(item_id, values=row[0], tags=row[1])
+                self._slot_rows[item_id] = row
+            if key in self._selection: selected_items.append(item_id)
+            if key == self._focus_key: focus_item = item_id
+
+        if tuple(self.tree.selection()) != tuple(selected_items): self.tree.selection_set(selected_items)
+        if focus_item is not None: self.tree.focus(focus_item)
+        self.tree.yview_moveto(0)
+        first, last = self.yview()
+        self.scrollbar.set(first, last)
+
+    def _on_configure(self, event):
+        capacity = max(1, event.height // self.row_height - 1)  # One row's worth is taken by the headings.
+        if capacity != self.capacity:
+            self.capacity = capacity
+            self.offset = max(0, min(self.offset, len(self._order) - self.capacity))
+            self._render()
+
+    def _on_click(self, event):
+        if not event.state & 0x0005: self._selection.clear()  # Plain click (no Shift/Control) replaces rows selected off-screen too.
+        key = self.keys.get(self.tree.identify_row(event.y))
+        if key is not None: self._focus_key = key
+
+    def _on_select(self, event=None):
+        window_keys = set(self.keys.values())
+        self._selection.difference_update(window_keys)
+        self._selection.update(self.keys[item_id] for item_id in self.tree.selection() if item_id in self.keys)
+
+    def _move_focus(self, step):
+        if not self._order: return 'break'
+        index = self.positions.get(self._focus_key, self.offset)
+        if step == 'page_up': index -= max(1, self.capacity - 1)
+        elif step == 'page_down': index += max(1, self.capacity - 1)
+        elif step == 'home': index = 0
+        elif step == 'end': index = len(self._order) - 1
+        elif self._focus_key is not None: index += step
+        key = self._order[max(0, min(index, len(self._order) - 1))]
+        self._focus_key = key
+        self._selection = {key}
+        self.see(key)
+        self._render()
+        return 'break'
 
 
 class QuakeWorldGUI:
     def __init__(self, root):
+        self.started_at = time.perf_counter()
         self.root = root
         self.root.title("QuakeWorld Server Pinger")
         self.root.iconbitmap('uttanka.ico')
-        self.servers = []
-        self.server_data = {}
-        self.favorite_servers_data = {}
-        self.all_players_data_flattened = []
-        self.gui_lock = Lock()
+        # The main list, the server records and the favorites: readers take server_state.state (an immutable
+        # ServerState) and keep using that snapshot; probe, load and refresh threads publish new versions.
+        self.server_state = ServerStateStore()
+        # Players tab: player_index follows every probe result and hands its deltas to the GUI thread through
+        # pending_player_deltas; player_entries (row key -> row data) and player_order (row keys, sorted) are its GUI side.
+        # player_lock covers player_index, presence and the two pending lists, never Tk or network calls.
+        self.player_index = PlayerIndex()
+        self.pending_player_deltas = []
+        self.player_entries = {}
+        self.player_order = []
+        self.players_sort_column, self.players_sort_reverse = None, False
+        self.player_search_index = PlayerSearchIndex()
+        self.presence = PresenceTracker()
+        self.pending_presence_events = []
+        self.watchlist_applied = []
+        self.presence_toast = None
+        self.player_search_after_id = None
+        self.player_search_applied = None
+        # Set to cancel the running 'Ping All' scan; None while no scan runs. Only touched on the GUI thread.
+        self.scan_cancel_event = None
+        self.player_lock = Lock()
         self.stop_event = Event()
-        self.gui_queue = queue.Queue()
+        self.cache_loaded = Event()
+        self.gui_queue = GuiDispatcher(self.root)
 
         self.open_detail_windows = {} 
+        self.server_list_fetcher = ServerListFetcher()
+        self.ping_history = PingHistoryStore(HISTORY_DB_FILE)
+        self.history_texts = {}  # server_key -> (detail window history line, time.monotonic() it was read); written off the Tk thread.
+        # One socket and thread for every periodic re-probe: open detail windows and the background monitor.
+        self.probe_scheduler = ProbeScheduler(self._store_scheduled_probe_result, self.stop_event, self._probe_timeout_for, max_rate=DEFAULT_MONITOR_PROBES_PER_SECOND, pacer=probe_pacer, name="ProbeSchedulerThread").start()
+        self.monitor = BackgroundMonitor(self.probe_scheduler)
 
         self._apply_dark_theme()
 
@@ -204,6 +576,7 @@ class QuakeWorldGUI:
         self.all_servers_tree.tag_configure('status_ongoing', background=MATCH_ONGOING_COLOR, foreground=DARK_FG)
         self.all_servers_tree.tag_configure('status_standby', background=MATCH_STANDBY_COLOR, foreground=DARK_BG)
         self.all_servers_tree.tag_configure('status_not_ongoing', background=MATCH_NOT_ONGOING_COLOR, foreground=DARK_FG)
+        self.all_servers_tree.tag_configure('stale', foreground=STALE_FG)
 
         self.all_servers_tree.heading('Name', text='Server Name / Address', command=lambda: self.sort_column_by('Name', self.all_servers_tree))
         self.all_servers_tree.heading('Port', text='Port', command=lambda: self.sort_column_by('Port', self.all_servers_tree))
@@ -215,10 +588,10 @@ class QuakeWorldGUI:
         self.all_servers_tree.column('Ping', width=80, minwidth=60, stretch=False, anchor='center')
         self.all_servers_tree.column('Map', width=120, minwidth=80, stretch=False, anchor='center')
         self.all_servers_tree.column('Players', width=70, minwidth=50, stretch=False, anchor='center')
-        all_servers_scrollbar = ttk.Scrollbar(self.all_servers_frame, orient='vertical', command=self.all_servers_tree.yview)
-        self.all_servers_tree.configure(yscrollcommand=all_servers_scrollbar.set)
+        self.all_servers_scrollbar = ttk.Scrollbar(self.all_servers_frame, orient='vertical', command=self.all_servers_tree.yview)
+        self.all_servers_tree.configure(yscrollcommand=self.all_servers_scrollbar.set)
         self.all_servers_tree.grid(row=0, column=0, sticky='nsew')
-        all_servers_scrollbar.grid(row=0, column=1, sticky='ns')
+        self.all_servers_scrollbar.grid(row=0, column=1, sticky='ns')
         self.all_servers_tree.bind("<Double-1>", self.show_server_details)
         self.all_servers_frame.grid_rowconfigure(0, weight=1)
         self.all_servers_frame.grid_columnconfigure(0, weight=1)
@@ -236,6 +609,7 @@ class QuakeWorldGUI:
         self.favorites_tree.tag_configure('status_ongoing', background=MATCH_ONGOING_COLOR, foreground=DARK_FG)
         self.favorites_tree.tag_configure('status_standby', background=MATCH_STANDBY_COLOR, foreground=DARK_BG)
         self.favorites_tree.tag_configure('status_not_ongoing', background=MATCH_NOT_ONGOING_COLOR, foreground=DARK_FG)
+        self.favorites_tree.tag_configure('stale', foreground=STALE_FG)
 
         self.favorites_tree.heading('Name', text='Server Name / Address', command=lambda: self.sort_column_by('Name', self.favorites_tree))
         self.favorites_tree.heading('Port', text='Port', command=lambda: self.sort_column_by('Port', self.favorites_tree))
@@ -247,10 +621,10 @@ class QuakeWorldGUI:
         self.favorites_tree.column('Ping', width=80, minwidth=60, stretch=False, anchor='center')
         self.favorites_tree.column('Map', width=120, minwidth=80, stretch=False, anchor='center')
         self.favorites_tree.column('Players', width=70, minwidth=50, stretch=False, anchor='center')
-        favorites_scrollbar = ttk.Scrollbar(self.favorites_frame, orient='vertical', command=self.favorites_tree.yview)
-        self.favorites_tree.configure(yscrollcommand=favorites_scrollbar.set)
+        self.favorites_scrollbar = ttk.Scrollbar(self.favorites_frame, orient='vertical', command=self.favorites_tree.yview)
+        self.favorites_tree.configure(yscrollcommand=self.favorites_scrollbar.set)
         self.favorites_tree.grid(row=0, column=0, sticky='nsew')
-        favorites_scrollbar.grid(row=0, column=1, sticky='ns')
+        self.favorites_scrollbar.grid(row=0, column=1, sticky='ns')
         self.favorites_tree.bind("<Double-1>", self.show_server_details)
         self.favorites_frame.grid_rowconfigure(0, weight=1)
         self.favorites_frame.grid_columnconfigure(0, weight=1)
@@ -268,6 +642,7 @@ class QuakeWorldGUI:
         self.players_tree = ttk.Treeview(self.players_frame, columns=('Player Name', 'Server', 'Map', 'Frags', 'Ping', 'Team'), show='headings', style='Treeview')
         self.players_tree.tag_configure('oddrow', background=ODD_ROW_BG, foreground=DARK_FG)
         self.players_tree.tag_configure('evenrow', background=EVEN_ROW_BG, foreground=DARK_FG)
+        self.players_tree.tag_configure('watched_row', foreground=WATCHED_FG)
         self.players_tree.heading('Player Name', text='Player Name', command=lambda: self.sort_column_by('Player Name', self.players_tree))
         self.players_tree.heading('Server', text='Server', command=lambda: self.sort_column_by('Server', self.players_tree))
         self.players_tree.heading('Map', text='Map', command=lambda: self.sort_column_by('Map', self.players_tree))
@@ -280,10 +655,10 @@ class QuakeWorldGUI:
         self.players_tree.column('Frags', width=60, minwidth=50, stretch=False, anchor='center')
         self.players_tree.column('Ping', width=60, minwidth=50, stretch=False, anchor='center')
         self.players_tree.column('Team', width=80, minwidth=60, stretch=False, anchor='center')
-        players_scrollbar = ttk.Scrollbar(self.players_frame, orient='vertical', command=self.players_tree.yview)
-        self.players_tree.configure(yscrollcommand=players_scrollbar.set)
+        self.players_scrollbar = ttk.Scrollbar(self.players_frame, orient='vertical', command=self.players_tree.yview)
+        self.players_tree.configure(yscrollcommand=self.players_scrollbar.set)
         self.players_tree.grid(row=1, column=0, sticky='nsew')
-        players_scrollbar.grid(row=1, column=1, sticky='ns')
+        self.players_scrollbar.grid(row=1, column=1, sticky='ns')
         self.players_tree.bind("<Double-1>", self.show_server_details)
         self.players_frame.grid_rowconfigure(1, weight=1)
         self.players_frame.grid_columnconfigure(0, weight=1)
@@ -308,8 +683,70 @@ class QuakeWorldGUI:
         self.ping_threshold_entry.bind("<KeyRelease>", self._on_ping_threshold_change)
         self.ping_threshold_entry.bind("<FocusOut>", lambda e: self._save_settings())
 
-        self.refresh_eu_sv_button = ttk.Button(settings_content_frame, text="Refresh Server List (eu-sv.txt)", command=self._refresh_server_list_action, style='RefreshNormal.TButton')
-        self.refresh_eu_sv_button.grid(row=2, column=0, columnspan=2, pady=(10,0), sticky='w')
+        ttk.Label(settings_content_frame, text="Probes per server:", style='TLabel').grid(row=2, column=0, sticky='w', pady=2, padx=2)
+        self.probe_count_var = tk.StringVar(value=str(DEFAULT_PROBES_PER_SERVER))
+        self.probe_count_entry = ttk.Entry(settings_content_frame, textvariable=self.probe_count_var, width=10, style='TEntry')
+        self.probe_count_entry.grid(row=2, column=1, sticky='w', pady=2, padx=2)
+        self.probe_count_entry.bind("<FocusOut>", lambda e: self._save_settings())
+
+        ttk.Label(settings_content_frame, text="Master servers:", style='TLabel').grid(row=3, column=0, sticky='w', pady=2, padx=2)
+        self.master_servers_var = tk.StringVar(value=DEFAULT_MASTER_SERVERS)
+        self.master_servers_entry = ttk.Entry(settings_content_frame, textvariable=self.master_servers_var, width=50, style='TEntry')
+        self.master_servers_entry.grid(row=3, column=1, sticky='ew', pady=2, padx=2)
+        self.master_servers_entry.bind("<FocusOut>", lambda e: self._save_settings())
+
+        ttk.Label(settings_content_frame, text="Auto-refresh list (minutes, 0 = off):", style='TLabel').grid(row=4, column=0, sticky='w', pady=2, padx=2)
+        self.list_refresh_minutes_var = tk.StringVar(value=str(DEFAULT_LIST_REFRESH_MINUTES))
+        self.list_refresh_minutes_entry = ttk.Entry(settings_content_frame, textvariable=self.list_refresh_minutes_var, width=10, style='TEntry')
+        self.list_refresh_minutes_entry.grid(row=4, column=1, sticky='w', pady=2, padx=2)
+        self.list_refresh_minutes_entry.bind("<FocusOut>", lambda e: self._save_settings())
+
+        ttk.Label(settings_content_frame, text="Details auto-refresh (seconds):", style='TLabel').grid(row=5, column=0, sticky='w', pady=2, padx=2)
+        self.detail_refresh_seconds_var = tk.StringVar(value=str(DEFAULT_DETAIL_REFRESH_SECONDS))
+        self.detail_refresh_seconds_entry = ttk.Entry(settings_content_frame, textvariable=self.detail_refresh_seconds_var, width=10, style='TEntry')
+        self.detail_refresh_seconds_entry.grid(row=5, column=1, sticky='w', pady=2, padx=2)
+        self.detail_refresh_seconds_entry.bind("<FocusOut>", lambda e: self._apply_detail_refresh_interval())
+
+        self.monitor_enabled_var = tk.BooleanVar(value=False)
+        self.monitor_enabled_check = ttk.Checkbutton(settings_content_frame, text="Background monitoring (keep server data fresh without pinging all)", variable=self.monitor_enabled_var, command=self._apply_monitor_settings)
+        self.monitor_enabled_check.grid(row=6, column=0, columnspan=2, sticky='w', pady=2, padx=2)
+
+        ttk.Label(settings_content_frame, text="Monitor intervals (s) - favorites with watched players / favorites / with players / empty / unreachable:", style='TLabel').grid(row=7, column=0, sticky='w', pady=2, padx=2)
+        monitor_intervals_frame = ttk.Frame(settings_content_frame, style='TFrame')
+        monitor_intervals_frame.grid(row=7, column=1, sticky='w', pady=2, padx=2)
+        self.monitor_interval_vars = {}
+        for tier in MONITOR_TIERS:
+            self.monitor_interval_vars[tier] = tk.StringVar(value=str(DEFAULT_MONITOR_INTERVALS[tier]))
+            monitor_interval_entry = ttk.Entry(monitor_intervals_frame, textvariable=self.monitor_interval_vars[tier], width=7, style='TEntry')
+            monitor_interval_entry.pack(side='left', padx=(0, 4))
+            monitor_interval_entry.bind("<FocusOut>", lambda e: self._apply_monitor_settings())
+
+        ttk.Label(settings_content_frame, text="Monitor budget (probes per second):", style='TLabel').grid(row=8, column=0, sticky='w', pady=2, padx=2)
+        self.monitor_rate_var = tk.StringVar(value=str(DEFAULT_MONITOR_PROBES_PER_SECOND))
+        self.monitor_rate_entry = ttk.Entry(settings_content_frame, textvariable=self.monitor_rate_var, width=10, style='TEntry')
+        self.monitor_rate_entry.grid(row=8, column=1, sticky='w', pady=2, padx=2)
+        self.monitor_rate_entry.bind("<FocusOut>", lambda e: self._apply_monitor_settings())
+
+        ttk.Label(settings_content_frame, text="Watched players (separated by ; - * wildcards, re: for a regex):", style='TLabel').grid(row=9, column=0, sticky='w', pady=2, padx=2)
+        self.watchlist_var = tk.StringVar(value="")
+        self.watchlist_entry = ttk.Entry(settings_content_frame, textvariable=self.watchlist_var, width=50, style='TEntry')
+        self.watchlist_entry.grid(row=9, column=1, sticky='ew', pady=2, padx=2)
+        self.watchlist_entry.bind("<FocusOut>", lambda e: self._apply_watchlist())
+
+        self.presence_notify_var = tk.BooleanVar(value=True)
+        self.presence_notify_check = ttk.Checkbutton(settings_content_frame, text="Notify when a watched player joins or leaves a server", variable=self.presence_notify_var, command=self._save_watchlist)
+        self.presence_notify_check.grid(row=10, column=0, columnspan=2, sticky='w', pady=2, padx=2)
+
+        self.virtual_server_list_var = tk.BooleanVar(value=False)
+        self.virtual_server_list_check = ttk.Checkbutton(settings_content_frame, text="Virtualized server lists (for very large lists: only draw visible rows, applies after restart)", variable=self.virtual_server_list_var, command=self._save_settings)
+        self.virtual_server_list_check.grid(row=11, column=0, columnspan=2, sticky='w', pady=2, padx=2)
+
+        settings_buttons_frame = ttk.Frame(settings_content_frame, style='TFrame')
+        settings_buttons_frame.grid(row=12, column=0, columnspan=2, pady=(10,0), sticky='w')
+        self.refresh_eu_sv_button = ttk.Button(settings_buttons_frame, text="Refresh Server List (eu-sv.txt)", command=self._refresh_server_list_action, style='RefreshNormal.TButton')
+        self.refresh_eu_sv_button.pack(side='left')
+        self.query_masters_button = ttk.Button(settings_buttons_frame, text="Query Master Servers", command=self._query_master_servers_action, style='RefreshNormal.TButton')
+        self.query_masters_button.pack(side='left', padx=5)
 
 
         self.main_buttons_frame = ttk.Frame(root, style='TFrame')
@@ -317,22 +754,29 @@ class QuakeWorldGUI:
 
         self.ping_all_button = ttk.Button(self.main_buttons_frame, text="Ping All Servers", command=self.ping_all, style='RefreshNormal.TButton')
         self.ping_all_button.pack(side='left', padx=5)
+        self.cancel_scan_button = ttk.Button(self.main_buttons_frame, text="Cancel Scan", command=self.cancel_scan, style='TButton', state='disabled')
+        self.cancel_scan_button.pack(side='left', padx=5)
         
         self.copy_address_button = ttk.Button(self.main_buttons_frame, text="Copy Address", command=self._copy_selected_address_to_clipboard, style='TButton')
         self.copy_address_button.pack(side='left', padx=5)
         
-        ttk.Button(self.main_buttons_frame, text="Add to Favorites", command=self._add_to_favorites_action, style='TButton').pack(side='left', padx=5)
+        self.add_to_favorites_button = ttk.Button(self.main_buttons_frame, text="Add to Favorites", command=self._add_to_favorites_action, style='TButton')
+        self.add_to_favorites_button.pack(side='left', padx=5)
         
         self.remove_from_favorites_button = ttk.Button(self.main_buttons_frame, text="Remove from Favorites", command=self._remove_from_favorites_action, style='TButton')
         self.remove_from_favorites_button.pack(side='left', padx=5)
 
         self.save_all_servers_button = ttk.Button(self.main_buttons_frame, text="Save All Servers", command=self._save_servers_to_cache, style='TButton')
         self.save_all_servers_button.pack(side='left', padx=5)
-        
-        self.root.after(0, self._on_tab_select, None)
 
-        self.all_servers_items = {}
-        self.favorites_items = {}
+        self.presence_label = ttk.Label(self.main_buttons_frame, text="", style='TLabel', foreground=WATCHED_FG)
+        self.presence_label.pack(side='right', padx=10)
+
+        # Until the saved lists are loaded these would scan, save or edit a partial list.
+        self.startup_locked_buttons = (self.ping_all_button, self.add_to_favorites_button, self.remove_from_favorites_button, self.save_all_servers_button, self.refresh_eu_sv_button, self.query_masters_button)
+        for button in self.startup_locked_buttons: button.config(state='disabled')
+
+        self.root.after(0, self._on_tab_select, None)
 
         self.progressbar = ttk.Progressbar(root, orient='horizontal', mode='determinate')
         self.root.grid_rowconfigure(2, weight=0)
@@ -340,12 +784,20 @@ class QuakeWorldGUI:
         self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_select)
 
         self._load_settings()
-        self._load_server_cache()
+        self._load_watchlist()
 
-        self._load_favorites()
-        self._populate_initial_treeview_main_and_favorites()
+        if self.virtual_server_list_var.get():
+            self.all_servers_view = VirtualTreeview(self.all_servers_tree, self.all_servers_scrollbar)
+            self.favorites_view = VirtualTreeview(self.favorites_tree, self.favorites_scrollbar)
+            self.players_view = VirtualTreeview(self.players_tree, self.players_scrollbar, row_tags=self._player_row_tags)
+        else:
+            self.all_servers_view = TreeviewReconciler(self.all_servers_tree)
+            self.favorites_view = TreeviewReconciler(self.favorites_tree)
+            self.players_view = TreeviewReconciler(self.players_tree, row_tags=self._player_row_tags)
 
-        self.root.after(100, self.process_gui_queue)
+        self.gui_queue.start()
+        Thread(target=self._load_saved_state_async, name="CacheLoadThread", daemon=True).start()
+        Thread(target=self._scheduled_server_list_refresh_loop, name="ListRefreshThread", daemon=True).start()
 
 
     def _apply_dark_theme(self):
@@ -398,19 +850,6 @@ class QuakeWorldGUI:
         self.root.option_add("*Toplevel.background", DARK_BG)
 
 
-    def process_gui_queue(self):
-        try:
-            while True:
-                func, args, kwargs = self.gui_queue.get(block=False)
-                try:
-                    func(*args, **kwargs)
-                except Exception as e:
-                    logger.error(f"Error executing GUI task in main thread: {e}. Task: {func.__name__} args={args} kwargs={kwargs}", exc_info=True)
-        except queue.Empty:
-            pass
-        finally:
-            self.root.after(100, self.process_gui_queue)
-
     def _load_settings(self):
         print(f"Attempting to load settings from {SETTINGS_FILE}...")
         try:
@@ -420,7 +859,16 @@ class QuakeWorldGUI:
                 self.ping_threshold_var.set(ping_threshold)
                 eu_sv_url = settings.get('eu_sv_url', '')
                 self.eu_sv_url_var.set(eu_sv_url)
-                print(f"Loaded settings: max_ping_threshold='{ping_threshold}', eu_sv_url='{eu_sv_url}'.")
+                self.probe_count_var.set(str(settings.get('probe_count', DEFAULT_PROBES_PER_SERVER)))
+                self.master_servers_var.set(settings.get('master_servers', DEFAULT_MASTER_SERVERS))
+                self.list_refresh_minutes_var.set(str(settings.get('list_refresh_minutes', DEFAULT_LIST_REFRESH_MINUTES)))
+                self.detail_refresh_seconds_var.set(str(settings.get('detail_refresh_seconds', DEFAULT_DETAIL_REFRESH_SECONDS)))
+                self.monitor_enabled_var.set(bool(settings.get('monitor_enabled', False)))
+                monitor_intervals = settings.get('monitor_intervals', {})
+                for tier in MONITOR_TIERS: self.monitor_interval_vars[tier].set(str(monitor_intervals.get(tier, DEFAULT_MONITOR_INTERVALS[tier])))
+                self.monitor_rate_var.set(str(settings.get('monitor_probes_per_second', DEFAULT_MONITOR_PROBES_PER_SECOND)))
+                self.virtual_server_list_var.set(bool(settings.get('virtual_server_list', False)))
+                print(f"Loaded settings: max_ping_threshold='{ping_threshold}', eu_sv_url='{eu_sv_url}', probe_count='{self.probe_count_var.get()}'.")
         except FileNotFoundError:
             print(f"'{SETTINGS_FILE}' not found. Using default settings.")
             self.ping_threshold_var.set("")
@@ -429,12 +877,29 @@ class QuakeWorldGUI:
             print(f"Error reading settings file: {e}. Using default settings.")
             self.ping_threshold_var.set("")
             self.eu_sv_url_var.set("")
+        self._copy_worker_settings()
+
+    def _copy_worker_settings(self):
+        """Copies the settings that worker threads need out of the Tk variables; only the Tk thread may read those."""
+        self.eu_sv_url = self.eu_sv_url_var.get().strip()
+        self.master_servers = self.master_servers_var.get()
+        try: self.list_refresh_minutes = float(self.list_refresh_minutes_var.get() or 0)
+        except ValueError: self.list_refresh_minutes = 0
 
     def _save_settings(self):
         print(f"Saving settings to {SETTINGS_FILE}...")
+        self._copy_worker_settings()
         settings = {
             'max_ping_threshold': self.ping_threshold_var.get(),
-            'eu_sv_url': self.eu_sv_url_var.get()
+            'eu_sv_url': self.eu_sv_url_var.get(),
+            'probe_count': self._probe_count(),
+            'master_servers': self.master_servers_var.get(),
+            'list_refresh_minutes': self.list_refresh_minutes_var.get(),
+            'detail_refresh_seconds': self._detail_refresh_seconds(),
+            'monitor_enabled': self.monitor_enabled_var.get(),
+            'monitor_intervals': self._monitor_intervals(),
+            'monitor_probes_per_second': self._monitor_rate(),
+            'virtual_server_list': self.virtual_server_list_var.get()
         }
         try:
             with open(SETTINGS_FILE, 'w') as f:
@@ -443,86 +908,191 @@ class QuakeWorldGUI:
         except IOError as e:
             print(f"Error saving settings to {SETTINGS_FILE}: {e}")
 
-    def _load_server_cache(self):
-        print(f"Attempting to load server cache from {SERVERS_CACHE_FILE}...")
-        loaded_servers_from_cache = {}
-        cache_loaded_successfully = False
+    def _load_watchlist(self):
+        print(f"Attempting to load watchlist from {WATCHLIST_FILE}...")
         try:
-            with open(SERVERS_CACHE_FILE, 'r') as f:
-                cached_list = json.load(f)
-                for server_info in cached_list:
-                    ip = server_info['original_ip']
-                    port = server_info['port']
-                    server_key = (ip, port)
-                    loaded_servers_from_cache[server_key] = server_info
-                print(f"Loaded {len(loaded_servers_from_cache)} servers from cache file '{SERVERS_CACHE_FILE}'.")
-                cache_loaded_successfully = True
-        except FileNotFoundError:
-            print(f"'{SERVERS_CACHE_FILE}' not found. Will try to fetch from eu-sv.txt source.")
-        except json.JSONDecodeError as e:
-            print(f"Error reading server cache file: {e}. Will try to fetch from eu-sv.txt source.")
-
-        with self.gui_lock:
-            self.server_data = loaded_servers_from_cache
-            if not cache_loaded_successfully:
-                self._fetch_servers_from_source_and_update_main_list_sync()
-
-            self.servers = []
-            for server_key in self.server_data:
-                data = self.server_data[server_key]
-                self.servers.append((data['display_hostname'], data['port'], data['original_ip']))
+            with open(WATCHLIST_FILE, 'r') as f: watchlist = json.load(f)
+        except FileNotFoundError: print(f"'{WATCHLIST_FILE}' not found. No players are watched."); return
+        except (OSError, json.JSONDecodeError) as e: print(f"Error reading watchlist file: {e}. No players are watched."); return
+        if not isinstance(watchlist, dict) or not isinstance(watchlist.get('patterns', []), list): print(f"'{WATCHLIST_FILE}' is not a watchlist. No players are watched."); return
+        patterns = [pattern for pattern in watchlist.get('patterns', []) if isinstance(pattern, str) and pattern.strip()]
+        self.watchlist_var.set('; '.join(patterns))
+        self.presence_notify_var.set(bool(watchlist.get('notify', True)))
+        self.watchlist_applied = self._watchlist_patterns()
+        self.presence.watchlist = PlayerWatchlist(self.watchlist_applied)
+        print(f"Watching {len(self.presence.watchlist.patterns)} player names or patterns.")
+
+    def _watchlist_patterns(self):
+        return [pattern.strip() for pattern in self.watchlist_var.get().split(';') if pattern.strip()]
+
+    def _save_watchlist(self):
+        print(f"Saving watchlist to {WATCHLIST_FILE}...")
+        try:
+            with open(WATCHLIST_FILE, 'w') as f: json.dump({'patterns': self._watchlist_patterns(), 'notify': self.presence_notify_var.get()}, f, indent=2)
+            print("Watchlist saved successfully.")
+        except IOError as e: print(f"Error saving watchlist to {WATCHLIST_FILE}: {e}")
+
+    def _apply_watchlist(self):
+        """Saves and recompiles the watchlist, re-reads who is where without notifying, and re-tiers the servers.
+
+        While the watchlist is not empty, favorites are re-probed (at the favorites interval, and
+        the ones with watched players at the 'watched' interval) even with monitoring off.
+        """
+        self._save_watchlist()
+        patterns = self._watchlist_patterns()
+        # Compared with the entries applied last, not PlayerWatchlist.patterns, which leaves out the invalid ones.
+        if patterns == self.watchlist_applied: return
+        self.watchlist_applied = patterns
+        watchlist = PlayerWatchlist(patterns)
+        if watchlist.invalid: self.gui_queue.put((messagebox.showwarning, ("Watched Players", "Ignoring invalid entries: " + '; '.join(watchlist.invalid)), {}))
+        with self.player_lock: self.presence.reset(self.server_state.state.records, watchlist)
+        for p_data in self.player_entries.values(): p_data['watched'] = watchlist.match(p_data['player_name']) is not None
+        self._populate_player_treeview(self.player_search_applied or '')
+        if self.cache_loaded.is_set():
+            self._sync_monitor()
+            self.monitor.configure(follow_favorites=bool(watchlist))
+        print(f"Watching {len(watchlist.patterns)} player names or patterns, {len(self.presence.servers())} servers with watched players.")
+
+    def _load_saved_state_async(self):
+        """Runs on CacheLoadThread so the window is drawn before any file or network I/O happens."""
+        try:
+            favorite_records = self._load_server_cache()
+            if not self.stop_event.is_set(): self._load_favorites(self._read_favorites_file() if favorite_records is None else favorite_records)
+        except Exception as e: logger.error(f"Loading the saved server lists failed: {e}", exc_info=True)
+        self.gui_queue.put((self._finish_startup_load, (), {}))
 
-        print(f"Combined server list now contains {len(self.servers)} entries.")
+    def _finish_startup_load(self):
+        self._populate_initial_treeview_main_and_favorites()
+        for button in self.startup_locked_buttons: button.config(state='normal')
+        self.cache_loaded.set()
+        self._apply_monitor_settings(save=False)
+        state = self.server_state.state
+        print(f"Server lists ready {(time.perf_counter() - self.started_at) * 1000:.0f} ms after startup ({len(state.servers)} servers, {len(state.favorites)} favorites).")
 
+    def _load_server_cache(self):
+        """Streams the saved server list into the lists in growing chunks, so the first rows show up right away.
+
+        The binary snapshot is read first; without one (or if it is damaged) servers_cache.json
+        is used, and without a usable cache the list is fetched from the eu-sv.txt source.
+        This runs on CacheLoadThread, so neither the files nor the network block the GUI.
+        Returns the favorites stored in the snapshot, or None if they still have to be read
+        from favorites.json.
+        """
+        favorite_records, cached_records, source = None, None, SNAPSHOT_FILE
+        try:
+            snapshot_servers, favorite_records = read_snapshot(SNAPSHOT_FILE)
+            cached_records = iter(snapshot_servers.values())
+        except FileNotFoundError:
+            print(f"'{SNAPSHOT_FILE}' not found. Trying {SERVERS_CACHE_FILE}.")
+        except (OSError, SnapshotError) as e:
+            print(f"Error reading snapshot file: {e}. Trying {SERVERS_CACHE_FILE}.")
+        if cached_records is None:
+            print(f"Attempting to load server cache from {SERVERS_CACHE_FILE}...")
+            source = SERVERS_CACHE_FILE
+            try:
+                cached_records = iter_server_records(SERVERS_CACHE_FILE)
+            except FileNotFoundError:
+                print(f"'{SERVERS_CACHE_FILE}' not found. Will try to fetch from eu-sv.txt source.")
+            except json.JSONDecodeError as e:
+                print(f"Error reading server cache file: {e}. Will try to fetch from eu-sv.txt source.")
+
+        if cached_records is None:
+            self._fetch_servers_from_source_and_update_main_list_sync()
+        else:
+            chunk_size = CACHE_LOAD_FIRST_CHUNK
+            while not self.stop_event.is_set():
+                chunk = list(itertools.islice(cached_records, chunk_size))
+                if not chunk: break
+
+                def add_chunk(state):
+                    records, servers = {}, list(state.servers)
+                    for record in chunk:
+                        if record.key not in state.records and record.key not in records: servers.append((record.display_hostname, record.port, record.original_ip))
+                        records[record.key] = record
+                    return {'servers': servers, 'records': state.records.changed(records)}
+
+                self.server_state.update(add_chunk)
+                self.gui_queue.put((self._populate_initial_treeview_main_and_favorites, (), {}), coalesce_key=('server_lists',))
+                chunk_size *= 2
+            print(f"Loaded {len(self.server_state.state.records)} servers from '{source}'.")
+
+        print(f"Combined server list now contains {len(self.server_state.state.servers)} entries.")
+        return favorite_records
+
+
+    def _save_snapshot(self):
+        """Atomically rewrites the snapshot with the server list and favorites. Returns the OSError on failure, else None."""
+        state = self.server_state.state
+        servers, favorites = state.all_records(), list(state.favorites.values())
+        print(f"Saving {len(servers)} servers and {len(favorites)} favorites to {SNAPSHOT_FILE}...")
+        try:
+            write_snapshot(SNAPSHOT_FILE, servers, favorites)
+            print("Snapshot saved successfully.")
+            return None
+        except OSError as e:
+            print(f"Error saving snapshot to {SNAPSHOT_FILE}: {e}")
+            return e
 
     def _save_servers_to_cache(self):
-        print(f"Saving all server data to {SERVERS_CACHE_FILE}...")
-        serializable_servers = []
-        with self.gui_lock:
-            for server_info in self.server_data.values():
-                serializable_servers.append(server_info) 
-        
-        try:
-            with open(SERVERS_CACHE_FILE, 'w') as f:
-                json.dump(serializable_servers, f, indent=2)
-            self.gui_queue.put((messagebox.showinfo, ("Save Servers", "All server data saved successfully!"), {}))
-            print("All server data saved successfully.")
-        except IOError as e:
-            self.gui_queue.put((messagebox.showerror, ("Save Servers Error", f"Error saving server data: {e}"), {}))
-            print(f"Error saving all server data to {SERVERS_CACHE_FILE}: {e}")
+        error = self._save_snapshot()
+        if error is None: self.gui_queue.put((messagebox.showinfo, ("Save Servers", "All server data saved successfully!"), {}))
+        else: self.gui_queue.put((messagebox.showerror, ("Save Servers Error", f"Error saving server data: {error}"), {}))
 
     def _refresh_server_list_action(self):
         print("User initiated server list refresh from eu-sv.txt source.")
+        self._copy_worker_settings()
         self.gui_queue.put((self.refresh_eu_sv_button.config, (), {'state': 'disabled', 'style': 'RefreshActive.TButton'}))
         
         Thread(target=self._fetch_servers_from_source_and_update_main_list_async, name="RefreshEUSVThread").start()
 
+    def _query_master_servers_action(self):
+        print("User initiated server list refresh from master servers.")
+        self._copy_worker_settings()
+        self.gui_queue.put((self.query_masters_button.config, (), {'state': 'disabled', 'style': 'RefreshActive.TButton'}))
+
+        Thread(target=self._fetch_servers_from_masters_async, name="MasterQueryThread").start()
+
     def _fetch_servers_from_source_and_update_main_list_async(self):
         self._fetch_servers_from_source_and_update_main_list_sync()
         self.gui_queue.put((self.refresh_eu_sv_button.config, (), {'state': 'normal', 'style': 'RefreshNormal.TButton'}))
+        self._queue_server_list_views_refresh()
+
+    def _fetch_servers_from_masters_async(self):
+        self._fetch_servers_from_masters_sync()
+        self.gui_queue.put((self.query_masters_button.config, (), {'state': 'normal', 'style': 'RefreshNormal.TButton'}))
+        self._queue_server_list_views_refresh()
+
+    def _queue_server_list_views_refresh(self):
         self.gui_queue.put((self._populate_initial_treeview_main_and_favorites, (), {}))
         self.gui_queue.put((self._load_favorites, (), {}))
+        self.gui_queue.put((self._sync_monitor, (), {}))
         self.gui_queue.put((self._aggregate_and_populate_player_data, (), {}))
 
 
     def _fetch_servers_from_source_and_update_main_list_sync(self):
-        configured_url = self.eu_sv_url_var.get().strip()
+        import requests
+        configured_url = self.eu_sv_url
         server_lines = []
-        source_description = ""
+        source_description, list_source = "", LOCAL_SERVER_LIST_FILE
 
         if configured_url:
             source_description = f"URL: {configured_url}"
             print(f"Attempting to download eu-sv.txt from {configured_url}...")
             try:
-                response = requests.get(configured_url, timeout=10)
-                response.raise_for_status()
-                server_lines = response.text.splitlines()
-                print(f"Successfully downloaded {len(server_lines)} lines from URL.")
+                server_lines = self.server_list_fetcher.fetch(configured_url)
+                if server_lines is None:
+                    if self.server_state.state.list_source == configured_url:
+                        print("Server list not modified since the last download (HTTP 304). Keeping the current list.")
+                        return
+                    server_lines = self.server_list_fetcher.previous_lines(configured_url)
+                    print(f"Server list not modified (HTTP 304); rebuilding the main list from {len(server_lines)} stored lines.")
+                else: print(f"Successfully downloaded {len(server_lines)} lines from URL.")
+                list_source = configured_url
             except requests.exceptions.RequestException as e:
                 self.gui_queue.put((messagebox.showerror, ("Download Error", f"Failed to download eu-sv.txt from URL '{configured_url}': {e}"), {}))
                 print(f"Error downloading from URL: {e}. Falling back to local file.")
                 server_lines = self._read_local_eu_sv_content()
-                source_description = f"local file: {LOCAL_SERVER_LIST_FILE} (fallback)"
+                source_description, list_source = f"local file: {LOCAL_SERVER_LIST_FILE} (fallback)", LOCAL_SERVER_LIST_FILE
         else:
             source_description = f"local file: {LOCAL_SERVER_LIST_FILE}"
             server_lines = self._read_local_eu_sv_content()
@@ -531,77 +1101,120 @@ class QuakeWorldGUI:
              self.gui_queue.put((messagebox.showinfo, ("Server List Empty", f"Could not load any servers from {source_description}."), {}))
              return
 
-        new_servers_list = []
-        newly_added_count = 0
-        updated_count = 0
-        with self.gui_lock:
-            fetched_server_keys = set()
-            for line in server_lines:
-                line = line.strip()
-                if line and ':' in line:
-                    address_or_hostname, port_str = line.split(':')
-                    try:
-                        port = int(port_str)
-                        if port == 30000 or port == 28000: continue
-                        ip_for_key = ""
-                        try:
-                            ip_for_key = socket.gethostbyname(address_or_hostname)
-                        except socket.gaierror:
-                            ip_for_key = address_or_hostname
-                        fetched_server_keys.add((ip_for_key, port))
-                    except (ValueError, socket.gaierror):
-                        pass
-
-            servers_to_remove = []
-            for server_key in self.server_data.keys():
-                if server_key not in fetched_server_keys:
-                    servers_to_remove.append(server_key)
-            
-            for key in servers_to_remove:
-                del self.server_data[key]
-            print(f"Removed {len(servers_to_remove)} servers from cache no longer present in source.")
-
-            for line in server_lines:
-                line = line.strip()
-                if line and ':' in line:
-                    address_or_hostname, port_str = line.split(':')
-                    try:
-                        port = int(port_str)
-                        if port == 30000 or port == 28000:
-                            continue
-
-                        actual_ip = ""
-                        try:
-                            actual_ip = socket.gethostbyname(address_or_hostname)
-                        except socket.gaierror:
-                            actual_ip = address_or_hostname
-                            
-                        server_key = (actual_ip, port)
-                        existing_data = self.server_data.get(server_key, None)
-
-                        if existing_data is None:
-                            self.server_data[server_key] = {
-                                'original_ip': actual_ip,
-                                'display_hostname': address_or_hostname,
-                                'port': port,
-                                'ping': 'N/A', 'map': 'N/A', 'players_count': 'N/A',
-                                'spectators_count': 'N/A', 'players': [], 'mode': 'N/A'
-                            }
-                            newly_added_count += 1
-                        else:
-                             if existing_data['display_hostname'] == existing_data['original_ip'] or existing_data['display_hostname'] != address_or_hostname:
-                                 existing_data['display_hostname'] = address_or_hostname
-                                 updated_count += 1
-                        
-                        new_servers_list.append((self.server_data[server_key]['display_hostname'], port, actual_ip))
-
-                    except ValueError:
-                        print(f"Warning: Invalid port for server '{address_or_hostname}:{port_str}'. Skipping.")
-            
-            self.servers = new_servers_list
+        self._merge_server_entries(parse_server_list_lines(server_lines), source_description, list_source=list_source)
+
+    def _scheduled_server_list_refresh_loop(self):
+        while not self.stop_event.is_set():
+            interval_minutes = self.list_refresh_minutes
+            if interval_minutes <= 0:
+                self.stop_event.wait(60)
+                continue
+            if self.stop_event.wait(interval_minutes * 60): break
+            try: self._refresh_server_list_delta()
+            except Exception as e: logger.error(f"Scheduled server list refresh failed: {e}", exc_info=True)
+
+    def _refresh_server_list_delta(self):
+        """Background refresh: re-downloads the list conditionally and merges only the lines that changed.
+
+        The delta is taken against the last download, so it is only applied while the main list
+        is that download; a list from the masters or a file is replaced by the URL's list instead.
+        """
+        import requests
+        configured_url = self.eu_sv_url
+        if not configured_url: return
+        list_is_from_url = self.server_state.state.list_source == configured_url
+        previous_entries = parse_server_list_lines(self.server_list_fetcher.previous_lines(configured_url))
+        try: server_lines = self.server_list_fetcher.fetch(configured_url)
+        except requests.exceptions.RequestException as e: print(f"Scheduled download of {configured_url} failed: {e}"); return
+        if server_lines is None:
+            if list_is_from_url: print("Scheduled server list refresh: not modified (HTTP 304)."); return
+            server_lines = self.server_list_fetcher.previous_lines(configured_url)
+
+        current_entries = parse_server_list_lines(server_lines)
+        if not current_entries: print(f"Scheduled server list refresh: {configured_url} listed no servers."); return
+        current_set, previous_set = set(current_entries), set(previous_entries)
+        added_entries = [entry for entry in current_entries if entry not in previous_set]
+        removed_entries = [entry for entry in previous_entries if entry not in current_set]
+        if not previous_entries or not list_is_from_url:
+            self._merge_server_entries(current_entries, f"URL: {configured_url}", notify=False, list_source=configured_url)
+        elif added_entries or removed_entries:
+            self._merge_server_list_delta(added_entries, removed_entries, f"URL: {configured_url}")
+        else:
+            print("Scheduled server list refresh: content unchanged.")
+            return
+        self._queue_server_list_views_refresh()
+
+    def _merge_server_list_delta(self, added_entries, removed_entries, source_description):
+        """Adds/removes only the given (address_or_hostname, port) entries; untouched servers keep their data."""
+        resolved_ips = dns_resolver.resolve_many(address_or_hostname for address_or_hostname, _ in added_entries + removed_entries)
+        added_keys = {(resolved_ips.get(address_or_hostname) or address_or_hostname, port): address_or_hostname for address_or_hostname, port in added_entries}
+        removed_keys = set((resolved_ips.get(address_or_hostname) or address_or_hostname, port) for address_or_hostname, port in removed_entries) - set(added_keys)
+
+        def merge(state):
+            listed_server_keys = set((actual_ip, port) for _, port, actual_ip in state.servers)
+            new_servers_list = [entry for entry in state.servers if (entry[2], entry[1]) not in removed_keys]
+            added_records = {}
+            for (actual_ip, port), address_or_hostname in added_keys.items():
+                record = state.records.get((actual_ip, port))
+                if record is None: record = added_records[(actual_ip, port)] = ServerRecord(actual_ip, port, address_or_hostname)
+                if (actual_ip, port) not in listed_server_keys: new_servers_list.append((record.display_hostname, port, actual_ip))
+            return {'servers': new_servers_list, 'records': state.records.changed(added_records, removed_keys)}
+
+        state = self.server_state.update(merge)
+        print(f"Merged changes from {source_description}: {len(added_keys)} servers added, {len(removed_keys)} removed. Total servers in main list: {len(state.servers)}")
+
+    def _fetch_servers_from_masters_sync(self):
+        masters = parse_address_list(self.master_servers, MASTER_SERVER_PORT)
+        if not masters:
+            self.gui_queue.put((messagebox.showinfo, ("Master Servers", "No master servers configured."), {}))
+            return
+
+        print(f"Querying {len(masters)} master servers: {', '.join(f'{host}:{port}' for host, port in masters)}")
+        entries, master_results = query_master_servers(masters)
+        for (host, port), result in master_results.items():
+            print(f"Master {host}:{port}: {result}")
+        if not entries:
+            self.gui_queue.put((messagebox.showinfo, ("Server List Empty", "None of the configured master servers returned a server list."), {}))
+            return
 
-        print(f"Finished fetching server list from {source_description}. Added {newly_added_count} new servers, updated {updated_count} existing. Total servers in main list: {len(self.servers)}")
-        self.gui_queue.put((messagebox.showinfo, ("Server List Updated", f"Refreshed server list from {source_description}. Added {newly_added_count} new servers and updated {updated_count} existing entries. {len(servers_to_remove)} old servers removed."), {}))
+        answered = sum(1 for result in master_results.values() if isinstance(result, int))
+        self._merge_server_entries(entries, f"{answered} of {len(masters)} master servers", list_source='masters')
+
+    def _merge_server_entries(self, entries, source_description, notify=True, list_source=None):
+        """Replaces the main list with `entries` ((address_or_hostname, port) pairs), keeping data of servers still listed.
+
+        list_source (the list URL, file or 'masters') is recorded as where the list now comes from.
+        """
+        newly_added_count, updated_count, removed_count = 0, 0, 0
+        resolved_ips = dns_resolver.resolve_many(address_or_hostname for address_or_hostname, _ in entries)
+        resolved_entries = [(address_or_hostname, port, resolved_ips.get(address_or_hostname) or address_or_hostname) for address_or_hostname, port in entries]
+        print(f"Resolved {len(resolved_ips)} unique hostnames for {len(entries)} server entries.")
+
+        def merge(state):
+            nonlocal newly_added_count, updated_count, removed_count
+            new_servers_list, records = [], {}
+            for address_or_hostname, port, actual_ip in resolved_entries:
+                server_key = (actual_ip, port)
+                if server_key in records: continue
+                existing_data = state.records.get(server_key)
+
+                if existing_data is None:
+                    existing_data = ServerRecord(actual_ip, port, address_or_hostname)
+                    newly_added_count += 1
+                elif existing_data.display_hostname == existing_data.original_ip or existing_data.display_hostname != address_or_hostname:
+                    existing_data = existing_data.copy()
+                    existing_data.display_hostname = address_or_hostname
+                    updated_count += 1
+
+                records[server_key] = existing_data
+                new_servers_list.append((existing_data.display_hostname, port, actual_ip))
+            removed_count = sum(1 for server_key in state.records if server_key not in records)
+            return {'servers': new_servers_list, 'records': records, 'list_source': list_source}
+
+        state = self.server_state.update(merge)
+        print(f"Removed {removed_count} servers from cache no longer present in source.")
+        print(f"Finished fetching server list from {source_description}. Added {newly_added_count} new servers, updated {updated_count} existing. Total servers in main list: {len(state.servers)}")
+        if notify: self.gui_queue.put((messagebox.showinfo, ("Server List Updated", f"Refreshed server list from {source_description}. Added {newly_added_count} new servers and updated {updated_count} existing entries. {removed_count} old servers removed."), {}))
 
     def _read_local_eu_sv_content(self):
         """Helper to read eu-sv.txt from local file and return lines."""
@@ -616,47 +1229,39 @@ class QuakeWorldGUI:
             return []
 
 
-    def _load_favorites(self):
+    def _read_favorites_file(self):
         print(f"Attempting to load favorites from {FAVORITES_FILE}...")
         try:
-            with open(FAVORITES_FILE, 'r') as f:
-                loaded_favorites_list = json.load(f)
-                self.favorite_servers_data = {}
-                for fav_server_info in loaded_favorites_list:
-                    ip = fav_server_info['original_ip']
-                    port = fav_server_info['port']
-                    server_key = (ip, port)
-                    if server_key in self.server_data:
-                        self.favorite_servers_data[server_key] = self.server_data[server_key].copy()
-                    else:
-                        self.favorite_servers_data[server_key] = fav_server_info
-                print(f"Loaded {len(self.favorite_servers_data)} favorite servers.")
+            return load_server_records(FAVORITES_FILE)
         except FileNotFoundError:
             print(f"'{FAVORITES_FILE}' not found. Starting with empty favorites.")
-            self.favorite_servers_data = {}
         except json.JSONDecodeError as e:
             print(f"Error reading favorites file: {e}. Starting with empty favorites.")
-            self.favorite_servers_data = {}
+        return {}
 
-    def _save_favorites(self):
-        print(f"Saving {len(self.favorite_servers_data)} favorite servers to {FAVORITES_FILE}...")
-        serializable_favorites = []
-        for server_info in self.favorite_servers_data.values():
-            serializable_favorites.append(server_info) 
-        try:
-            with open(FAVORITES_FILE, 'w') as f:
-                json.dump(serializable_favorites, f, indent=2)
-            print("Favorites saved successfully.")
-        except IOError as e:
-            print(f"Error saving favorites to {FAVORITES_FILE}: {e}")
+    def _load_favorites(self, favorite_records=None):
+        """Rebuilds the favorites from favorite_records (default: the current favorites).
+
+        Favorites that are in the main list get its record; the others keep their own.
+        """
+        def load(state):
+            return {'favorites': {server_key: state.records.get(server_key, record) for server_key, record in (state.favorites if favorite_records is None else favorite_records).items()}}
+
+        state = self.server_state.update(load)
+        print(f"Loaded {len(state.favorites)} favorite servers.")
 
 
     def _on_closing(self):
         print("Closing application. Signaling threads to stop.")
         self.stop_event.set()
+        if self.scan_cancel_event is not None: self.scan_cancel_event.set()
+        self.gui_queue.stop()
         self._save_settings()
-        self._save_servers_to_cache()
-        self._save_favorites()
+        if self.cache_loaded.is_set(): self._save_snapshot()
+        else: print("Server lists were still loading; leaving the snapshot untouched.")
+        self.probe_scheduler.close()
+        self.server_list_fetcher.close()
+        self.ping_history.close()
 
         for server_key in list(self.open_detail_windows.keys()):
             self._on_detail_window_closing_handler(server_key)
@@ -665,198 +1270,195 @@ class QuakeWorldGUI:
 
     def _populate_initial_treeview_main_and_favorites(self):
         print("Populating initial treeviews for 'All Servers' and 'Favorites'.")
-        self.all_servers_tree.delete(*self.all_servers_tree.get_children())
-        self.all_servers_items = {}
-        self.favorites_tree.delete(*self.favorites_tree.get_children())
-        self.favorites_items = {}
-
-        for index, (initial_display_name, port, actual_ip) in enumerate(self.servers):
+        state = self.server_state.state
+        all_servers_rows = []
+        for initial_display_name, port, actual_ip in state.servers:
             server_key = (actual_ip, port)
-            data = self.server_data.get(server_key, {
-                'original_ip': actual_ip, 'display_hostname': initial_display_name,
-                'port': port, 'ping': 'N/A', 'map': 'N/A', 'players_count': 'N/A',
-                'spectators_count': 'N/A', 'players': [], 'mode': 'N/A'
-            })
-            values = (data['display_hostname'], data['port'], data['ping'], data['map'], data['players_count'])
-            
-            tag = 'evenrow' if index % 2 == 0 else 'oddrow'
-            item_id = self.all_servers_tree.insert('', 'end', values=values, tags=(tag,))
-            self.all_servers_items[server_key] = item_id
-        print(f"Inserted {len(self.all_servers_items)} items into 'All Servers' tree.")
-
-        for index, (server_key, data) in enumerate(self.favorite_servers_data.items()):
-            actual_data = self.server_data.get(server_key, data)
-            values = (actual_data['display_hostname'], actual_data['port'], actual_data['ping'], actual_data['map'], actual_data['players_count'])
-            
-            tag = 'evenrow' if index % 2 == 0 else 'oddrow'
-            item_id = self.favorites_tree.insert('', 'end', values=values, tags=(tag,))
-            self.favorites_items[server_key] = item_id
-        print(f"Inserted {len(self.favorites_items)} items into 'Favorites' tree.")
+            all_servers_rows.append((server_key, state.records.get(server_key) or ServerRecord(actual_ip, port, initial_display_name)))
+        self.all_servers_view.apply(self._server_tree_rows(all_servers_rows, styled=False))
+        print(f"Reconciled {len(self.all_servers_view)} items in 'All Servers' tree.")
 
+        favorites_rows = [(server_key, state.records.get(server_key, data)) for server_key, data in state.favorites.items()]
+        self.favorites_view.apply(self._server_tree_rows(favorites_rows, styled=False))
+        print(f"Reconciled {len(self.favorites_view)} items in 'Favorites' tree.")
 
-    def sort_column_by(self, col, treeview):
-        with self.gui_lock:
-            if not hasattr(treeview, '_sort_column'):
-                treeview._sort_column = None
-                treeview._sort_reverse = False
 
-            items = [(treeview.item(item)['values'], item) for item in treeview.get_children()]
-            
-            if treeview == self.players_tree: col_map = {'Player Name': 0, 'Server': 1, 'Map': 2, 'Frags': 3, 'Ping': 4, 'Team': 5}
-            else: col_map = {'Name': 0, 'Port': 1, 'Ping': 2, 'Map': 3, 'Players': 4}
-            col_index = col_map[col]
-
-            def sort_key(item):
-                value = item[0][col_index]
-                if col in ('Port', 'Players'):
-                    try: return int(value)
-                    except ValueError: return float('inf')
-                elif col in ('Ping', 'Frags'):
-                    try: return float(str(value).split()[0])
-                    except (ValueError, IndexError): return float('inf')
-                return str(value).lower()
-
-            items.sort(key=sort_key, reverse=treeview._sort_reverse)
-            for index, (_, item_id) in enumerate(items):
-                treeview.detach(item_id)
-                
-                tags_to_apply_list = [('evenrow' if index % 2 == 0 else 'oddrow')] # Initialize as a list
-                if 'spectator_row' in treeview.item(item_id, 'tags'): tags_to_apply_list.append('spectator_row')
-                if 'bot_row' in treeview.item(item_id, 'tags'): tags_to_apply_list.append('bot_row') # Preserve bot tag during sort
-
-
-                if treeview != self.players_tree: # This section for server list specific coloring
-                    server_info_for_tagging = None
-                    # Find the server_key for this item_id
-                    found_server_key = None
-                    for skey, sid in self.all_servers_items.items():
-                        if sid == item_id: found_server_key = skey; break
-                    if not found_server_key:
-                        for skey, sid in self.favorites_items.items():
-                            if sid == item_id: found_server_key = skey; break
-                    
-                    if found_server_key and found_server_key in self.server_data:
-                        server_info_for_tagging = self.server_data[found_server_key]
-
-                    if server_info_for_tagging:
-                        if server_info_for_tagging['ping'].startswith('Error') or server_info_for_tagging['ping'] == 'N/A': tags_to_apply_list.append('ping_error')
-                        else:
-                            match_status_tag = self._get_match_status_tag(server_info_for_tagging)
-                            if match_status_tag: tags_to_apply_list.append(match_status_tag)
-                            else: tags_to_apply_list.append(self._get_ping_color_tag(server_info_for_tagging['ping']))
-                
-                treeview.item(item_id, tags=tuple(tags_to_apply_list))
-                treeview.move(item_id, '', 'end')
-
-            if treeview._sort_column == col: treeview._sort_reverse = not treeview._sort_reverse
-            else: treeview._sort_column, treeview._sort_reverse = col, False
-
-
-    def _get_ping_color_tag(self, ping_value_str):
-        if ping_value_str.startswith('Error') or ping_value_str == 'N/A': return 'ping_error'
-        try:
-            ping_value = float(ping_value_str)
-            if ping_value <= PING_THRESHOLD_LOW: return 'ping_low'
-            elif ping_value <= PING_THRESHOLD_MEDIUM: return 'ping_medium'
-            else: return 'ping_high'
-        except ValueError: return 'ping_error'
+    def _server_tree_tags(self, data, index, styled=True, stale=()):
+        tags_to_apply = [('evenrow' if index % 2 == 0 else 'oddrow')]
+        if data.key in stale: tags_to_apply.append('stale'); return tags_to_apply
+        if not styled: return tags_to_apply
+        if data.ping is None: tags_to_apply.append('ping_error')
+        else:
+            match_status_tag = self._get_match_status_tag(data)
+            if match_status_tag: tags_to_apply.append(match_status_tag)
+            else: tags_to_apply.append(self._get_ping_color_tag(data))
+        return tags_to_apply
 
-    def _get_match_status_tag(self, server_data_dict):
-        try:
-            players_count = server_data_dict.get('players_count')
-            if isinstance(players_count, int):
-                if players_count > 0: return 'status_ongoing'
-                elif players_count == 0: return 'status_standby'
-            return 'status_not_ongoing'
-        except (ValueError, TypeError): return 'status_not_ongoing'
-
-    def _get_match_status_text(self, server_data_dict):
-        try:
-            players_count = server_data_dict.get('players_count')
-            if isinstance(players_count, int):
-                if players_count > 0: return "Ongoing"
-                elif players_count == 0: return "Standby"
-            return "Not Ongoing / Unknown"
-        except (ValueError, TypeError): return "Not Ongoing / Unknown"
-
-    def _get_match_status_color(self, server_data_dict):
-        tag = self._get_match_status_tag(server_data_dict)
+    def _server_tree_rows(self, keyed_server_data, styled=True):
+        """Builds server view rows (TreeviewReconciler/VirtualTreeview) from an ordered list of (server_key, server_info) pairs."""
+        stale = self.server_state.state.stale
+        return [
+            (server_key, data.display_values(), self._server_tree_tags(data, index, styled, stale))
+            for index, (server_key, data) in enumerate(keyed_server_data)
+        ]
+
+
+    def sort_column_by(self, col, treeview):
+        if not hasattr(treeview, '_sort_column'):
+            treeview._sort_column = None
+            treeview._sort_reverse = False
+
+        if treeview != self.players_tree:
+            view = self.all_servers_view if treeview == self.all_servers_tree else self.favorites_view
+            record_sort_key = SERVER_SORT_KEYS[col]
+            state = self.server_state.state
+            items = [(values, server_key, state.records.get(server_key) or state.favorites.get(server_key) or ServerRecord(server_key[0], server_key[1], str(values[0]))) for server_key, values, _ in view.rows()]
+            items.sort(key=lambda item: record_sort_key(item[2]), reverse=treeview._sort_reverse)
+            sorted_rows = []
+            for index, (values, server_key, _) in enumerate(items):
+                server_info = state.records.get(server_key)
+                tags_to_apply = self._server_tree_tags(server_info, index, stale=state.stale) if server_info else [('evenrow' if index % 2 == 0 else 'oddrow')]
+                sorted_rows.append((server_key, values, tags_to_apply))
+            view.apply(sorted_rows)
+        else:
+            # The order is kept under this column from now on, so rows joining later land in their sorted place.
+            self.players_sort_column, self.players_sort_reverse = col, treeview._sort_reverse
+            self.player_order.sort(key=self._player_sort_key, reverse=self.players_sort_reverse)
+            self._populate_player_treeview(self.player_search_applied or '')
+
+        if treeview._sort_column == col: treeview._sort_reverse = not treeview._sort_reverse
+        else: treeview._sort_column, treeview._sort_reverse = col, False
+
+
+    def _get_ping_color_tag(self, server_info):
+        if server_info.ping is None: return 'ping_error'
+        if server_info.ping <= PING_THRESHOLD_LOW: return 'ping_low'
+        elif server_info.ping <= PING_THRESHOLD_MEDIUM: return 'ping_medium'
+        else: return 'ping_high'
+
+    def _get_match_status_tag(self, server_info):
+        players_count = server_info.players_count
+        if players_count is not None:
+            if players_count > 0: return 'status_ongoing'
+            elif players_count == 0: return 'status_standby'
+        return 'status_not_ongoing'
+
+    def _get_match_status_text(self, server_info):
+        players_count = server_info.players_count
+        if players_count is not None:
+            if players_count > 0: return "Ongoing"
+            elif players_count == 0: return "Standby"
+        return "Not Ongoing / Unknown"
+
+    def _get_match_status_color(self, server_info):
+        tag = self._get_match_status_tag(server_info)
         if tag == 'status_ongoing': return MATCH_ONGOING_COLOR
         elif tag == 'status_standby': return MATCH_STANDBY_COLOR
         elif tag == 'status_not_ongoing': return MATCH_NOT_ONGOING_COLOR
         return DARK_FG
 
     # NEW: Helper for player row specific background tags
-    def _get_player_row_background_tag(self, player_data, default_zebra_tag):
-        try:
-            player_ping = player_data.get('ping')
-            player_frags = player_data.get('frags')
+    def _get_player_row_background_tag(self, player, default_zebra_tag):
+        if player.is_bot: return 'bot_row' # Highest priority for bot
+        if player.is_spectator: return 'spectator_row' # Next priority for spectator
+        return default_zebra_tag # Fallback to standard zebra stripping
+
 
-            if isinstance(player_ping, int) and player_ping == 20: return 'bot_row' # Highest priority for bot
-            if player_frags == 'S': return 'spectator_row' # Next priority for spectator
-            return default_zebra_tag # Fallback to standard zebra stripping
-        except (ValueError, TypeError): return default_zebra_tag
+    def _probe_count(self):
+        try: return max(1, int(self.probe_count_var.get()))
+        except ValueError: return DEFAULT_PROBES_PER_SERVER
 
+    def _detail_refresh_seconds(self):
+        try: return max(MIN_DETAIL_REFRESH_SECONDS, float(self.detail_refresh_seconds_var.get()))
+        except ValueError: return DEFAULT_DETAIL_REFRESH_SECONDS
 
-    def ping_server(self, initial_display_name, port, actual_ip):
-        if self.stop_event.is_set(): return
+    def _apply_detail_refresh_interval(self):
+        self._save_settings()
+        interval = self._detail_refresh_seconds()
+        for server_key, detail in list(self.open_detail_windows.items()):
+            self.monitor.pin(server_key, interval)
+            detail['window']._refresh_label.config(text=f"Auto-refresh: {interval:g} seconds")
+
+    def _monitor_intervals(self):
+        intervals = {}
+        for tier in MONITOR_TIERS:
+            try: intervals[tier] = max(MIN_DETAIL_REFRESH_SECONDS, float(self.monitor_interval_vars[tier].get()))
+            except ValueError: intervals[tier] = DEFAULT_MONITOR_INTERVALS[tier]
+        return intervals
+
+    def _monitor_rate(self):
+        try: return max(0.1, float(self.monitor_rate_var.get()))
+        except ValueError: return DEFAULT_MONITOR_PROBES_PER_SECOND
+
+    def _apply_monitor_settings(self, save=True):
+        """Pushes the monitor settings to the BackgroundMonitor; the probe budget covers detail windows too."""
+        if save: self._save_settings()
+        self.probe_scheduler.set_rate(self._monitor_rate())
+        if not self.cache_loaded.is_set(): return
+        self._sync_monitor()
+        self.monitor.configure(enabled=self.monitor_enabled_var.get(), intervals=self._monitor_intervals(), follow_favorites=bool(self.presence.watchlist))
+        print(f"Background monitoring {'on' if self.monitor.enabled else 'off'}: {self.monitor.tier_counts()}, budget {self._monitor_rate():g} probes/s.")
+
+    def _sync_monitor(self):
+        state = self.server_state.state
+        with self.player_lock:
+            self.presence.reset(state.records)
+            watched_keys = self.presence.servers()
+        self.monitor.track_all(state.records, set(state.favorites), watched_keys)
+
+
+    def _probe_timeout_for(self, server_key):
+        record = self.server_state.state.records.get(server_key)
+        return probe_timeout(record.rtt if record else None)
+
+
+    def _store_probe_result(self, initial_display_name, port, actual_ip, err, response, ping_time, ping_stats=None, scheduled=False, generation=None):
+        """Publishes one probe result and queues the view updates; a result of scan `generation` that was cancelled or restarted meanwhile is dropped."""
         server_key = (actual_ip, port)
-        err, response, ping_time = udp_command(actual_ip, port, 'status 31\0')
-        current_server_data = {}
-
-        if err:
-            values_for_treeview = (initial_display_name, port, f"Error: {err['error']}", 'N/A', 'N/A')
-            current_server_data = {
-                'original_ip': actual_ip, 'display_hostname': initial_display_name,
-                'port': port, 'ping': f"Error: {err['error']}", 'map': 'N/A',
-                'players_count': 'N/A', 'spectators_count': 'N/A',
-                'players': [], 'mode': 'N/A'
-            }
-        else:
-            server_info = parse_status_response(response)
-            if 'error' in server_info:
-                values_for_treeview = (initial_display_name, port, f"Error: {server_info['error']}", 'N/A', 'N/A')
-                current_server_data = {
-                    'original_ip': actual_ip, 'display_hostname': initial_display_name,
-                    'port': port, 'ping': f"Error: {server_info['error']}", 'map': 'N/A',
-                    'players_count': 'N/A', 'spectators_count': 'N/A',
-                    'players': [], 'mode': 'N/A'
-                }
-            else:
-                hostname_from_server = server_info.get('hostname')
-                map_name = server_info.get('map', 'N/A')
-                gamemode_from_server = server_info.get('mode', 'N/A')
-                resolved_display_name = hostname_from_server if hostname_from_server and hostname_from_server.strip() else initial_display_name
-                all_players = server_info.get('players', [])
-                spectators = [p for p in all_players if p.get('frags') == 'S']
-                players_count = len(all_players) - len(spectators)
-                values_for_treeview = (resolved_display_name, port, f"{ping_time:.2f}", map_name, players_count)
-                current_server_data = {
-                    'original_ip': actual_ip, 'display_hostname': resolved_display_name,
-                    'port': port, 'ping': f"{ping_time:.2f}", 'map': map_name,
-                    'players_count': players_count, 'spectators_count': len(spectators),
-                    'players': all_players, 'mode': gamemode_from_server
-                }
-        with self.gui_lock:
-            self.server_data[server_key] = current_server_data.copy()
-            if server_key in self.favorite_servers_data: self.favorite_servers_data[server_key].update(current_server_data)
-            if server_key in self.open_detail_windows: self.gui_queue.put((self._update_detail_view, (server_key, current_server_data), {}))
-        self.gui_queue.put((self.update_server_display, (server_key, values_for_treeview), {}))
+        previous_record = self.server_state.state.records.get(server_key)
+        rtt_state = next_rtt_state(previous_record.rtt if previous_record else None, err, ping_time)
+        current_server_data = ServerRecord.from_probe(actual_ip, port, initial_display_name, err, response, ping_time, rtt_state, ping_stats)
+        state = self.server_state.put_record(current_server_data, generation)
+        if state is None: return
+        if not scheduled: self.probe_scheduler.note_result(server_key)
+        self.ping_history.record(current_server_data)
+        values_for_treeview = current_server_data.display_values()
+        is_favorite = server_key in state.favorites
+        if server_key in self.open_detail_windows: self.gui_queue.put((self._update_detail_view, (server_key, current_server_data, self._history_text(server_key)), {}), coalesce_key=('detail_view', server_key))
+        with self.player_lock:
+            # Fed the record that is current now, so two threads storing results for one server leave the index on the newest.
+            latest_record = self.server_state.state.records.get(server_key)
+            player_deltas = self.player_index.update(server_key, latest_record)
+            self.pending_player_deltas.extend(player_deltas)
+            presence_events = self.presence.update(server_key, latest_record)
+            self.pending_presence_events.extend((kind, name, server_key, latest_record.display_hostname) for kind, name, _, _ in presence_events)
+            watched = server_key in self.presence.present
+        if player_deltas: self.gui_queue.put((self._apply_player_deltas, (), {}), coalesce_key=('player_deltas',))
+        if presence_events: self.gui_queue.put((self._show_presence_events, (), {}), coalesce_key=('presence_events',))
+        self.monitor.observe(server_key, current_server_data, is_favorite, watched)
+        self.gui_queue.put((self.update_server_display, (server_key, values_for_treeview), {}), coalesce_key=('server_display', server_key))
 
 
     def ping_all(self):
+        """Scans the servers of the current tab, restarting the scan if one is running.
+
+        The rows keep their last values, marked stale, until this scan's result for them comes in.
+        """
+        if self.scan_cancel_event is not None: self.cancel_scan()
         current_tab_id = self.notebook.select()
         selected_tab_text = self.notebook.tab(current_tab_id, "text")
 
+        state = self.server_state.state
         servers_to_ping_list = []
-        if selected_tab_text == "All Servers": servers_to_ping_list = self.servers; print("Initiating 'Ping All Servers' for ALL servers.")
-        elif selected_tab_text == "Favorites": servers_to_ping_list = [(v['display_hostname'], v['port'], v['original_ip']) for k,v in self.favorite_servers_data.items()]; print("Initiating 'Ping All Servers' for FAVORITE servers only.")
-        elif selected_tab_text == "Players": servers_to_ping_list = self.servers; print("Initiating 'Ping All Servers' for ALL known servers (from players tab).")
+        if selected_tab_text == "All Servers": servers_to_ping_list = state.servers; print("Initiating 'Ping All Servers' for ALL servers.")
+        elif selected_tab_text == "Favorites": servers_to_ping_list = [(v.display_hostname, v.port, v.original_ip) for k,v in state.favorites.items()]; print("Initiating 'Ping All Servers' for FAVORITE servers only.")
+        elif selected_tab_text == "Players": servers_to_ping_list = state.servers; print("Initiating 'Ping All Servers' for ALL known servers (from players tab).")
         else: self.gui_queue.put((messagebox.showwarning, ("Ping Servers", "No active server list selected for pinging."), {})); return
             
         all_unique_servers_to_ping = list(set(servers_to_ping_list))
 
-        self.gui_queue.put((self.ping_all_button.config, (), {'state': 'disabled', 'style': 'RefreshActive.TButton'}))
+        self.gui_queue.put((self.ping_all_button.config, (), {'text': "Restart Scan", 'style': 'RefreshActive.TButton'}))
+        self.gui_queue.put((self.cancel_scan_button.config, (), {'state': 'normal'}))
         self.gui_queue.put((self.progressbar.stop, (), {}))
         self.gui_queue.put((self.progressbar.config, (), {'maximum': len(all_unique_servers_to_ping)}))
         self.gui_queue.put((self.progressbar.config, (), {'value': 0}))
@@ -864,161 +1466,252 @@ class QuakeWorldGUI:
 
         print(f"Queuing {len(all_unique_servers_to_ping)} unique servers for pinging.")
 
+        probe_count = self._probe_count()
+        scan_cancel_event = self.scan_cancel_event = Event()
+        generation = self.server_state.start_scan((actual_ip, port) for _, port, actual_ip in all_unique_servers_to_ping)
+
         def thread_func():
+            display_names = {(actual_ip, port): initial_display_name for initial_display_name, port, actual_ip in all_unique_servers_to_ping}
             current_ping_count = 0
-            for initial_display_name, port, actual_ip in all_unique_servers_to_ping:
-                if self.stop_event.is_set(): break
-                self.ping_server(initial_display_name, port, actual_ip) 
+
+            def on_result(server_key, err, response, ping_time, ping_stats):
+                nonlocal current_ping_count
+                if scan_cancel_event.is_set(): return
+                self._store_probe_result(display_names[server_key], server_key[1], server_key[0], err, response, ping_time, ping_stats, generation=generation)
                 current_ping_count += 1
-                self.gui_queue.put((self.progressbar.config, (), {'value': current_ping_count}))
-
-            print(f"Ping operation finished.")
-            self.gui_queue.put((self.sort_by_ping_and_players, (), {}))
-            self.gui_queue.put((self._aggregate_and_populate_player_data, (), {}))
-            self.gui_queue.put((self.progressbar.grid_forget, (), {}))
-            self.gui_queue.put((self.ping_all_button.config, (), {'state': 'normal', 'style': 'RefreshNormal.TButton'}))
-
-
-        with self.gui_lock:
-            for key in self.server_data: self.server_data[key].update({'ping': 'N/A', 'map': 'N/A', 'players_count': 'N/A', 'spectators_count': 'N/A', 'players': [], 'mode': 'N/A'})
-            self.all_servers_tree.delete(*self.all_servers_tree.get_children())
-            self.all_servers_items = {}
-            self.favorites_tree.delete(*self.favorites_tree.get_children())
-            self.favorites_items = {}
-            self.players_tree.delete(*self.players_tree.get_children())
-            self._populate_initial_treeview_main_and_favorites() 
+                self.gui_queue.put((self.progressbar.config, (), {'value': current_ping_count}), coalesce_key=('progressbar_value',))
+
+            probe_timeouts = {server_key: self._probe_timeout_for(server_key) for server_key in display_names}
+            self.probe_scheduler.expect_results(display_names)
+            probe_pacer.reset_stats()
+            scan_servers(list(display_names), 'status 31\0', RTO_INITIAL, on_result, scan_cancel_event, probe_timeouts, probe_count, pacer=probe_pacer)
+
+            if scan_cancel_event.is_set(): print(f"Scan {generation} stopped."); return
+            print(f"Ping operation finished. Pacing: {probe_pacer.describe()}.")
+            self.gui_queue.put((self._finish_scan, (generation,), {}))
+
+        self._restyle_server_rows(self.server_state.state.stale)
         Thread(target=thread_func, name="PingAllThread").start()
 
+    def cancel_scan(self):
+        """Stops the running scan; its results still in flight are dropped and the rows it did not reach lose their stale mark."""
+        if self.scan_cancel_event is None: return
+        self.scan_cancel_event.set()
+        generation = self.server_state.state.scan_generation
+        unmarked = self.server_state.end_scan(generation, cancel=True)
+        print(f"Cancelled scan {generation}; {len(unmarked or ())} servers were not refreshed.")
+        # Lets background refreshes of the servers the scan did not reach go ahead without waiting for it.
+        if unmarked: self.probe_scheduler.expect_results(unmarked, within=0)
+        self._end_scan_controls()
+        if unmarked: self._restyle_server_rows(unmarked)
+
+    def _finish_scan(self, generation):
+        if self.server_state.end_scan(generation) is None: return
+        self._end_scan_controls()
+        self.sort_by_ping_and_players()
+
+    def _end_scan_controls(self):
+        self.scan_cancel_event = None
+        self.progressbar.grid_forget()
+        self.ping_all_button.config(text="Ping All Servers", style='RefreshNormal.TButton')
+        self.cancel_scan_button.config(state='disabled')
+
+    def _restyle_server_rows(self, server_keys):
+        """Redraws the given rows in place, e.g. to show or drop their stale mark."""
+        records = self.server_state.state.records
+        for server_key in server_keys:
+            record = records.get(server_key)
+            if record is not None: self.update_server_display(server_key, record.display_values())
+
 
     def sort_by_ping_and_players(self):
         print("Applying ping filter and sorting both server lists.")
-        with self.gui_lock:
-            ping_threshold_str = self.ping_threshold_var.get().strip()
-            ping_threshold = float('inf')
-            if ping_threshold_str:
-                try: ping_threshold = float(ping_threshold_str)
-                except ValueError: self.gui_queue.put((messagebox.showwarning, ("Invalid Input", "Please enter a valid number for Max Ping."), {})); self.gui_queue.put((self.ping_threshold_var.set, ("",), {})); self.gui_queue.put((self._repopulate_all_trees, (False, float('inf')), {})); return
-            self.gui_queue.put((self._repopulate_all_trees, (True, ping_threshold), {}))
+        ping_threshold_str = self.ping_threshold_var.get().strip()
+        ping_threshold = float('inf')
+        if ping_threshold_str:
+            try: ping_threshold = float(ping_threshold_str)
+            except ValueError: self.gui_queue.put((messagebox.showwarning, ("Invalid Input", "Please enter a valid number for Max Ping."), {})); self.gui_queue.put((self.ping_threshold_var.set, ("",), {})); self.gui_queue.put((self._repopulate_all_trees, (False, float('inf')), {})); return
+        self.gui_queue.put((self._repopulate_all_trees, (True, ping_threshold), {}))
 
 
     def _repopulate_all_trees(self, filter_by_ping=False, ping_threshold=float('inf')):
-        self.all_servers_tree.delete(*self.all_servers_tree.get_children())
-        self.all_servers_items = {}
-
+        state = self.server_state.state
         displayable_all_servers = []
-        for initial_display_name, port, actual_ip in self.servers:
+        for initial_display_name, port, actual_ip in state.servers:
             server_key = (actual_ip, port)
-            data = self.server_data.get(server_key, {'original_ip': actual_ip, 'port': port, 'display_hostname': initial_display_name, 'ping': 'N/A', 'players_count': 'N/A'})
-
-            try:
-                ping_val_str = data.get('ping', 'N/A')
-                ping_value = float('inf')
-                if not ("Error" in ping_val_str or ping_val_str == 'N/A'): ping_value = float(ping_val_str)
-                players_count_val = data.get('players_count', 'N/A')
-                players_count = -1
-                if players_count_val != 'N/A': players_count = int(players_count_val)
-                if not filter_by_ping or ping_value <= ping_threshold: displayable_all_servers.append((ping_value, players_count, actual_ip, port, data))
-            except (ValueError, TypeError, IndexError):
-                if not filter_by_ping: displayable_all_servers.append((float('inf'), -1, actual_ip, port, data))
+            data = state.records.get(server_key) or ServerRecord(actual_ip, port, initial_display_name)
+            ping_value = ping_sort_value(data)
+            players_count = data.players_count if data.players_count is not None else -1
+            if not filter_by_ping or ping_value <= ping_threshold: displayable_all_servers.append((ping_value, players_count, actual_ip, port, data))
         
         displayable_all_servers.sort(key=lambda x: (x[0], -x[1]))
-        for index, (ping_value, players_count, ip, port, data) in enumerate(displayable_all_servers):
-            values = (data['display_hostname'], data['port'], data['ping'], data['map'], data['players_count'])
-            
-            tags_to_apply = [('evenrow' if index % 2 == 0 else 'oddrow')]
-            if data['ping'].startswith('Error') or data['ping'] == 'N/A': tags_to_apply.append('ping_error')
-            else:
-                match_status_tag = self._get_match_status_tag(data)
-                if match_status_tag: tags_to_apply.append(match_status_tag)
-                else: tags_to_apply.append(self._get_ping_color_tag(data['ping']))
-
-            item_id = self.all_servers_tree.insert('', 'end', values=values, tags=tuple(tags_to_apply))
-            self.all_servers_items[(ip, port)] = item_id
-        print(f"Refreshed 'All Servers' tree with {len(self.all_servers_items)} items.")
-
-        self.favorites_tree.delete(*self.favorites_tree.get_children())
-        self.favorites_items = {}
+        self.all_servers_view.apply(self._server_tree_rows([((ip, port), data) for _, _, ip, port, data in displayable_all_servers]))
+        print(f"Refreshed 'All Servers' tree with {len(self.all_servers_view)} items.")
 
         displayable_favorites = []
-        for (ip, port), data in self.favorite_servers_data.items():
-            try:
-                current_server_info = self.server_data.get((ip,port), data)
-                ping_val_str = current_server_info.get('ping', 'N/A')
-                ping_value = float('inf')
-                if not ("Error" in ping_val_str or ping_val_str == 'N/A'): ping_value = float(ping_val_str)
-                players_count_val = current_server_info.get('players_count', 'N/A')
-                players_count = -1
-                if players_count_val != 'N/A': players_count = int(players_count_val)
-                if not filter_by_ping or ping_value <= ping_threshold: displayable_favorites.append((ping_value, players_count, ip, port, current_server_info))
-            except (ValueError, TypeError, IndexError):
-                if not filter_by_ping: displayable_favorites.append((float('inf'), -1, ip, port, data))
+        for (ip, port), data in state.favorites.items():
+            current_server_info = state.records.get((ip,port), data)
+            ping_value = ping_sort_value(current_server_info)
+            players_count = current_server_info.players_count if current_server_info.players_count is not None else -1
+            if not filter_by_ping or ping_value <= ping_threshold: displayable_favorites.append((ping_value, players_count, ip, port, current_server_info))
         
         displayable_favorites.sort(key=lambda x: (x[0], -x[1]))
-        for index, (ping_value, players_count, ip, port, data) in enumerate(displayable_favorites):
-            values = (data['display_hostname'], data['port'], data['ping'], data['map'], data['players_count'])
-            
-            tags_to_apply = [('evenrow' if index % 2 == 0 else 'oddrow')]
-            if data['ping'].startswith('Error') or data['ping'] == 'N/A': tags_to_apply.append('ping_error')
-            else:
-                match_status_tag = self._get_match_status_tag(data)
-                if match_status_tag: tags_to_apply.append(match_status_tag)
-                else: tags_to_apply.append(self._get_ping_color_tag(data['ping']))
-
-            item_id = self.favorites_tree.insert('', 'end', values=tuple(values), tags=tuple(tags_to_apply))
-            self.favorites_items[(ip, port)] = item_id
-        print(f"Refreshed 'Favorites' tree with {len(self.favorites_items)} items.")
+        self.favorites_view.apply(self._server_tree_rows([((ip, port), data) for _, _, ip, port, data in displayable_favorites]))
+        print(f"Refreshed 'Favorites' tree with {len(self.favorites_view)} items.")
 
 
     def _on_ping_threshold_change(self, event=None): self.root.after(100, self.sort_by_ping_and_players)
-    def _apply_player_search_filter(self, event=None): self.gui_queue.put((self._populate_player_treeview, (self.player_search_var.get().strip(),), {}))
+    def _apply_player_search_filter(self, event=None):
+        """Runs the player search once typing pauses for PLAYER_SEARCH_DEBOUNCE_MS instead of on every key."""
+        if self.player_search_after_id is not None: self.root.after_cancel(self.player_search_after_id)
+        self.player_search_after_id = self.root.after(PLAYER_SEARCH_DEBOUNCE_MS, self._run_player_search)
+
+    def _run_player_search(self):
+        self.player_search_after_id = None
+        search_term = self.player_search_var.get().strip()
+        if search_term != self.player_search_applied: self._populate_player_treeview(search_term)
 
 
     def _aggregate_and_populate_player_data(self):
+        """Brings the player index in line with the server records after the server list was loaded or replaced; probe results keep it current from then on."""
         print("Aggregating player data and populating players tree.")
-        self.all_players_data_flattened = []
-        with self.gui_lock:
-            for server_key, server_info in self.server_data.items():
-                if not server_info.get('ping', 'N/A').startswith('Error') and server_info.get('ping') != 'N/A':
-                    server_display_name = server_info.get('display_hostname', server_key[0])
-                    server_map = server_info.get('map', 'N/A')
-                    for player in server_info.get('players', []):
-                        if player.get('frags') != 'S':
-                            self.all_players_data_flattened.append({
-                                'player_name': player.get('name', 'N/A'), 'server_name': server_display_name,
-                                'map': server_map, 'frags': player.get('frags', 'N/A'),
-                                'ping': player.get('ping', 'N/A'), 'team': player.get('team', '')
-                            })
-        self.gui_queue.put((self._populate_player_treeview, (self.player_search_var.get().strip(),), {}))
-        print(f"Aggregated {len(self.all_players_data_flattened)} player entries.")
+        records = self.server_state.state.records
+        with self.player_lock:
+            deltas = [delta for server_key in list(self.player_index.servers) if server_key not in records for delta in self.player_index.update(server_key, None)]
+            for server_key, server_info in records.items(): deltas.extend(self.player_index.update(server_key, server_info))
+            self.pending_player_deltas.extend(deltas)
+        self._apply_player_deltas()
+        print(f"Aggregated {len(self.player_entries)} player entries.")
+
+
+    def _player_entry(self, player, server_name, map_name):
+        return {
+            'player': player, 'player_name': player.name, 'server_name': server_name, 'map': map_name,
+            'values': (player.name, server_name, map_name, player.frags, player.ping, player.team),
+            'watched': self.presence.watchlist.match(player.name) is not None
+        }
+
+    def _player_sort_key(self, player_key, p_data=None):
+        p_data = p_data or self.player_entries[player_key]
+        if self.players_sort_column is None: return (p_data['server_name'].lower(), p_data['player_name'].lower(), player_key)
+        value = p_data['values'][PLAYER_COLUMNS.index(self.players_sort_column)]
+        if self.players_sort_column in ('Ping', 'Frags'):
+            try: value = float(value)
+            except (TypeError, ValueError): value = float('inf')
+        else: value = str(value).lower()
+        return (value, player_key)
+
+    def _player_position(self, keys, sort_key):
+        """Index of `sort_key` in `keys` (row keys ordered like player_order): bisect by _player_sort_key."""
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            value = self._player_sort_key(keys[middle])
+            if (value > sort_key) if self.players_sort_reverse else (value < sort_key): low = middle + 1
+            else: high = middle
+        return low
+
+    def _player_row_tags(self, tags, index):
+        """row_tags of the Players view: bots keep their own background, every other row is zebra striped by position."""
+        background_tag = 'bot_row' if 'bot_row' in tags else ('evenrow' if index % 2 == 0 else 'oddrow')
+        return (background_tag, 'watched_row') if 'watched_row' in tags else (background_tag,)
+
+    def _player_row(self, player_key):
+        p_data = self.player_entries[player_key]
+        return player_key, p_data['values'], (('bot_row',) if p_data['player'].is_bot else ()) + (('watched_row',) if p_data['watched'] else ())
+
+    def _apply_player_deltas(self):
+        """Applies the player joins, leaves, renames and updates queued by probe results to the Players tab.
+
+        A handful of deltas become single row inserts, removals and updates on the view; a
+        large batch (a list load, a burst of scan results) is applied to the model and the
+        view is redrawn from it once.
+        """
+        with self.player_lock: deltas, self.pending_player_deltas = self.pending_player_deltas, []
+        if not deltas: return
+        targeted = len(deltas) <= PLAYER_DELTA_TARGETED_MAX
+        search_term = self.player_search_applied or ''
+        for kind, player_key, (player, server_name, map_name) in deltas:
+            p_data = None if kind == PLAYER_LEAVE else self._player_entry(player, server_name, map_name)
+            if player_key in self.player_entries:
+                if targeted:
+                    sort_key = self._player_sort_key(player_key)
+                    if kind == PLAYER_UPDATE and self._player_sort_key(player_key, p_data) == sort_key:
+                        self.player_entries[player_key] = p_data
+                        self.players_view.update_row(*self._player_row(player_key))
+                        continue
+                    del self.player_order[self._player_position(self.player_order, sort_key)]
+                    self.players_view.remove_row(player_key)
+                del self.player_entries[player_key]
+                self.player_search_index.remove(player_key)
+            if p_data is None: continue
+            self.player_entries[player_key] = p_data
+            self.player_search_index.add(player_key, player.name)
+            if not targeted: continue
+            sort_key = self._player_sort_key(player_key)
+            self.player_order.insert(self._player_position(self.player_order, sort_key), player_key)
+            if self.player_search_index.matches(player_key, search_term):
+                self.players_view.insert_row(*self._player_row(player_key), self._player_position(self.players_view.ordered_keys(), sort_key))
+        if not targeted:
+            self.player_order = sorted(self.player_entries, key=self._player_sort_key, reverse=self.players_sort_reverse)
+            self._populate_player_treeview(search_term)
+
+
+    def _show_presence_events(self):
+        """Reports watched players joining or leaving servers: console, status line and, if enabled, a bell and a toast."""
+        with self.player_lock: events, self.pending_presence_events = self.pending_presence_events, []
+        if not events: return
+        lines = [f"{name} {'joined' if kind == PRESENCE_JOINED else 'left'} {server_name} ({server_key[0]}:{server_key[1]})" for kind, name, server_key, server_name in events]
+        for line in lines: print(f"Watched player: {line}")
+        self.presence_label.config(text=lines[-1])
+        if not self.presence_notify_var.get(): return
+        if len(lines) > PRESENCE_NOTIFICATION_MAX_LINES: lines = lines[:PRESENCE_NOTIFICATION_MAX_LINES - 1] + [f"... and {len(lines) - PRESENCE_NOTIFICATION_MAX_LINES + 1} more"]
+        joined_keys = [server_key for kind, _, server_key, _ in events if kind == PRESENCE_JOINED]
+        self.root.bell()
+        self._show_presence_toast(lines, joined_keys[-1] if joined_keys else None)
+
+    def _show_presence_toast(self, lines, server_key=None):
+        """A small always-on-top window in the bottom right corner of the screen; clicking it opens the server the last player joined."""
+        if self.presence_toast is not None and self.presence_toast.winfo_exists(): self.presence_toast.destroy()
+        toast = self.presence_toast = tk.Toplevel(self.root)
+        toast.overrideredirect(True)
+        toast.attributes('-topmost', True)
+        toast.config(bg=BUTTON_BG)
+        label = tk.Label(toast, text='\n'.join(lines), justify='left', bg=BUTTON_BG, fg=WATCHED_FG, padx=12, pady=8)
+        label.pack()
+        toast.update_idletasks()
+        toast.geometry(f"+{toast.winfo_screenwidth() - toast.winfo_reqwidth() - 20}+{toast.winfo_screenheight() - toast.winfo_reqheight() - 60}")
+
+        def on_click(event=None):
+            toast.destroy()
+            if server_key is not None and server_key in self.server_state.state.records: self._open_detail_window_for_key(server_key)
+
+        for widget in (toast, label): widget.bind('<Button-1>', on_click)
+        self.root.after(PRESENCE_NOTIFICATION_MS, lambda: toast.winfo_exists() and toast.destroy())
 
 
     def _populate_player_treeview(self, search_term=''):
         print(f"Populating players treeview with search term: '{search_term}'")
-        self.players_tree.delete(*self.players_tree.get_children())
-        filtered_players = [p_data for p_data in self.all_players_data_flattened if not search_term or search_term.lower() in p_data.get('player_name', '').lower()]
-        filtered_players.sort(key=lambda x: (str(x.get('server_name', '')).lower(), str(x.get('player_name', '')).lower()))
-
-        for index, p_data in enumerate(filtered_players):
-            zebra_tag = 'evenrow' if index % 2 == 0 else 'oddrow'
-            bg_tag = self._get_player_row_background_tag(p_data, zebra_tag) # Get background tag for this player row
-            self.players_tree.insert('', 'end', values=(p_data['player_name'], p_data['server_name'], p_data['map'], p_data['frags'], p_data['ping'], p_data.get('team', 'N/A')), tags=(bg_tag,))
-        print(f"Inserted {len(filtered_players)} items into 'Players' tree after filtering.")
+        self.player_search_applied = search_term
+        matches = self.player_search_index.search(search_term)
+        self.players_view.apply([self._player_row(player_key) for player_key in self.player_order if player_key in matches])
+        print(f"Inserted {len(matches)} items into 'Players' tree after filtering.")
 
 
     def _add_to_favorites_action(self):
-        selected_items = self.all_servers_tree.selection()
-        if not selected_items: self.gui_queue.put((messagebox.showinfo, ("Add to Favorites", "Please select one or more servers to add to favorites."), {})); return
+        selected_keys = self.all_servers_view.selected_keys()
+        if not selected_keys: self.gui_queue.put((messagebox.showinfo, ("Add to Favorites", "Please select one or more servers to add to favorites."), {})); return
         added_count, duplicate_count, not_found_count = 0, 0, 0
-        for item_id in selected_items:
-            found_key = next((key for key, tree_item_id in self.all_servers_items.items() if tree_item_id == item_id), None)
+        state, keys_to_add = self.server_state.state, []
+        for found_key in selected_keys:
             if found_key:
-                if found_key not in self.favorite_servers_data:
-                    server_info_to_add = self.server_data.get(found_key)
-                    if server_info_to_add: self.favorite_servers_data[found_key] = server_info_to_add.copy(); added_count += 1
+                if found_key not in state.favorites:
+                    if found_key in state.records: keys_to_add.append(found_key); added_count += 1
                     else: not_found_count += 1
                 else: duplicate_count += 1
             else: not_found_count += 1
-        self._update_favorites_tree_display(); self._save_favorites()
+        if keys_to_add: self.server_state.update(lambda state: {'favorites': {**state.favorites, **{server_key: state.records[server_key] for server_key in keys_to_add if server_key in state.records}}})
+        self._update_favorites_tree_display(); self._save_snapshot(); self._sync_monitor()
         feedback_message = []; 
         if added_count > 0: feedback_message.append(f"{added_count} server(s) added.")
         if duplicate_count > 0: feedback_message.append(f"{duplicate_count} server(s) already in favorites.")
@@ -1027,16 +1720,17 @@ class QuakeWorldGUI:
 
 
     def _remove_from_favorites_action(self):
-        selected_items = self.favorites_tree.selection()
-        if not selected_items: self.gui_queue.put((messagebox.showinfo, ("Remove from Favorites", "Please select one or more servers to remove from favorites."), {})); return
+        selected_keys = self.favorites_view.selected_keys()
+        if not selected_keys: self.gui_queue.put((messagebox.showinfo, ("Remove from Favorites", "Please select one or more servers to remove from favorites."), {})); return
         removed_count, not_in_favorites_count, not_found_count = 0, 0, 0
-        for item_id in selected_items:
-            found_key = next((key for key, tree_item_id in self.favorites_items.items() if tree_item_id == item_id), None)
+        state, keys_to_remove = self.server_state.state, set()
+        for found_key in selected_keys:
             if found_key:
-                if found_key in self.favorite_servers_data: del self.favorite_servers_data[found_key]; removed_count += 1
+                if found_key in state.favorites: keys_to_remove.add(found_key); removed_count += 1
                 else: not_in_favorites_count += 1
             else: not_found_count += 1
-        self._update_favorites_tree_display(); self._save_favorites()
+        if keys_to_remove: self.server_state.update(lambda state: {'favorites': {server_key: record for server_key, record in state.favorites.items() if server_key not in keys_to_remove}})
+        self._update_favorites_tree_display(); self._save_snapshot(); self._sync_monitor()
         feedback_message = []; 
         if removed_count > 0: feedback_message.append(f"{removed_count} server(s) removed.")
         if not_in_favorites_count > 0: feedback_message.append(f"{not_in_favorites_count} server(s) were not in favorites.")
@@ -1045,37 +1739,27 @@ class QuakeWorldGUI:
 
 
     def _update_favorites_tree_display(self):
-        self.favorites_tree.delete(*self.favorites_tree.get_children())
-        self.favorites_items = {}
-        displayable_favorites = list(self.favorite_servers_data.values())
-        displayable_favorites.sort(key=lambda x: str(x.get('display_hostname', '')).lower())
-        for index, data in enumerate(displayable_favorites):
-            server_key = (data['original_ip'], data['port'])
-            values = (data['display_hostname'], data['port'], data['ping'], data['map'], data['players_count'])
-            tag = 'evenrow' if index % 2 == 0 else 'oddrow'
-            item_id = self.favorites_tree.insert('', 'end', values=values, tags=(tag,))
-            self.favorites_items[server_key] = item_id
+        displayable_favorites = list(self.server_state.state.favorites.items())
+        displayable_favorites.sort(key=lambda x: str(x[1].display_hostname).lower())
+        self.favorites_view.apply(self._server_tree_rows(displayable_favorites, styled=False))
 
 
     def _copy_selected_address_to_clipboard(self):
         current_tab_id = self.notebook.select()
-        tree_to_use, items_map = None, None
-        if current_tab_id == self.all_servers_frame._w: tree_to_use, items_map = self.all_servers_tree, self.all_servers_items
-        elif current_tab_id == self.favorites_frame._w: tree_to_use, items_map = self.favorites_tree, self.favorites_items
+        if current_tab_id == self.all_servers_frame._w: view = self.all_servers_view
+        elif current_tab_id == self.favorites_frame._w: view = self.favorites_view
         else: self.gui_queue.put((messagebox.showerror, ("Error", "No active server list found to copy from."), {})); return
-        selected_item = tree_to_use.focus()
-        if not selected_item: self.gui_queue.put((messagebox.showinfo, ("Copy Address", "Please select a server to copy its address."), {})); return
-        found_key = next((key for key, item_id in items_map.items() if item_id == selected_item), None)
-        if found_key:
-            address_to_copy = f"{found_key[0]}:{found_key[1]}"
-            self.root.clipboard_clear(); self.root.clipboard_append(address_to_copy)
-            self.gui_queue.put((messagebox.showinfo, ("Copy Address", f"'{address_to_copy}' copied to clipboard."), {}))
-        else: self.gui_queue.put((messagebox.showerror, ("Error", "Could not identify the selected server to copy address."), {}))
+        found_key = view.focused_key()
+        if not found_key: self.gui_queue.put((messagebox.showinfo, ("Copy Address", "Please select a server to copy its address."), {})); return
+        address_to_copy = f"{found_key[0]}:{found_key[1]}"
+        self.root.clipboard_clear(); self.root.clipboard_append(address_to_copy)
+        self.gui_queue.put((messagebox.showinfo, ("Copy Address", f"'{address_to_copy}' copied to clipboard."), {}))
 
 
     def connect_to_server(self, address, port):
         client_exec = "ezquake-gl.exe"
         command = [client_exec, f"+connect {address}:{port}"]
+        import subprocess
         try:
             subprocess.Popen(command, shell=True)
             self.gui_queue.put((messagebox.showinfo, ("Launch Client", f"Attempting to connect to {address}:{port} with '{client_exec}'..."), {}))
@@ -1086,24 +1770,47 @@ class QuakeWorldGUI:
     def _on_detail_window_closing_handler(self, server_key):
         if server_key in self.open_detail_windows:
             detail_info = self.open_detail_windows[server_key]
-            if detail_info['window'].winfo_exists():
-                if detail_info['refresh_job_id'] is not None: detail_info['window'].after_cancel(detail_info['refresh_job_id'])
-                detail_info['window'].destroy()
+            self.monitor.unpin(server_key)
+            if detail_info['window'].winfo_exists(): detail_info['window'].destroy()
             del self.open_detail_windows[server_key]
 
 
-    def _update_detail_view(self, server_key, server_detail_data):
+    def _format_ping_details(self, server_detail_data):
+        stats = server_detail_data.ping_stats
+        if not stats or stats.get('median') is None or stats.get('received', 0) < 2: return format_ping_cell(server_detail_data)
+        return f"{stats['median']:.2f} (min {stats['min']:.2f}, p95 {stats['p95']:.2f}, jitter {stats['jitter']:.2f}, loss {stats['loss']:.0f}%)"
+
+    def _format_history_details(self, server_key):
+        average_ping = self.ping_history.average_ping(server_key, 24)
+        if average_ping is None: return "No ping history yet"
+        peak_hours = self.ping_history.peak_player_hours(server_key)
+        busiest = f", busiest at {', '.join(f'{hour:02d}:00' for hour, _ in peak_hours)}" if peak_hours else ""
+        return f"24 h average ping {average_ping:.1f} ms{busiest}"
+
+    def _history_text(self, server_key):
+        """The history line for a detail window, cached for DETAIL_HISTORY_TTL; queries SQLite, so only call it off the Tk thread."""
+        cached = self.history_texts.get(server_key)
+        if cached is not None and time.monotonic() - cached[1] < DETAIL_HISTORY_TTL: return cached[0]
+        try: text = self._format_history_details(server_key)
+        except HistoryError as e: logger.error(f"Error reading ping history for {server_key[0]}:{server_key[1]}: {e}"); text = "Ping history unavailable"
+        self.history_texts[server_key] = (text, time.monotonic())
+        return text
+
+    def _update_detail_view(self, server_key, server_detail_data, history_text=None):
+        """Fills a detail window; without `history_text` (from _history_text) the last cached history line is shown."""
         if self.stop_event.is_set() or server_key not in self.open_detail_windows or not self.open_detail_windows[server_key]['window'].winfo_exists(): return
+        if history_text is None: history_text = self.history_texts.get(server_key, ("Loading ping history...", None))[0]
         detail_window_ref = self.open_detail_windows[server_key]['window']
         info_frame_ref = detail_window_ref._info_frame
         players_label_ref = detail_window_ref._players_on_server_label
         detail_labels_ref = detail_window_ref._detail_labels
         detail_player_tree_ref = detail_window_ref._detail_player_tree
         
-        detail_window_ref.title(f"Details for {server_detail_data.get('display_hostname', 'N/A')}:{server_detail_data.get('port', 'N/A')}")
+        if server_detail_data is not None: detail_window_ref.title(f"Details for {server_detail_data.display_hostname}:{server_detail_data.port}")
 
-        if not server_detail_data or server_detail_data['ping'].startswith('Error'):
+        if server_detail_data is None or server_detail_data.error is not None:
             for label_key in detail_labels_ref: detail_labels_ref[label_key].config(text="N/A", foreground=ERROR_COLOR)
+            detail_labels_ref['history'].config(text=history_text, foreground=DARK_FG)
             for item in detail_player_tree_ref.get_children(): detail_player_tree_ref.delete(item)
             
             detail_window_ref.update_idletasks()
@@ -1118,20 +1825,20 @@ class QuakeWorldGUI:
             detail_window_ref.geometry(f"{current_width}x{int(total_dynamic_height)}")
             return
 
-        detail_labels_ref['name'].config(text=f"{server_detail_data.get('display_hostname', 'N/A')}", foreground=DARK_FG)
-        detail_labels_ref['ip'].config(text=f"{server_detail_data.get('original_ip', 'N/A')}:{server_detail_data.get('port', 'N/A')}", foreground=DARK_FG)
-        ping_fg_color = ERROR_COLOR if server_detail_data.get('ping', '').startswith('Error') else DARK_FG
-        detail_labels_ref['ping'].config(text=f"{server_detail_data.get('ping', 'N/A')}", foreground=ping_fg_color)
-        detail_labels_ref['map'].config(text=f"{server_detail_data.get('map', 'N/A')}", foreground=DARK_FG)
-        detail_labels_ref['mode'].config(text=f"{server_detail_data.get('mode', 'N/A')}", foreground=DARK_FG)
-        detail_labels_ref['players_count'].config(text=f"{server_detail_data.get('players_count', 'N/A')}", foreground=DARK_FG)
-        detail_labels_ref['spectators_count'].config(text=f"{server_detail_data.get('spectators_count', 'N/A')}", foreground=DARK_FG)
+        detail_labels_ref['name'].config(text=f"{server_detail_data.display_hostname}", foreground=DARK_FG)
+        detail_labels_ref['ip'].config(text=f"{server_detail_data.original_ip}:{server_detail_data.port}", foreground=DARK_FG)
+        detail_labels_ref['ping'].config(text=self._format_ping_details(server_detail_data), foreground=DARK_FG)
+        detail_labels_ref['map'].config(text=f"{_or_na(server_detail_data.map)}", foreground=DARK_FG)
+        detail_labels_ref['mode'].config(text=f"{_or_na(server_detail_data.mode)}", foreground=DARK_FG)
+        detail_labels_ref['players_count'].config(text=f"{_or_na(server_detail_data.players_count)}", foreground=DARK_FG)
+        detail_labels_ref['spectators_count'].config(text=f"{_or_na(server_detail_data.spectators_count)}", foreground=DARK_FG)
         match_status_text = self._get_match_status_text(server_detail_data)
         match_status_color = self._get_match_status_color(server_detail_data)
         detail_labels_ref['match_status'].config(text=f"{match_status_text}", foreground=match_status_color)
+        detail_labels_ref['history'].config(text=history_text, foreground=DARK_FG)
 
         for item in detail_player_tree_ref.get_children(): detail_player_tree_ref.delete(item)
-        self._insert_players_into_tree(detail_player_tree_ref, server_detail_data.get('players', []))
+        self._insert_players_into_tree(detail_player_tree_ref, server_detail_data.players)
 
         detail_window_ref.update_idletasks() # Force update to get accurate heights
 
@@ -1145,60 +1852,18 @@ class QuakeWorldGUI:
         detail_window_ref.geometry(f"{current_width}x{int(total_dynamic_height)}")
 
 
-    def _auto_refresh_details_handler(self, server_key):
-        if self.stop_event.is_set() or server_key not in self.open_detail_windows or not self.open_detail_windows[server_key]['window'].winfo_exists(): return
-        detail_window_ref = self.open_detail_windows[server_key]['window']
-        actual_ip, port = server_key
-        Thread(target=self._ping_and_update_detail_modal, args=(server_key, actual_ip, port), name=f"DetailRefresh-{actual_ip}:{port}").start()
-        refresh_job_id = detail_window_ref.after(2000, self._auto_refresh_details_handler, server_key) 
-        self.open_detail_windows[server_key]['refresh_job_id'] = refresh_job_id
-
-
-    def _ping_and_update_detail_modal(self, server_key, actual_ip, port):
-        err, response, ping_time = udp_command(actual_ip, port, 'status 31\0')
-        current_server_data = {}
-        initial_display_name = self.server_data.get(server_key, {}).get('display_hostname', "N/A")
-
-        if err:
-            current_server_data = {
-                'original_ip': actual_ip, 'display_hostname': initial_display_name,
-                'port': port, 'ping': f"Error: {err['error']}", 'map': 'N/A',
-                'players_count': 'N/A', 'spectators_count': 'N/A',
-                'players': [], 'mode': 'N/A'
-            }
-        else:
-            server_info = parse_status_response(response)
-            if 'error' in server_info:
-                current_server_data = {
-                    'original_ip': actual_ip, 'display_hostname': initial_display_name,
-                    'port': port, 'ping': f"Error: {server_info['error']}", 'map': 'N/A',
-                    'players_count': 'N/A', 'spectators_count': 'N/A',
-                    'players': [], 'mode': 'N/A'
-                }
-            else:
-                hostname_from_server = server_info.get('hostname')
-                map_name = server_info.get('map', 'N/A')
-                gamemode_from_server = server_info.get('mode', 'N/A')
-                resolved_display_name = hostname_from_server if hostname_from_server and hostname_from_server.strip() else initial_display_name
-                all_players = server_info.get('players', [])
-                spectators = [p for p in all_players if p.get('frags') == 'S']
-                players_count = len(all_players) - len(spectators)
-                current_server_data = {
-                    'original_ip': actual_ip, 'display_hostname': resolved_display_name,
-                    'port': port, 'ping': f"{ping_time:.2f}", 'map': map_name,
-                    'players_count': players_count, 'spectators_count': len(spectators),
-                    'players': all_players, 'mode': gamemode_from_server
-                }
-        with self.gui_lock:
-            self.server_data[server_key] = current_server_data.copy()
-            if server_key in self.favorite_servers_data: self.favorite_servers_data[server_key].update(current_server_data)
-        self.gui_queue.put((self._update_detail_view, (server_key, current_server_data), {}))
+    def _store_scheduled_probe_result(self, server_key, err, response, ping_time):
+        """ProbeScheduler callback (detail windows and background monitoring); runs on ProbeSchedulerThread."""
+        previous_record = self.server_state.state.records.get(server_key)
+        initial_display_name = previous_record.display_hostname if previous_record else "N/A"
+        ping_stats = latency_stats([ping_time] if ping_time is not None else [], 1)
+        self._store_probe_result(initial_display_name, server_key[1], server_key[0], err, response, ping_time, ping_stats, scheduled=True)
 
     def _insert_players_into_tree(self, treeview, players_data):
-        actual_players = [p for p in players_data if p.get('frags') != 'S']
-        spectators = [p for p in players_data if p.get('frags') == 'S']
-        actual_players.sort(key=lambda x: (-x.get('frags', 0) if isinstance(x.get('frags'), int) else 0, x.get('name', '').lower()))
-        spectators.sort(key=lambda x: x.get('name', '').lower())
+        actual_players = [p for p in players_data if not p.is_spectator]
+        spectators = [p for p in players_data if p.is_spectator]
+        actual_players.sort(key=lambda x: (-x.frags if isinstance(x.frags, int) else 0, x.name.lower()))
+        spectators.sort(key=lambda x: x.name.lower())
 
         num_players_to_show = len(actual_players) + len(spectators)
         treeview.config(height=min(MAX_VISIBLE_PLAYER_ROWS_IN_MODAL, max(1, num_players_to_show)))
@@ -1206,11 +1871,11 @@ class QuakeWorldGUI:
         for index, p_data in enumerate(actual_players):
             zebra_tag = 'evenrow' if index % 2 == 0 else 'oddrow'
             bg_tag = self._get_player_row_background_tag(p_data, zebra_tag)
-            treeview.insert('', 'end', values=(p_data.get('name', 'N/A'), p_data.get('frags', 'N/A'), p_data.get('time', 'N/A'), p_data.get('ping', 'N/A'), p_data.get('team', 'N/A')), tags=(bg_tag,))
+            treeview.insert('', 'end', values=(p_data.name, p_data.frags_display, p_data.time, p_data.ping, p_data.team), tags=(bg_tag,))
         for index, p_data in enumerate(spectators):
             zebra_tag = 'evenrow' if index % 2 == 0 else 'oddrow'
             bg_tag = self._get_player_row_background_tag(p_data, zebra_tag)
-            treeview.insert('', 'end', values=(p_data.get('name', 'N/A'), p_data.get('frags', 'S'), p_data.get('time', 'N/A'), p_data.get('ping', 'N/A'), p_data.get('team', 'N/A')), tags=(bg_tag,))
+            treeview.insert('', 'end', values=(p_data.name, p_data.frags_display, p_data.time, p_data.ping, p_data.team), tags=(bg_tag,))
 
 
     def _on_tab_select(self, event=None):
@@ -1226,24 +1891,20 @@ class QuakeWorldGUI:
 
     def show_server_details(self, event):
         current_tab_id = self.notebook.select()
-        tree_to_use, items_map = None, None
+        tree_to_use, view = None, None
 
-        if current_tab_id == self.all_servers_frame._w: tree_to_use, items_map = self.all_servers_tree, self.all_servers_items
-        elif current_tab_id == self.favorites_frame._w: tree_to_use, items_map = self.favorites_tree, self.favorites_items
+        if current_tab_id == self.all_servers_frame._w: tree_to_use, view = self.all_servers_tree, self.all_servers_view
+        elif current_tab_id == self.favorites_frame._w: tree_to_use, view = self.favorites_tree, self.favorites_view
         elif current_tab_id == self.players_frame._w:
-            selected_item = self.players_tree.focus()
-            if selected_item:
-                player_values = self.players_tree.item(selected_item)['values']
-                server_name_to_search = player_values[1]
-                server_key_to_open = next((s_key for s_key, s_data in self.server_data.items() if s_data.get('display_hostname') == server_name_to_search), None)
-                if server_key_to_open: self._open_detail_window_for_key(server_key_to_open)
-                else: self.gui_queue.put((messagebox.showinfo, ("Server Not Found", f"Could not find server details for '{server_name_to_search}'."), {})); return
+            player_key = self.players_view.focused_key()
+            if player_key:
+                server_key_to_open = player_key[0]
+                if server_key_to_open in self.server_state.state.records: self._open_detail_window_for_key(server_key_to_open)
+                else: self.gui_queue.put((messagebox.showinfo, ("Server Not Found", f"Could not find server details for {server_key_to_open[0]}:{server_key_to_open[1]}."), {})); return
             return
         
-        if tree_to_use and items_map:
-            selected_item = tree_to_use.focus()
-            if not selected_item: return
-            found_key = next((key for key, item_id in items_map.items() if item_id == selected_item), None)
+        if tree_to_use and len(view):
+            found_key = view.focused_key()
             if not found_key: self.gui_queue.put((messagebox.showerror, ("Error", "Could not find server details for the selected item."), {})); return
             self._open_detail_window_for_key(found_key)
         else: return
@@ -1258,8 +1919,9 @@ class QuakeWorldGUI:
         
         detail_window.transient(self.root) 
 
-        initial_display_hostname = self.server_data[server_key].get('display_hostname', 'N/A')
-        port = self.server_data[server_key].get('port', 'N/A')
+        state = self.server_state.state
+        initial_server_data = state.records.get(server_key) or state.favorites[server_key]
+        initial_display_hostname, port = initial_server_data.display_hostname, initial_server_data.port
         detail_window.title(f"Details for {initial_display_hostname}:{port}")
 
         info_frame = ttk.Frame(detail_window, style='TFrame')
@@ -1295,8 +1957,12 @@ class QuakeWorldGUI:
         detail_window._detail_labels['match_status'] = ttk.Label(info_frame, text="N/A", anchor='w', style='TLabel'); detail_window._detail_labels['match_status'].grid(row=row_idx, column=1, sticky='ew', padx=2, pady=1)
         row_idx += 1
 
-        refresh_interval_milliseconds = 2000; refresh_interval_seconds = refresh_interval_milliseconds / 1000
-        ttk.Label(info_frame, text=f"Auto-refresh: {refresh_interval_seconds:.0f} seconds", font=('TkDefaultFont', 8, 'italic'), foreground=DARK_FG, anchor='w', style='TLabel').grid(row=row_idx, column=0, columnspan=4, sticky='ew', padx=2, pady=5)
+        ttk.Label(info_frame, text="History:", style='TLabel').grid(row=row_idx, column=0, sticky='w', padx=2, pady=1)
+        detail_window._detail_labels['history'] = ttk.Label(info_frame, text="N/A", anchor='w', style='TLabel'); detail_window._detail_labels['history'].grid(row=row_idx, column=1, columnspan=3, sticky='ew', padx=2, pady=1)
+        row_idx += 1
+
+        detail_window._refresh_label = ttk.Label(info_frame, text=f"Auto-refresh: {self._detail_refresh_seconds():g} seconds", font=('TkDefaultFont', 8, 'italic'), foreground=DARK_FG, anchor='w', style='TLabel')
+        detail_window._refresh_label.grid(row=row_idx, column=0, columnspan=4, sticky='ew', padx=2, pady=5)
 
         content_frame = ttk.Frame(detail_window, style='TFrame')
         content_frame.pack(padx=10, pady=5, fill='both', expand=True)
@@ -1320,13 +1986,9 @@ class QuakeWorldGUI:
         
         detail_window._detail_player_tree.grid(row=1, column=0, sticky='nsew', pady=(0, 5))
 
-        initial_server_data = self.server_data.get(server_key, {}); self._update_detail_view(server_key, initial_server_data)
-        actual_ip, port = server_key
-        Thread(target=self._ping_and_update_detail_modal, args=(server_key, actual_ip, port), name=f"ImmediateDetailPing-{actual_ip}:{port}").start()
-        
-        refresh_job_id = detail_window.after(2000, self._auto_refresh_details_handler, server_key) 
-        
-        self.open_detail_windows[server_key] = {'window': detail_window, 'refresh_job_id': refresh_job_id}
+        self._update_detail_view(server_key, initial_server_data)
+        self.open_detail_windows[server_key] = {'window': detail_window}
+        self.monitor.pin(server_key, self._detail_refresh_seconds())
         detail_window.protocol("WM_DELETE_WINDOW", lambda: self._on_detail_window_closing_handler(server_key))
 
 
@@ -1336,21 +1998,20 @@ class QuakeWorldGUI:
 
     def update_server_display(self, server_key, values_for_treeview):
         if self.stop_event.is_set() or not self.root.winfo_exists(): return
-        with self.gui_lock:
-            for tree, items_map in [(self.all_servers_tree, self.all_servers_items), (self.favorites_tree, self.favorites_items)]:
-                item_id = items_map.get(server_key)
-                if item_id:
-                    tags_to_apply_list = [('evenrow' if (list(items_map.keys()).index(server_key)) % 2 == 0 else 'oddrow')]
-                    
-                    server_info = self.server_data.get(server_key, {}) 
-                    
-                    if server_info.get('ping', 'N/A').startswith('Error') or server_info.get('ping') == 'N/A': tags_to_apply_list.append('ping_error')
-                    else:
-                        match_status_tag = self._get_match_status_tag(server_info)
-                        if match_status_tag: tags_to_apply_list.append(match_status_tag)
-                        else: tags_to_apply_list.append(self._get_ping_color_tag(server_info.get('ping', 'N/A')))
-
-                    tree.item(item_id, values=values_for_treeview, image='', tags=tuple(tags_to_apply_list))
+        state = self.server_state.state
+        server_info = state.records.get(server_key)
+        for view in (self.all_servers_view, self.favorites_view):
+            if server_key in view:
+                tags_to_apply_list = [view.zebra_tag(server_key)]
+
+                if server_key in state.stale: tags_to_apply_list.append('stale')
+                elif server_info is None or server_info.ping is None: tags_to_apply_list.append('ping_error')
+                else:
+                    match_status_tag = self._get_match_status_tag(server_info)
+                    if match_status_tag: tags_to_apply_list.append(match_status_tag)
+                    else: tags_to_apply_list.append(self._get_ping_color_tag(server_info))
+
+                view.update_row(server_key, values_for_treeview, tags_to_apply_list)
 
 
 def main():
@@ -0,0 +1,1703 @@
+"""GUI-free core of the browser: server lists, UDP status probing, reply parsing and the JSON files.
+
+Nothing in here imports tkinter, so it can be used on headless machines; main.py
+builds the Tk interface on top of it and qwscan.py is the command line scanner.
+requests and concurrent.futures are only imported when first needed, which keeps
+them off the GUI's startup path.
+"""
+import socket
+import time
+import os
+import tempfile
+import re
+from threading import Lock, Thread, local
+import json
+import logging
+import sys
+import enum
+import codecs
+import selectors
+import heapq
+import itertools
+import math
+import statistics
+import struct
+import random
+from collections import deque, namedtuple
+from collections.abc import Mapping, ItemsView, ValuesView
+from types import MappingProxyType
+
+
+logger = logging.getLogger(__name__)
+
+
+
+
+RTO_INITIAL = 1.0
+RTO_MIN = 0.15
+RTO_MAX = 1.5
+RTT_ALPHA = 0.125
+RTT_BETA = 0.25
+RTT_CLOCK_GRANULARITY = 0.01
+SCAN_SEND_BATCH = 32
+PROBE_INTERVAL = 0.02
+DEFAULT_PROBES_PER_SERVER = 3
+SCAN_RECV_BUFFER_BYTES = 1 << 20
+STATUS_MAX_DATAGRAM = 65535
+SCHEDULER_EXTERNAL_RESULT_WAIT = 30.0
+SCHEDULER_MAX_WAIT = 1.0
+MONITOR_TIERS = ('watched', 'favorite', 'populated', 'empty', 'unreachable')
+DEFAULT_MONITOR_INTERVALS = {'watched': 10.0, 'favorite': 30.0, 'populated': 60.0, 'empty': 300.0, 'unreachable': 900.0}
+DEFAULT_MONITOR_PROBES_PER_SECOND = 20.0
+FAVORITES_FILE = 'favorites.json'
+LOCAL_SERVER_LIST_FILE = 'eu-sv.txt'
+SERVERS_CACHE_FILE = 'servers_cache.json'
+SERVER_LIST_META_FILE = 'servers_list_meta.json'
+IGNORED_SERVER_PORTS = (28000, 30000)
+
+
+MASTER_SERVER_PORT = 27000
+DEFAULT_MASTER_SERVERS = 'master.quakeservers.net:27000, qwmaster.ocrana.de:27000, master.quakeworld.nu:27000, qwmaster.fodquake.net:27000'
+MASTER_QUERY = b'c\n'
+MASTER_REPLY_HEADER = b'\xFF\xFF\xFF\xFFd\n'
+MASTER_QUERY_TIMEOUT = 3.0
+MASTER_IDLE_TIMEOUT = 0.5
+MASTER_MAX_DATAGRAM = 65535
+
+
+HTTP_TIMEOUT = 10
+HTTP_POOL_SIZE = 4
+
+
+DNS_CACHE_TTL = 300.0
+DNS_NEGATIVE_CACHE_TTL = 30.0
+DNS_MAX_WORKERS = 16
+
+SERVER_STATE_SHARDS = 64
+
+PLAYER_SEARCH_GRAM = 3
+PLAYER_JOIN, PLAYER_LEAVE, PLAYER_RENAME, PLAYER_UPDATE = 'join', 'leave', 'rename', 'update'
+PRESENCE_JOINED, PRESENCE_LEFT = 'joined', 'left'
+WATCH_REGEX_PREFIX = 're:'
+
+PACER_RATE = 1000.0
+PACER_BURST = 100
+PACER_MIN_RATE = 50.0
+PACER_PER_IP_RATE = 25.0
+PACER_PER_IP_BURST = 4
+PACER_LOSS_WINDOW = 200
+PACER_ADJUST_EVERY = 25
+PACER_LOSS_BACKOFF = 0.10
+PACER_LOSS_RECOVER = 0.02
+PACER_DECREASE = 0.5
+PACER_IP_BUCKETS_MAX = 4096
+PACER_HELD_NS = 1_000_000
+
+
+
+CHARSET = {
+    0: 46, 1: 35, 2: 35, 3: 35, 4: 35, 5: 46, 6: 35, 7: 35, 8: 35, 9: 35,
+    11: 35, 12: 32, 13: 62, 14: 46, 15: 46, 16: 91, 17: 93, 18: 48, 19: 49,
+    20: 50, 21: 51, 22: 52, 23: 53, 24: 54, 25: 55, 26: 56, 27: 57, 28: 46,
+    29: 32, 30: 32, 31: 32, 127: 32, 128: 40, 129: 61, 130: 41, 131: 35,
+    132: 35, 133: 46, 134: 35, 135: 35, 136: 35, 137: 35, 139: 35, 140: 32,
+    141: 62, 142: 46, 143: 46,
+}
+
+
+
+def _quake_char(byte):
+    if 31 < byte < 127: return byte
+    if 143 < byte < 255: byte -= 128
+    return CHARSET.get(byte, byte)
+
+
+# 256-entry bytes.translate table equivalent to mapping every byte through _quake_char. The decoding
+# table is the same mapping for codecs.charmap_decode, which reads straight from a memoryview; bytes
+# that still fall outside ASCII map to U+FFFE ("undefined") and are dropped by errors='ignore'.
+QUAKE_CHAR_TABLE = bytes(_quake_char(byte) for byte in range(256))
+QUAKE_CHAR_DECODING_TABLE = ''.join(chr(char) if char < 128 else '\ufffe' for char in QUAKE_CHAR_TABLE)
+# str.translate table folding raw Quake characters (red/gold high-bit letters, brackets and digits) left in
+# a name that was not decoded through the tables above to their plain ASCII look-alikes.
+PLAYER_NAME_FOLD_TABLE = {byte: chr(char) if char < 128 else None for byte, char in enumerate(QUAKE_CHAR_TABLE) if byte != char}
+# ezQuake/MVDSV colour markup inside names: &cRGB starts a coloured run, &r ends it.
+PLAYER_NAME_COLOR_RE = re.compile(r'&c[0-9a-fA-F]{3}|&r')
+
+STATUS_REPLY_HEADER = b'\xFF\xFF\xFF\xFFn'
+STATUS_TEXT_KEYS = ('hostname', 'map', 'mode')
+PLAYER_LINE_RE = re.compile(r'^(-?\d+)\s+(-?[S\d]+)\s+(-?\d+)\s+(-?\d+)\s*\s*"(.*?)"\s*"(.*?)"\s*(\d+)\s*(\d+)(?:\s"(.*?)"|$)')
+
+
+def quake_chars(data):
+    return data.translate(QUAKE_CHAR_TABLE)
+
+
+def normalize_player_name(name):
+    """Folds a player name, or search text, to the form player search compares: no colour markup, Quake characters as ASCII, casefolded."""
+    return PLAYER_NAME_COLOR_RE.sub('', name).translate(PLAYER_NAME_FOLD_TABLE).casefold()
+
+
+class DnsResolver:
+    """Thread-safe hostname -> IPv4 cache with a TTL for answers and a shorter one for failures."""
+
+    def __init__(self, ttl=DNS_CACHE_TTL, negative_ttl=DNS_NEGATIVE_CACHE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache = {}
+        self._lock = Lock()
+
+    def _cached(self, hostname):
+        with self._lock: entry = self._cache.get(hostname)
+        if entry is not None and entry[2] > time.monotonic(): return entry
+        return None
+
+    def resolve(self, hostname):
+        """Returns the IPv4 address of `hostname`, raising socket.gaierror (also served from cache) on failure."""
+        try: socket.inet_pton(socket.AF_INET, hostname); return hostname
+        except (OSError, ValueError): pass
+        entry = self._cached(hostname)
+        if entry is None:
+            try: entry = (socket.gethostbyname(hostname), None, time.monotonic() + self.ttl)
+            except socket.gaierror as e: entry = (None, e.args, time.monotonic() + self.negative_ttl)
+            with self._lock: self._cache[hostname] = entry
+        if entry[0] is None: raise socket.gaierror(*entry[1])
+        return entry[0]
+
+    def resolve_many(self, hostnames, max_workers=DNS_MAX_WORKERS):
+        """Resolves each unique hostname once, concurrently. Returns {hostname: ip or None}."""
+        def resolve_or_none(hostname):
+            try: return self.resolve(hostname)
+            except socket.gaierror: return None
+
+        unique_hostnames = list(dict.fromkeys(hostnames))
+        if not unique_hostnames: return {}
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_hostnames)), thread_name_prefix="DnsResolver") as pool:
+            return dict(zip(unique_hostnames, pool.map(resolve_or_none, unique_hostnames)))
+
+    def clear(self):
+        with self._lock: self._cache.clear()
+
+
+dns_resolver = DnsResolver()
+
+
+def rtt_estimator_update(rtt_state, sample_ms):
+    """Folds one RTT sample into a TCP-style (RFC 6298) estimator and returns the new state.
+
+    The state is a plain dict ({'srtt', 'rttvar', 'rto'}, in seconds) so it can live
+    in a ServerRecord and round-trip through servers_cache.json.
+    """
+    sample = sample_ms / 1000.0
+    if not rtt_state or rtt_state.get('srtt') is None:
+        srtt, rttvar = sample, sample / 2
+    else:
+        rttvar = (1 - RTT_BETA) * rtt_state['rttvar'] + RTT_BETA * abs(rtt_state['srtt'] - sample)
+        srtt = (1 - RTT_ALPHA) * rtt_state['srtt'] + RTT_ALPHA * sample
+    rto = min(RTO_MAX, max(RTO_MIN, srtt + max(RTT_CLOCK_GRANULARITY, 4 * rttvar)))
+    return {'srtt': round(srtt, 5), 'rttvar': round(rttvar, 5), 'rto': round(rto, 5)}
+
+
+def rtt_estimator_backoff(rtt_state):
+    """Doubles the timeout after a lost probe, keeping the smoothed estimates."""
+    rtt_state = dict(rtt_state or {'srtt': None, 'rttvar': None, 'rto': RTO_INITIAL})
+    rtt_state['rto'] = min(RTO_MAX, max(RTO_MIN, rtt_state.get('rto') or RTO_INITIAL) * 2)
+    return rtt_state
+
+
+def probe_timeout(rtt_state):
+    if not rtt_state or not rtt_state.get('rto'): return RTO_INITIAL
+    return min(RTO_MAX, max(RTO_MIN, rtt_state['rto']))
+
+
+def next_rtt_state(rtt_state, err, ping_time):
+    if err is None and ping_time is not None: return rtt_estimator_update(rtt_state, ping_time)
+    if err is not None and err.get('error') == 'timeout': return rtt_estimator_backoff(rtt_state)
+    return rtt_state
+
+
+def format_ping_cell(server_info):
+    ping = server_info.ping_text
+    stats = server_info.ping_stats
+    if stats and stats.get('median') is not None and stats.get('loss'): return f"{ping} ({stats['loss']:.0f}% loss)"
+    return ping
+
+
+def ping_sort_value(server_info):
+    stats = server_info.ping_stats
+    if stats and stats.get('median') is not None: return stats['median']
+    return server_info.ping if server_info.ping is not None else float('inf')
+
+
+class TokenBucket:
+    """`rate` tokens per second on the perf_counter_ns clock, holding at most `burst`. Not thread-safe on its own."""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_ns')
+
+    def __init__(self, rate, burst, now_ns=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_ns = time.perf_counter_ns() if now_ns is None else now_ns
+
+    def refill(self, now_ns):
+        if now_ns > self.updated_ns:
+            self.tokens = min(self.burst, self.tokens + (now_ns - self.updated_ns) * self.rate / 1e9)
+            self.updated_ns = now_ns
+
+    def delay_ns(self, now_ns):
+        """Nanoseconds until a token is available (0: one can be taken now)."""
+        self.refill(now_ns)
+        if self.tokens >= 1: return 0
+        return int((1 - self.tokens) / self.rate * 1e9) + 1 if self.rate > 0 else 10 ** 18
+
+    def take(self, now_ns):
+        self.refill(now_ns)
+        self.tokens -= 1
+
+
+class ProbePacer:
+    """Spaces out outgoing probes so measured pings reflect the path, not our own bursts.
+
+    Every send needs a token from the global bucket and from the bucket of its
+    destination IP (many servers share a host). The global rate follows AIMD: every
+    PACER_ADJUST_EVERY outcomes the loss over the last PACER_LOSS_WINDOW is checked,
+    the rate is halved above PACER_LOSS_BACKOFF and grows back linearly below
+    PACER_LOSS_RECOVER. Only destinations that have answered before count towards
+    loss, so a list full of dead servers does not throttle the scan. stats() reports
+    the send queue: how long probes waited between being due and being sent, and how
+    many were held back by 1 ms or more. Thread-safe; rate=None disables the global bucket.
+    """
+
+    def __init__(self, rate=PACER_RATE, burst=PACER_BURST, per_ip_rate=PACER_PER_IP_RATE, per_ip_burst=PACER_PER_IP_BURST, min_rate=PACER_MIN_RATE):
+        self.per_ip_rate = per_ip_rate
+        self.per_ip_burst = per_ip_burst
+        self.min_rate = min_rate
+        self._lock = Lock()
+        self._ip_buckets = {}
+        self._answered = set()
+        self._outcomes = deque(maxlen=PACER_LOSS_WINDOW)
+        self._since_adjust = 0
+        self.set_rate(rate, burst)
+        self.reset_stats()
+
+    def set_rate(self, rate, burst=PACER_BURST):
+        """Sets the maximum global rate in probes per second (None: unlimited)."""
+        with self._lock:
+            self.max_rate = rate
+            self._global = TokenBucket(rate, burst) if rate else None
+
+    def reset_stats(self):
+        with self._lock:
+            self._sent = self._paced = self._backoffs = 0
+            self._queue_ns_total = self._queue_ns_max = 0
+
+    def global_delay_ns(self, now_ns):
+        with self._lock: return self._global.delay_ns(now_ns) if self._global is not None else 0
+
+    def ip_delay_ns(self, ip, now_ns):
+        with self._lock:
+            bucket = self._ip_buckets.get(ip)
+            return bucket.delay_ns(now_ns) if bucket is not None else 0
+
+    def consume(self, ip, now_ns, queued_ns=0):
+        """Takes the tokens for one probe to `ip` sent now, `queued_ns` after it was due."""
+        with self._lock:
+            if self._global is not None: self._global.take(now_ns)
+            bucket = self._ip_buckets.get(ip)
+            if bucket is None:
+                if len(self._ip_buckets) >= PACER_IP_BUCKETS_MAX: self._prune_ip_buckets(now_ns)
+                bucket = self._ip_buckets[ip] = TokenBucket(self.per_ip_rate, self.per_ip_burst, now_ns)
+            bucket.take(now_ns)
+            self._sent += 1
+            self._queue_ns_total += max(0, queued_ns)
+            self._queue_ns_max = max(self._queue_ns_max, queued_ns)
+            if queued_ns >= PACER_HELD_NS: self._paced += 1
+
+    def _prune_ip_buckets(self, now_ns):
+        """Drops buckets that have refilled completely; they behave exactly like new ones."""
+        for ip, bucket in list(self._ip_buckets.items()):
+            bucket.refill(now_ns)
+            if bucket.tokens >= bucket.burst: del self._ip_buckets[ip]
+
+    def wait(self, ip, stop_event=None):
+        """Blocks until a probe to `ip` may be sent and takes its tokens (for one-off probes like udp_command)."""
+        started_ns = now_ns = time.perf_counter_ns()
+        while True:
+            with self._lock:
+                delay_ns = max(self._global.delay_ns(now_ns) if self._global is not None else 0,
+                               self._ip_buckets[ip].delay_ns(now_ns) if ip in self._ip_buckets else 0)
+            if not delay_ns: break
+            if stop_event is None: time.sleep(delay_ns / 1e9)
+            elif stop_event.wait(delay_ns / 1e9): break
+            now_ns = time.perf_counter_ns()
+        self.consume(ip, now_ns, now_ns - started_ns)
+
+    def record(self, addr, answered):
+        """Feeds one probe outcome for (ip, port) `addr` into the loss estimate and adjusts the global rate."""
+        with self._lock:
+            if answered: self._answered.add(addr)
+            elif addr not in self._answered: return
+            self._outcomes.append(answered)
+            self._since_adjust += 1
+            if self._since_adjust < PACER_ADJUST_EVERY or self._global is None: return
+            self._since_adjust = 0
+            loss = self._outcomes.count(False) / len(self._outcomes)
+            if loss > PACER_LOSS_BACKOFF:
+                self._global.rate = max(self.min_rate, self._global.rate * PACER_DECREASE)
+                self._backoffs += 1
+                self._outcomes.clear()
+            elif loss < PACER_LOSS_RECOVER:
+                self._global.rate = min(self.max_rate, self._global.rate + self.max_rate / 20)
+
+    def stats(self):
+        with self._lock:
+            outcomes = len(self._outcomes)
+            return {
+                'sent': self._sent, 'paced': self._paced, 'rate': self._global.rate if self._global is not None else None,
+                'loss': round(self._outcomes.count(False) / outcomes, 3) if outcomes else 0.0, 'backoffs': self._backoffs,
+                'queue_avg_ms': round(self._queue_ns_total / self._sent / 1e6, 2) if self._sent else 0.0,
+                'queue_max_ms': round(self._queue_ns_max / 1e6, 2)
+            }
+
+    def describe(self):
+        stats = self.stats()
+        rate = 'unlimited' if stats['rate'] is None else f"{stats['rate']:.0f}/s"
+        return (f"{stats['sent']} probes sent, {stats['paced']} held back (send queue avg {stats['queue_avg_ms']} ms, max {stats['queue_max_ms']} ms), "
+                f"rate {rate}, loss {stats['loss'] * 100:.1f}%, {stats['backoffs']} backoffs")
+
+
+probe_pacer = ProbePacer()
+
+
+_receive_buffers = local()
+
+
+def _thread_receive_buffer():
+    """Returns this thread's reusable (bytearray, memoryview) pair sized for the largest datagram."""
+    buffers = getattr(_receive_buffers, 'buffers', None)
+    if buffers is None:
+        buffer = bytearray(STATUS_MAX_DATAGRAM)
+        buffers = _receive_buffers.buffers = (buffer, memoryview(buffer))
+    return buffers
+
+
+def udp_command(address, port, data, timeout=RTO_INITIAL, pacer=probe_pacer):
+    """Sends one probe and waits for the reply. The response is a memoryview into a per-thread
+    receive buffer: it stays valid until the same thread calls udp_command again. The send
+    waits for `pacer` (None: send at once)."""
+    client = None
+    ip_address = None
+    try:
+        try: ip_address = dns_resolver.resolve(address)
+        except socket.gaierror as e: return {"error": f"DNS resolution failed for {address}: {e}"}, None, None
+        if pacer is not None: pacer.wait(ip_address)
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.settimeout(timeout)
+        try: client.bind(('', 0))
+        except socket.error: pass
+        buf = b'\xFF\xFF\xFF\xFF' + data.encode('ascii')
+        send_ns = time.perf_counter_ns()
+        client.sendto(buf, (ip_address, port))
+        buffer, view = _thread_receive_buffer()
+        nbytes, server_addr = client.recvfrom_into(buffer)
+        ping_time_calc = (time.perf_counter_ns() - send_ns) / 1e6
+        if pacer is not None: pacer.record((ip_address, port), True)
+        return None, view[:nbytes], ping_time_calc
+    except socket.timeout:
+        if pacer is not None: pacer.record((ip_address, port), False)
+        return {"error": "timeout"}, None, None
+    except socket.error as e: return {"error": str(e)}, None, None
+    except Exception as e: return {"error": str(e)}, None, None
+    finally:
+        if client: client.close()
+
+
+def latency_stats(samples_ms, probes_sent):
+    """Summarises the RTT samples of one multi-probe run (all values in ms, loss in percent)."""
+    received = len(samples_ms)
+    loss = round(100.0 * (probes_sent - received) / probes_sent, 1) if probes_sent else 0.0
+    if not received:
+        return {'min': None, 'median': None, 'p95': None, 'jitter': None, 'loss': loss, 'sent': probes_sent, 'received': 0}
+    ordered = sorted(samples_ms)
+    p95 = ordered[min(received - 1, max(0, math.ceil(0.95 * received) - 1))]
+    jitter = statistics.mean(abs(b - a) for a, b in zip(samples_ms, samples_ms[1:])) if received > 1 else 0.0
+    return {
+        'min': round(ordered[0], 2), 'median': round(statistics.median(ordered), 2), 'p95': round(p95, 2),
+        'jitter': round(jitter, 2), 'loss': loss, 'sent': probes_sent, 'received': received
+    }
+
+
+def scan_servers(endpoints, data, timeout=RTO_INITIAL, on_result=None, stop_event=None, timeouts=None, probes=1, probe_interval=PROBE_INTERVAL, max_in_flight=None, pacer=None):
+    """Sends `data` to every (ip, port) in `endpoints` from a single non-blocking socket.
+
+    Each endpoint gets `probes` sequential probes, `probe_interval` seconds apart,
+    timed with perf_counter_ns. When an endpoint's last probe is answered or times
+    out it is reported through on_result(key, err, response, ping_ms, stats), where
+    ping_ms is the median RTT and stats comes from latency_stats. All endpoints are
+    probed concurrently, so the list completes in roughly `probes` timeout windows.
+    `timeouts` optionally maps a key to its own per-probe timeout in seconds, and
+    `max_in_flight` caps how many probes may be outstanding at once (None: no cap), and
+    `pacer` (a ProbePacer, None: no pacing) spaces the sends out globally and per IP.
+    Replies are read with recv_into into one preallocated datagram-sized buffer and
+    copied into a per-server bytearray that is reused across that server's probes and
+    handed out as `response`. Returns {key: (err, response, ping_ms, stats)}.
+    """
+    results = {}
+
+    def report(keys, err, response, ping_time, stats=None):
+        for key in keys:
+            results[key] = (err, response, ping_time, stats)
+            if on_result:
+                try: on_result(key, err, response, ping_time, stats)
+                except Exception as e: logger.error(f"Error handling scan result for {key}: {e}", exc_info=True)
+
+    targets = {}
+    target_timeouts = {}
+    for key in endpoints:
+        address, port = key
+        try: addr = (dns_resolver.resolve(address), port)
+        except socket.gaierror as e: report([key], {"error": f"DNS resolution failed for {address}: {e}"}, None, None); continue
+        targets.setdefault(addr, []).append(key)
+        key_timeout = timeouts.get(key, timeout) if timeouts else timeout
+        target_timeouts[addr] = int(max(target_timeouts.get(addr, 0), key_timeout * 1e9))
+    if not targets: return results
+
+    probes = max(1, int(probes))
+    interval_ns = int(probe_interval * 1e9)
+    payload = b'\xFF\xFF\xFF\xFF' + data.encode('ascii')
+    sequence = itertools.count()
+    start_ns = time.perf_counter_ns()
+    ready = [(start_ns, next(sequence), addr) for addr in targets]
+    held_since = {}
+    paced_until_ns = 0
+    in_flight = {}
+    deadlines = []
+    sent = dict.fromkeys(targets, 0)
+    samples = {addr: [] for addr in targets}
+    last_response = {}
+
+    def finish_probe(addr, now_ns):
+        if sent[addr] < probes:
+            heapq.heappush(ready, (now_ns + interval_ns, next(sequence), addr))
+            return
+        stats = latency_stats(samples[addr], sent[addr])
+        if samples[addr]: report(targets[addr], None, last_response[addr], stats['median'], stats)
+        else: report(targets[addr], {"error": "timeout"}, None, None, stats)
+
+    recv_buffer = bytearray(STATUS_MAX_DATAGRAM)
+    recv_view = memoryview(recv_buffer)
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    selector = selectors.DefaultSelector()
+    try:
+        client.setblocking(False)
+        try: client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SCAN_RECV_BUFFER_BYTES)
+        except socket.error: pass
+        # Windows reports ICMP port-unreachable as WSAECONNRESET on the next recvfrom; one dead server must not abort the scan.
+        if hasattr(socket, 'SIO_UDP_CONNRESET'):
+            try: client.ioctl(socket.SIO_UDP_CONNRESET, False)
+            except (OSError, ValueError): pass
+        client.bind(('', 0))
+        events = selectors.EVENT_READ
+        selector.register(client, events)
+        while ready or in_flight:
+            if stop_event is not None and stop_event.is_set(): break
+
+            now_ns = time.perf_counter_ns()
+            for _ in range(SCAN_SEND_BATCH):
+                if not ready or ready[0][0] > now_ns or (max_in_flight and len(in_flight) >= max_in_flight): break
+                due_ns, _, addr = ready[0]
+                if pacer is not None:
+                    pace_ns = pacer.global_delay_ns(now_ns)
+                    if pace_ns: paced_until_ns = now_ns + pace_ns; break
+                    ip_delay_ns = pacer.ip_delay_ns(addr[0], now_ns)
+                    if ip_delay_ns:
+                        held_since.setdefault(addr, due_ns)
+                        heapq.heapreplace(ready, (now_ns + ip_delay_ns, next(sequence), addr))
+                        continue
+                try: client.sendto(payload, addr)
+                except (BlockingIOError, InterruptedError): break
+                except socket.error as e:
+                    heapq.heappop(ready)
+                    if samples[addr]: sent[addr] = probes; finish_probe(addr, now_ns)
+                    else: report(targets[addr], {"error": str(e)}, None, None)
+                    continue
+                heapq.heappop(ready)
+                sent[addr] += 1
+                in_flight[addr] = send_ns = time.perf_counter_ns()
+                if pacer is not None: pacer.consume(addr[0], send_ns, send_ns - held_since.pop(addr, due_ns))
+                heapq.heappush(deadlines, (send_ns + target_timeouts[addr], send_ns, addr))
+
+            can_send = bool(ready) and not (max_in_flight and len(in_flight) >= max_in_flight)
+            wanted_events = selectors.EVENT_READ | (selectors.EVENT_WRITE if can_send and ready[0][0] <= now_ns and paced_until_ns <= now_ns else 0)
+            if wanted_events != events: events = wanted_events; selector.modify(client, events)
+
+            # Deadlines of probes that were already answered stay in the heap until they surface here.
+            while deadlines and in_flight.get(deadlines[0][2]) != deadlines[0][1]: heapq.heappop(deadlines)
+            wake_times = []
+            if deadlines: wake_times.append(deadlines[0][0])
+            if can_send: wake_times.append(max(ready[0][0], paced_until_ns))
+            wait = (min(wake_times) - time.perf_counter_ns()) / 1e9 if wake_times else 0.0
+            for _, mask in selector.select(max(0.0, min(wait, 0.25))):
+                if not mask & selectors.EVENT_READ: continue
+                while True:
+                    try: nbytes, server_addr = client.recvfrom_into(recv_buffer)
+                    except (BlockingIOError, InterruptedError): break
+                    except ConnectionResetError: continue
+                    except socket.error: break
+                    recv_ns = time.perf_counter_ns()
+                    send_ns = in_flight.pop(server_addr, None)
+                    if send_ns is None: continue
+                    if pacer is not None: pacer.record(server_addr, True)
+                    samples[server_addr].append((recv_ns - send_ns) / 1e6)
+                    response = last_response.get(server_addr)
+                    if response is None: last_response[server_addr] = bytearray(recv_view[:nbytes])
+                    else: response[:] = recv_view[:nbytes]
+                    finish_probe(server_addr, recv_ns)
+
+            now_ns = time.perf_counter_ns()
+            while deadlines and deadlines[0][0] <= now_ns:
+                _, send_ns, addr = heapq.heappop(deadlines)
+                if in_flight.get(addr) != send_ns: continue
+                del in_flight[addr]
+                if pacer is not None: pacer.record(addr, False)
+                finish_probe(addr, now_ns)
+    finally:
+        selector.close()
+        client.close()
+    return results
+
+
+class ProbeScheduler:
+    """Re-probes a changing set of servers, each at its own interval, from one thread and one UDP socket.
+    Results arrive on that thread as on_result(key, err, response, ping_ms); `response` is only valid during the call."""
+
+    def __init__(self, on_result, stop_event=None, timeout_for=None, data='status 31\0', max_rate=None, pacer=None, name='ProbeScheduler'):
+        self.on_result = on_result
+        self.pacer = pacer
+        self.stop_event = stop_event
+        self.timeout_for = timeout_for or (lambda key: RTO_INITIAL)
+        self._payload = b'\xFF\xFF\xFF\xFF' + data.encode('ascii')
+        self._lock = Lock()
+        self._intervals = {}
+        self._priorities = {}
+        self._due = []
+        self._ready = []
+        self._next_due = {}
+        self._budget = TokenBucket(max_rate, max(1.0, max_rate)) if max_rate else None
+        self._external_results = {}
+        self._expected = {}
+        self._sequence = itertools.count()
+        self._closed = False
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._thread = Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        if not self._closed: self._thread.start()
+        return self
+
+    def watch(self, key, interval, priority=0, delay=0.0):
+        """Probes `key` after `delay` seconds, then every `interval`; lower priorities go first when over max_rate."""
+        with self._lock:
+            self._intervals[key] = int(interval * 1e9)
+            self._priorities[key] = priority
+            self._schedule(key, time.perf_counter_ns() + int(delay * 1e9))
+        self._wake()
+
+    def unwatch(self, key):
+        with self._lock:
+            for state in (self._intervals, self._priorities, self._next_due, self._external_results, self._expected): state.pop(key, None)
+
+    def set_rate(self, max_rate):
+        """Changes the probes-per-second budget (None: no limit)."""
+        with self._lock: self._budget = TokenBucket(max_rate, max(1.0, max_rate)) if max_rate else None
+        self._wake()
+
+    def watched(self):
+        with self._lock: return list(self._intervals)
+
+    def note_result(self, key):
+        """Records that a result for `key` was just obtained outside the scheduler."""
+        with self._lock:
+            if key not in self._intervals: return
+            self._external_results[key] = time.perf_counter_ns()
+            self._expected.pop(key, None)
+
+    def expect_results(self, keys, within=SCHEDULER_EXTERNAL_RESULT_WAIT):
+        """Holds back the refreshes of `keys` until note_result() reports them, for at most `within` seconds."""
+        until_ns = time.perf_counter_ns() + int(within * 1e9)
+        with self._lock:
+            for key in keys:
+                if key in self._intervals: self._expected[key] = until_ns
+
+    def close(self):
+        """Stops the thread, which closes the wake sockets on its way out; closes them here if it never started."""
+        self._closed = True
+        if self._thread.ident is None:
+            self._wake_reader.close()
+            self._wake_writer.close()
+        else: self._wake()
+
+    def join(self, timeout=None):
+        if self._thread.ident is not None: self._thread.join(timeout)
+
+    def _stopped(self): return self._closed or (self.stop_event is not None and self.stop_event.is_set())
+
+    def _wake(self):
+        try: self._wake_writer.send(b'\0')
+        except OSError: pass
+
+    def _schedule(self, key, due_ns):
+        self._next_due[key] = due_ns
+        heapq.heappush(self._due, (due_ns, next(self._sequence), key))
+
+    def _take_due(self, now_ns, flying_keys):
+        """Pops the servers due at now_ns that really need a probe and fit the budget, and schedules their next turn.
+
+        A due server is skipped while its last probe is in flight, while a note_result()
+        is younger than its interval, or while expect_results() holds it back.
+
+        Returns (keys to probe, perf_counter_ns at which to look again or None).
+        """
+        to_probe = []
+        with self._lock:
+            while self._due and self._due[0][0] <= now_ns:
+                due_ns, _, key = heapq.heappop(self._due)
+                if self._next_due.get(key) == due_ns: heapq.heappush(self._ready, (self._priorities[key], due_ns, next(self._sequence), key))
+            budget_wait_ns = 0
+            while self._ready:
+                _, due_ns, _, key = self._ready[0]
+                if self._next_due.get(key) != due_ns: heapq.heappop(self._ready); continue
+                interval_ns = self._intervals[key]
+                external_ns = self._external_results.get(key)
+                if external_ns is not None and now_ns - external_ns < interval_ns:
+                    heapq.heappop(self._ready)
+                    self._schedule(key, external_ns + interval_ns)
+                    continue
+                if self._expected.get(key, 0) > now_ns or key in flying_keys:
+                    heapq.heappop(self._ready)
+                    self._schedule(key, now_ns + interval_ns)
+                    continue
+                if self._budget is not None:
+                    budget_wait_ns = self._budget.delay_ns(now_ns)
+                    if budget_wait_ns: break
+                    self._budget.take(now_ns)
+                heapq.heappop(self._ready)
+                self._expected.pop(key, None)
+                self._schedule(key, now_ns + interval_ns)
+                to_probe.append(key)
+            wake_times = [self._due[0][0]] if self._due else []
+            if budget_wait_ns: wake_times.append(now_ns + budget_wait_ns)
+        return to_probe, min(wake_times) if wake_times else None
+
+    def _report(self, key, err, response, ping_time):
+        with self._lock:
+            if key not in self._intervals: return
+        try: self.on_result(key, err, response, ping_time)
+        except Exception as e: logger.error(f"Error handling scheduled probe result for {key}: {e}", exc_info=True)
+
+    def _run(self):
+        recv_buffer = bytearray(STATUS_MAX_DATAGRAM)
+        recv_view = memoryview(recv_buffer)
+        in_flight = {}
+        flying_keys = set()
+        deadlines = []
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        selector = selectors.DefaultSelector()
+        try:
+            client.setblocking(False)
+            if hasattr(socket, 'SIO_UDP_CONNRESET'):
+                try: client.ioctl(socket.SIO_UDP_CONNRESET, False)
+                except (OSError, ValueError): pass
+            client.bind(('', 0))
+            selector.register(client, selectors.EVENT_READ)
+            selector.register(self._wake_reader, selectors.EVENT_READ)
+            while not self._stopped():
+                now_ns = time.perf_counter_ns()
+                to_probe, next_due_ns = self._take_due(now_ns, flying_keys)
+                for key in to_probe:
+                    address, port = key
+                    try: addr = (dns_resolver.resolve(address), port)
+                    except socket.gaierror as e: self._report(key, {"error": f"DNS resolution failed for {address}: {e}"}, None, None); continue
+                    if addr in in_flight: continue
+                    if self.pacer is not None:
+                        pace_ns = max(self.pacer.global_delay_ns(now_ns), self.pacer.ip_delay_ns(addr[0], now_ns))
+                        if pace_ns:
+                            with self._lock:
+                                if key in self._intervals: self._schedule(key, now_ns + pace_ns)
+                            next_due_ns = min(next_due_ns or now_ns + pace_ns, now_ns + pace_ns)
+                            continue
+                    try: client.sendto(self._payload, addr)
+                    except (BlockingIOError, InterruptedError): continue
+                    except socket.error as e: self._report(key, {"error": str(e)}, None, None); continue
+                    send_ns = time.perf_counter_ns()
+                    if self.pacer is not None: self.pacer.consume(addr[0], send_ns)
+                    in_flight[addr] = (send_ns, key)
+                    flying_keys.add(key)
+                    heapq.heappush(deadlines, (send_ns + int(self.timeout_for(key) * 1e9), send_ns, addr))
+
+                while deadlines and in_flight.get(deadlines[0][2], (None,))[0] != deadlines[0][1]: heapq.heappop(deadlines)
+                wake_times = [t for t in (next_due_ns, deadlines[0][0] if deadlines else None) if t is not None]
+                wait = (min(wake_times) - time.perf_counter_ns()) / 1e9 if wake_times else SCHEDULER_MAX_WAIT
+                for selector_key, _ in selector.select(max(0.0, min(wait, SCHEDULER_MAX_WAIT))):
+                    if selector_key.fileobj is self._wake_reader:
+                        try:
+                            while self._wake_reader.recv(512): pass
+                        except (BlockingIOError, InterruptedError): pass
+                        continue
+                    while True:
+                        try: nbytes, server_addr = client.recvfrom_into(recv_buffer)
+                        except (BlockingIOError, InterruptedError): break
+                        except ConnectionResetError: continue
+                        except socket.error: break
+                        recv_ns = time.perf_counter_ns()
+                        entry = in_flight.pop(server_addr, None)
+                        if entry is None: continue
+                        send_ns, key = entry
+                        flying_keys.discard(key)
+                        if self.pacer is not None: self.pacer.record(server_addr, True)
+                        self._report(key, None, recv_view[:nbytes], (recv_ns - send_ns) / 1e6)
+
+                now_ns = time.perf_counter_ns()
+                while deadlines and deadlines[0][0] <= now_ns:
+                    _, send_ns, addr = heapq.heappop(deadlines)
+                    entry = in_flight.get(addr)
+                    if entry is None or entry[0] != send_ns: continue
+                    del in_flight[addr]
+                    flying_keys.discard(entry[1])
+                    if self.pacer is not None: self.pacer.record(addr, False)
+                    self._report(entry[1], {"error": "timeout"}, None, None)
+        except Exception as e:
+            logger.error(f"Probe scheduler stopped: {e}", exc_info=True)
+        finally:
+            selector.close()
+            client.close()
+            self._wake_reader.close()
+            self._wake_writer.close()
+
+
+def monitor_tier(record, is_favorite, watched=False):
+    """The BackgroundMonitor tier of a server; servers that were never probed count as empty."""
+    if is_favorite: return 'watched' if watched else 'favorite'
+    if record is None: return 'empty'
+    if record.error is not None: return 'unreachable'
+    return 'populated' if record.players_count else 'empty'
+
+
+class BackgroundMonitor:
+    """Decides which servers a ProbeScheduler re-probes, how often and in which order.
+    Each tracked server is watched at its MONITOR_TIERS interval; pinned servers (detail windows) always, first."""
+
+    def __init__(self, scheduler, intervals=None):
+        self.scheduler = scheduler
+        self.intervals = dict(DEFAULT_MONITOR_INTERVALS, **(intervals or {}))
+        self.enabled = False
+        self.follow_favorites = False
+        self._tiers = {}
+        self._pins = {}
+        self._watching = {}
+        self._lock = Lock()
+
+    def _apply(self, key, delay=None):
+        """Brings the scheduler in line for one key; delay None re-watches only if interval or priority changed."""
+        interval, priority = self._pins.get(key), 0
+        tier = self._tiers.get(key)
+        if tier is not None and not self._active(tier): tier = None
+        if tier is not None:
+            if interval is None: priority = MONITOR_TIERS.index(tier) + 1
+            interval = min(interval or float('inf'), self.intervals[tier])
+        if interval is None:
+            if self._watching.pop(key, None) is not None: self.scheduler.unwatch(key)
+            return
+        if delay is None and self._watching.get(key) == (interval, priority): return
+        self._watching[key] = (interval, priority)
+        self.scheduler.watch(key, interval, priority, interval if delay is None else delay)
+
+    def _active(self, tier):
+        """Whether `tier` is probed: all tiers while enabled, 'watched' always, 'favorite' also with follow_favorites."""
+        return self.enabled or tier == 'watched' or (tier == 'favorite' and self.follow_favorites)
+
+    def pin(self, key, interval):
+        """Probes `key` now and then every `interval` (or its tier's, if shorter) seconds until unpin(), enabled or not."""
+        with self._lock:
+            self._pins[key] = interval
+            self._apply(key, 0.0)
+
+    def unpin(self, key):
+        with self._lock:
+            if self._pins.pop(key, None) is not None: self._apply(key)
+
+    def track_all(self, records, favorite_keys, watched_keys=()):
+        """Makes {key: ServerRecord} plus favorite_keys the tracked set, keeping the tiers of known servers up to date."""
+        with self._lock:
+            wanted = {key: monitor_tier(records.get(key), key in favorite_keys, key in watched_keys) for key in itertools.chain(records, favorite_keys)}
+            for key in [key for key in self._tiers if key not in wanted]:
+                del self._tiers[key]
+                self._apply(key)
+            for key, tier in wanted.items():
+                if self._tiers.get(key) == tier: continue
+                is_new = key not in self._tiers
+                self._tiers[key] = tier
+                if self._active(tier): self._apply(key, random.uniform(0, self.intervals[tier]) if is_new else None)
+                elif key in self._watching: self._apply(key)
+
+    def observe(self, key, record, is_favorite, watched=False):
+        """Re-tiers a tracked server after a probe result."""
+        with self._lock:
+            if key not in self._tiers: return
+            tier = monitor_tier(record, is_favorite, watched)
+            if tier == self._tiers[key]: return
+            self._tiers[key] = tier
+            self._apply(key)
+
+    def configure(self, enabled=None, intervals=None, follow_favorites=None):
+        """Turns monitoring (or following favorites) on or off and/or changes tier intervals; enabling spreads the first round over each interval."""
+        with self._lock:
+            was_active = {tier: self._active(tier) for tier in MONITOR_TIERS}
+            if enabled is not None: self.enabled = enabled
+            if follow_favorites is not None: self.follow_favorites = follow_favorites
+            if intervals: self.intervals.update(intervals)
+            for key in set(self._tiers) | set(self._pins):
+                tier = self._tiers.get(key)
+                turning_on = tier is not None and self._active(tier) and not was_active[tier] and key not in self._pins
+                self._apply(key, random.uniform(0, self.intervals[tier]) if turning_on else None)
+
+    def tier_counts(self):
+        with self._lock:
+            counts = dict.fromkeys(MONITOR_TIERS, 0)
+            for tier in self._tiers.values(): counts[tier] += 1
+            return counts
+
+
+def parse_serverinfo(line):
+    """Single pass over a \\key\\value serverinfo line; numeric values become ints except hostname/map/mode."""
+    server_info = {}
+    parts = line.split('\\')
+    for key, value in zip(parts[1::2], parts[2::2]):
+        if not key or key in server_info: continue
+        if key in STATUS_TEXT_KEYS: server_info[key] = value; continue
+        server_info[key] = int(value) if value.isdigit() or (value[:1] == '-' and value[1:].isdigit()) else value
+    return server_info
+
+
+def parse_player_lines(lines):
+    players = []
+    for p_line in lines:
+        match = PLAYER_LINE_RE.match(p_line)
+        if match is None: continue
+        player_id, frags, time_played, ping, name, skin, topcolor, bottomcolor, team = match.groups()
+        try:
+            players.append({
+                'id': int(player_id), 'frags': frags if frags == 'S' else int(frags),
+                'time': int(time_played), 'ping': int(ping), 'name': name,
+                'skin': skin, 'topcolor': int(topcolor), 'bottomcolor': int(bottomcolor),
+                'team': team if team is not None else ''
+            })
+        except ValueError: pass
+    return players
+
+
+def is_spectator_line(p_line):
+    fields = p_line.split(None, 2)
+    return len(fields) > 1 and fields[1] == 'S'
+
+
+def parse_status_response(data, parse_players=True):
+    """Parses a 'status 31' reply: the serverinfo line followed by one line per player.
+
+    `data` may be bytes, a bytearray or a memoryview into a receive buffer; it is
+    decoded in place without copying the payload first. With parse_players=False the
+    player lines are returned unparsed under 'player_lines' (see parse_player_lines)
+    instead of as dicts under 'players'.
+    """
+    try:
+        view = memoryview(data)
+        start = len(STATUS_REPLY_HEADER) if view[:len(STATUS_REPLY_HEADER)] == STATUS_REPLY_HEADER else 0
+        end = len(view)
+        while end > start and view[end - 1] == 0: end -= 1
+        lines = codecs.charmap_decode(view[start:end], 'ignore', QUAKE_CHAR_DECODING_TABLE)[0].split('\n')
+        server_info = parse_serverinfo(lines[0])
+        player_lines = [p_line for p_line in lines[1:] if p_line.strip()]
+        if parse_players: server_info['players'] = parse_player_lines(player_lines)
+        else: server_info['player_lines'] = player_lines
+        return server_info
+    except Exception as e: return {"error": f"parse error: {str(e)}"}
+
+
+def _or_na(value): return 'N/A' if value is None else value
+def _interned(value): return sys.intern(value) if isinstance(value, str) and value and value != 'N/A' else None
+def _count_or_none(value): return value if isinstance(value, int) else None
+
+
+class ProbeError(enum.Enum):
+    """Why a server has no ping. The full message is kept next to it in ServerRecord.error_detail."""
+    TIMEOUT = 'timeout'
+    DNS = 'dns'
+    NETWORK = 'network'
+    PARSE = 'parse'
+
+    @classmethod
+    def from_message(cls, message):
+        if message == 'timeout': return cls.TIMEOUT
+        if message.startswith('DNS resolution failed'): return cls.DNS
+        if message.startswith('parse error'): return cls.PARSE
+        return cls.NETWORK
+
+
+class PlayerRecord:
+    """One player line of a status reply. Spectators have frags None ('S' on the wire and in the JSON files)."""
+    __slots__ = ('id', 'frags', 'time', 'ping', 'name', 'skin', 'topcolor', 'bottomcolor', 'team')
+
+    def __init__(self, player_id, frags, time_played, ping, name, skin='', topcolor=0, bottomcolor=0, team=''):
+        self.id = player_id
+        self.frags = frags
+        self.time = time_played
+        self.ping = ping
+        self.name = name
+        self.skin = sys.intern(skin or '')
+        self.topcolor = topcolor
+        self.bottomcolor = bottomcolor
+        self.team = sys.intern(team or '')
+
+    @property
+    def is_spectator(self): return self.frags is None
+
+    @property
+    def is_bot(self): return self.ping == 20
+
+    @property
+    def frags_display(self): return 'S' if self.frags is None else self.frags
+
+    def status_line(self):
+        """The player as a 'status' reply line, the form parse_player_lines reads back."""
+        return f'{self.id} {self.frags_display} {self.time} {self.ping} "{self.name}" "{self.skin}" {self.topcolor} {self.bottomcolor} "{self.team}"'
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'frags': self.frags_display, 'time': self.time, 'ping': self.ping, 'name': self.name,
+            'skin': self.skin, 'topcolor': self.topcolor, 'bottomcolor': self.bottomcolor, 'team': self.team
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        frags = data.get('frags')
+        return cls(
+            data.get('id', 0), None if frags == 'S' else frags, data.get('time', 0), data.get('ping', 0), data.get('name', ''),
+            data.get('skin', ''), data.get('topcolor', 0), data.get('bottomcolor', 0), data.get('team', '')
+        )
+
+
+class _PlayerLines(tuple):
+    """Raw 'status' player lines that ServerRecord.players has not parsed yet."""
+    __slots__ = ()
+
+
+class ServerRecord:
+    """Typed, slotted state of one server in a ServerState (records / favorites).
+
+    ping is the RTT in ms as a float, counts are ints and map/mode interned strings;
+    None means "unknown" everywhere (shown as 'N/A'). A failed probe leaves ping None
+    and sets `error` (ProbeError) with the original message in `error_detail`.
+    to_dict()/from_dict() read and write the servers_cache.json / favorites.json
+    layout, where the ping is a string ("23.56", "N/A" or "Error: <message>").
+    Records built with from_probe(lazy_players=True) keep the raw player lines and
+    only parse them into PlayerRecords the first time `players` is read.
+    Records that were published in a ServerState are not changed in place any more;
+    change a copy() and publish that.
+    """
+    __slots__ = ('original_ip', 'port', 'display_hostname', 'ping', 'error', 'error_detail', 'map', 'mode', 'players_count', 'spectators_count', '_players', 'rtt', 'ping_stats')
+
+    def __init__(self, original_ip, port, display_hostname, ping=None, error=None, error_detail='', map_name=None, mode=None, players_count=None, spectators_count=None, players=(), rtt=None, ping_stats=None):
+        self.original_ip = original_ip
+        self.port = port
+        self.display_hostname = display_hostname
+        self.ping = ping
+        self.error = error
+        self.error_detail = error_detail
+        self.map = _interned(map_name)
+        self.mode = _interned(mode)
+        self.players_count = players_count
+        self.spectators_count = spectators_count
+        self.players = players
+        self.rtt = rtt
+        self.ping_stats = ping_stats
+
+    @property
+    def key(self): return (self.original_ip, self.port)
+
+    @property
+    def players(self):
+        players = self._players
+        if isinstance(players, _PlayerLines):
+            # Parsed into a local and published with one assignment: published records are read from several threads.
+            players = tuple(PlayerRecord.from_dict(player) for player in parse_player_lines(players))
+            self._players = players
+        return players
+
+    @players.setter
+    def players(self, players):
+        self._players = players
+
+    def player_lines(self):
+        """The players as 'status' reply lines; players that were never parsed are returned as received."""
+        players = self._players
+        if isinstance(players, _PlayerLines): return list(players)
+        return [player.status_line() for player in players]
+
+    def defer_players(self, player_lines):
+        """Replaces the players with status lines that are only parsed when `players` is first read."""
+        self._players = () if player_lines is None else _PlayerLines(player_lines)
+
+    @property
+    def ping_text(self):
+        if self.error is not None: return f"Error: {self.error_detail or self.error.value}"
+        return 'N/A' if self.ping is None else f"{self.ping:.2f}"
+
+    def display_values(self):
+        return (self.display_hostname, self.port, format_ping_cell(self), _or_na(self.map), _or_na(self.players_count))
+
+    def copy(self):
+        clone = ServerRecord.__new__(ServerRecord)
+        for name in ServerRecord.__slots__: setattr(clone, name, getattr(self, name))
+        return clone
+
+    def to_dict(self):
+        data = {
+            'original_ip': self.original_ip, 'display_hostname': self.display_hostname, 'port': self.port,
+            'ping': self.ping_text, 'map': _or_na(self.map), 'players_count': _or_na(self.players_count),
+            'spectators_count': _or_na(self.spectators_count), 'players': [player.to_dict() for player in self.players],
+            'mode': _or_na(self.mode)
+        }
+        if self.rtt is not None: data['rtt'] = self.rtt
+        if self.ping_stats is not None: data['ping_stats'] = self.ping_stats
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        ping, error, error_detail = None, None, ''
+        ping_text = str(data.get('ping', 'N/A'))
+        if ping_text.startswith('Error'):
+            error_detail = ping_text.split(':', 1)[1].strip() if ':' in ping_text else ''
+            error = ProbeError.from_message(error_detail)
+        elif ping_text != 'N/A':
+            try: ping = float(ping_text)
+            except ValueError: pass
+        return cls(
+            data['original_ip'], data['port'], data.get('display_hostname', data['original_ip']), ping, error, error_detail,
+            data.get('map'), data.get('mode'), _count_or_none(data.get('players_count')), _count_or_none(data.get('spectators_count')),
+            tuple(PlayerRecord.from_dict(player) for player in data.get('players', [])), data.get('rtt'), data.get('ping_stats')
+        )
+
+    @classmethod
+    def from_probe(cls, original_ip, port, display_hostname, err, response, ping_time, rtt=None, ping_stats=None, lazy_players=False):
+        """Builds the record for one probe outcome as returned by udp_command/scan_servers."""
+        if err: return cls(original_ip, port, display_hostname, error=ProbeError.from_message(err['error']), error_detail=err['error'], rtt=rtt, ping_stats=ping_stats)
+        server_info = parse_status_response(response, parse_players=not lazy_players)
+        if 'error' in server_info: return cls(original_ip, port, display_hostname, error=ProbeError.PARSE, error_detail=server_info['error'], rtt=rtt, ping_stats=ping_stats)
+        hostname_from_server = server_info.get('hostname')
+        resolved_display_name = hostname_from_server if isinstance(hostname_from_server, str) and hostname_from_server.strip() else display_hostname
+        if lazy_players:
+            player_lines = server_info['player_lines']
+            spectators_count = sum(1 for p_line in player_lines if is_spectator_line(p_line))
+            players_count = len(player_lines) - spectators_count
+        else:
+            players = tuple(PlayerRecord.from_dict(player) for player in server_info['players'])
+            spectators_count = sum(1 for player in players if player.is_spectator)
+            players_count = len(players) - spectators_count
+        record = cls(
+            original_ip, port, resolved_display_name, ping_time, None, '', server_info.get('map'), server_info.get('mode'),
+            players_count, spectators_count, () if lazy_players else players, rtt, ping_stats
+        )
+        if lazy_players: record.defer_players(player_lines)
+        return record
+
+
+class _RecordMapItems(ItemsView):
+    __slots__ = ()
+    def __iter__(self): return itertools.chain.from_iterable(shard.items() for shard in self._mapping._shards)
+
+
+class _RecordMapValues(ValuesView):
+    __slots__ = ()
+    def __iter__(self): return itertools.chain.from_iterable(shard.values() for shard in self._mapping._shards)
+
+
+class RecordMap(Mapping):
+    """Read-only {server_key: ServerRecord} mapping, as held by a ServerState.
+
+    The records are spread over SERVER_STATE_SHARDS dicts by key hash. changed() returns
+    a new map that copies only the shards it touches and shares all others, so publishing
+    one probe result copies a few hundred entries instead of the whole server list.
+    Iteration is in shard order; ServerState.servers keeps the order of the list.
+    """
+    __slots__ = ('_shards', '_len')
+
+    def __init__(self, records=()):
+        shards = tuple({} for _ in range(SERVER_STATE_SHARDS))
+        for server_key, record in (records.items() if isinstance(records, Mapping) else records): shards[hash(server_key) % SERVER_STATE_SHARDS][server_key] = record
+        self._shards, self._len = shards, sum(map(len, shards))
+
+    def __getitem__(self, server_key): return self._shards[hash(server_key) % SERVER_STATE_SHARDS][server_key]
+    def get(self, server_key, default=None): return self._shards[hash(server_key) % SERVER_STATE_SHARDS].get(server_key, default)
+    def __contains__(self, server_key): return server_key in self._shards[hash(server_key) % SERVER_STATE_SHARDS]
+    def __iter__(self): return itertools.chain.from_iterable(self._shards)
+    def __len__(self): return self._len
+    def items(self): return _RecordMapItems(self)
+    def values(self): return _RecordMapValues(self)
+
+    def changed(self, updates=(), removals=()):
+        """A new map with `updates` ({key: record} or pairs) stored and the keys in `removals` dropped."""
+        shards, copied = list(self._shards), set()
+
+        def shard(server_key):
+            index = hash(server_key) % SERVER_STATE_SHARDS
+            if index not in copied:
+                shards[index] = dict(shards[index])
+                copied.add(index)
+            return shards[index]
+
+        for server_key in removals: shard(server_key).pop(server_key, None)
+        for server_key, record in (updates.items() if isinstance(updates, Mapping) else updates): shard(server_key)[server_key] = record
+        record_map = RecordMap.__new__(RecordMap)
+        record_map._shards, record_map._len = tuple(shards), sum(map(len, shards))
+        return record_map
+
+
+class ServerState(namedtuple('ServerState', 'version servers records favorites scan_generation stale list_source')):
+    """One published version of the server lists; immutable, so any thread may read it without a lock.
+
+    `servers` is the main list as a tuple of (display name, port, ip) in list order,
+    `records` a RecordMap with the latest ServerRecord of every known server and
+    `favorites` a read-only {server_key: ServerRecord} of the favorites, which keep their
+    own record when they are not in the main list. `scan_generation` numbers the scans
+    started (and cancelled) so far and `stale` is a RecordMap of the servers the current
+    scan has not refreshed yet. `list_source` says where the main list came from (a
+    list URL, a file or 'masters'; None if unknown). Every published change bumps `version`.
+    """
+    __slots__ = ()
+
+    def all_records(self):
+        """Every record: the main list's in list order, then the others (favorites probed outside of it)."""
+        listed_keys = [(actual_ip, port) for _, port, actual_ip in self.servers]
+        records = [self.records[server_key] for server_key in listed_keys if server_key in self.records]
+        listed_keys = set(listed_keys)
+        records.extend(record for server_key, record in self.records.items() if server_key not in listed_keys)
+        return records
+
+
+class ServerStateStore:
+    """Holds the current ServerState and replaces it atomically.
+
+    Readers take `state` once and work on that snapshot, never blocking and never blocked.
+    Writers call update(change): change(state) builds the next version from the current
+    one and returns the fields to replace ({'servers': ..., 'records': ..., 'favorites':
+    ...}), or None to leave it as is. The lock only serializes writers, so change() has to
+    be quick: no network, no DNS, no Tk.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.state = ServerState(0, (), RecordMap(), MappingProxyType({}), 0, RecordMap(), None)
+
+    def update(self, change):
+        """Publishes change(current state) as the next version and returns the state now current."""
+        with self._lock:
+            state = self.state
+            fields = change(state)
+            if not fields: return state
+            if 'servers' in fields: fields['servers'] = tuple(fields['servers'])
+            for name in ('records', 'stale'):
+                if name in fields and not isinstance(fields[name], RecordMap): fields[name] = RecordMap(fields[name])
+            if 'favorites' in fields: fields['favorites'] = MappingProxyType(dict(fields['favorites']))
+            self.state = state._replace(version=state.version + 1, **fields)
+            return self.state
+
+    def put_record(self, record, generation=None):
+        """Publishes one probe result, also for the favorite it belongs to, and returns the new state.
+
+        A result of scan `generation` is dropped (None is returned) once that scan has been
+        cancelled or restarted; results without a generation are always taken.
+        """
+        server_key, accepted = record.key, False
+
+        def change(state):
+            nonlocal accepted
+            if generation is not None and generation != state.scan_generation: return None
+            accepted = True
+            fields = {'records': state.records.changed(((server_key, record),))}
+            if server_key in state.favorites: fields['favorites'] = {**state.favorites, server_key: record}
+            if server_key in state.stale: fields['stale'] = state.stale.changed((), (server_key,))
+            return fields
+
+        state = self.update(change)
+        return state if accepted else None
+
+    def start_scan(self, server_keys):
+        """Starts the next scan generation over server_keys, whose records stay stale until their results come in. Returns the generation."""
+        return self.update(lambda state: {
+            'scan_generation': state.scan_generation + 1,
+            'stale': [(server_key, state.records[server_key]) for server_key in server_keys if server_key in state.records]
+        }).scan_generation
+
+    def end_scan(self, generation, cancel=False):
+        """Ends scan `generation` unless a newer one replaced it, unmarking what is still stale.
+
+        Cancelling retires the generation, so results still in flight are dropped. Returns
+        the stale records that were unmarked, or None if the scan was no longer current.
+        """
+        unmarked = None
+
+        def change(state):
+            nonlocal unmarked
+            if generation != state.scan_generation: return None
+            unmarked = state.stale
+            fields = {'stale': RecordMap()}
+            if cancel: fields['scan_generation'] = generation + 1
+            return fields
+
+        self.update(change)
+        return unmarked
+
+
+class PlayerSearchIndex:
+    """Substring search over player names, backed by a trigram index.
+
+    Names are added and removed one row key at a time (build() loads many at once) and
+    search() returns the set of keys whose name contains the query. Queries of
+    PLAYER_SEARCH_GRAM characters or more only look at the names sharing their rarest
+    trigram; a query that contains the previous one (the user typed another character)
+    only re-checks the previous matches, which add() and remove() keep current. Both
+    sides go through normalize_player_name, so colour codes and high-bit characters match
+    their plain spelling.
+    """
+
+    def __init__(self, entries=()):
+        self.build(entries)
+
+    def build(self, entries):
+        """Replaces the index with (key, name) pairs."""
+        self.names = {}
+        self._grams = {}
+        self._last_query, self._last_matches = '', None
+        for key, name in entries: self.add(key, name)
+
+    def __len__(self): return len(self.names)
+
+    @staticmethod
+    def _name_grams(name): return {name[i:i + PLAYER_SEARCH_GRAM] for i in range(len(name) - PLAYER_SEARCH_GRAM + 1)}
+
+    def add(self, key, name):
+        if key in self.names: self.remove(key)
+        folded = self.names[key] = normalize_player_name(name)
+        for gram in self._name_grams(folded): self._grams.setdefault(gram, set()).add(key)
+        if self._last_matches is not None and self._last_query in folded: self._last_matches.add(key)
+
+    def remove(self, key):
+        folded = self.names.pop(key, None)
+        if folded is None: return
+        for gram in self._name_grams(folded):
+            keys = self._grams[gram]
+            keys.discard(key)
+            if not keys: del self._grams[gram]
+        if self._last_matches is not None: self._last_matches.discard(key)
+
+    def matches(self, key, query):
+        """True if the name indexed under `key` contains `query`."""
+        return key in self.names and normalize_player_name(query) in self.names[key]
+
+    def _candidates(self, query):
+        if self._last_matches is not None and self._last_query in query: return self._last_matches
+        if len(query) < PLAYER_SEARCH_GRAM: return self.names
+        postings = [self._grams.get(query[i:i + PLAYER_SEARCH_GRAM], ()) for i in range(len(query) - PLAYER_SEARCH_GRAM + 1)]
+        return min(postings, key=len)
+
+    def search(self, query):
+        """Returns the set of keys whose name contains `query`; every key for an empty query."""
+        query = normalize_player_name(query)
+        names = self.names
+        matches = set(names) if not query else {key for key in self._candidates(query) if query in names[key]}
+        self._last_query, self._last_matches = query, matches
+        return set(matches)
+
+
+class PlayerIndex:
+    """The (non-spectator) players on each server, kept current one probe result at a time.
+
+    update() replaces what is indexed for one server and returns the differences as
+    (kind, row_key, entry) deltas, so a view of every player can apply the changes of
+    one server instead of being rebuilt from all of them. A row key is
+    (server_key, player id); an entry is (PlayerRecord, server name, map). Kinds are
+    PLAYER_JOIN, PLAYER_LEAVE (entry is the one that left), PLAYER_RENAME (same slot,
+    new name) and PLAYER_UPDATE (frags, ping, team, server name or map changed).
+    Servers without a ping have no players. Not thread-safe; main.py calls it under
+    its player_lock.
+    """
+
+    def __init__(self):
+        self.servers = {}
+
+    def __len__(self): return sum(len(players) for players in self.servers.values())
+
+    def entries(self):
+        """Yields (row_key, entry) for every indexed player."""
+        for server_key, players in self.servers.items():
+            for player_id, entry in players.items(): yield (server_key, player_id), entry
+
+    def update(self, server_key, record):
+        """Indexes the players of `record` (a ServerRecord, or None to drop the server) and returns the deltas."""
+        previous = self.servers.pop(server_key, {})
+        current = {}
+        if record is not None and record.ping is not None:
+            server_name, map_name = record.display_hostname, _or_na(record.map)
+            for player in record.players:
+                if not player.is_spectator: current[player.id] = (player, server_name, map_name)
+        if current: self.servers[server_key] = current
+
+        deltas = [(PLAYER_LEAVE, (server_key, player_id), entry) for player_id, entry in previous.items() if player_id not in current]
+        for player_id, entry in current.items():
+            old = previous.get(player_id)
+            if old is None: deltas.append((PLAYER_JOIN, (server_key, player_id), entry))
+            elif old[0].name != entry[0].name: deltas.append((PLAYER_RENAME, (server_key, player_id), entry))
+            elif _player_row_changed(old, entry): deltas.append((PLAYER_UPDATE, (server_key, player_id), entry))
+        return deltas
+
+    def clear(self):
+        self.servers.clear()
+
+
+def _player_row_changed(old, new):
+    (old_player, old_server, old_map), (player, server_name, map_name) = old, new
+    return (old_player.frags, old_player.ping, old_player.team, old_server, old_map) != (player.frags, player.ping, player.team, server_name, map_name)
+
+
+def watch_pattern_regex(pattern):
+    """Regex source for one watchlist entry, matched against normalize_player_name() output.
+
+    're:<regex>' is a regular expression searched in the name, an entry with * or ? is a
+    wildcard pattern for the whole name, anything else matches as a substring. Raises
+    ValueError for an empty entry or a bad regex.
+    """
+    pattern = pattern.strip()
+    if pattern.startswith(WATCH_REGEX_PREFIX):
+        source = pattern[len(WATCH_REGEX_PREFIX):]
+        try: re.compile(source)
+        except re.error as e: raise ValueError(f"bad regex in watchlist entry '{pattern}': {e}") from None
+        return source
+    folded = normalize_player_name(pattern)
+    if not folded: raise ValueError("empty watchlist entry")
+    if '*' not in folded and '?' not in folded: return re.escape(folded)
+    return r'\A' + ''.join('.*' if char == '*' else '.' if char == '?' else re.escape(char) for char in folded) + r'\Z'
+
+
+class PlayerWatchlist:
+    """Player names or patterns to look out for (see watch_pattern_regex), compiled into one regex.
+
+    match() folds a name once and runs a single search; the named group that matched tells
+    which entry it was. Entries that do not compile are left out and listed in `invalid`.
+    """
+
+    def __init__(self, patterns=()):
+        self.patterns, self.invalid, sources = [], [], []
+        for pattern in patterns:
+            try: sources.append(f'(?P<w{len(self.patterns)}>{watch_pattern_regex(pattern)})')
+            except ValueError as e:
+                self.invalid.append(pattern)
+                logger.error(f"Ignoring watchlist entry: {e}")
+                continue
+            self.patterns.append(pattern.strip())
+        self._regex = re.compile('|'.join(sources), re.IGNORECASE) if sources else None
+
+    def __bool__(self): return self._regex is not None
+
+    def match(self, name):
+        """The watchlist entry matching a player name, or None."""
+        if self._regex is None: return None
+        found = self._regex.search(normalize_player_name(name))
+        return self.patterns[int(found.lastgroup[1:])] if found else None
+
+
+class PresenceTracker:
+    """Which watched players are on which server, from probe results one server at a time.
+
+    update() matches the players (spectators included) of each new result against the
+    watchlist and returns (PRESENCE_JOINED or PRESENCE_LEFT, player name, server_key,
+    watchlist entry) events. Players are followed by name, so a reconnect on a new slot is
+    no event, and a server that does not answer keeps its last known players until it
+    answers again or is dropped with update(key, None). reset() re-reads everything without
+    events (start-up, a new list, a changed watchlist). Not thread-safe; main.py calls it
+    under its player_lock.
+    """
+
+    def __init__(self, watchlist=None):
+        self.watchlist = watchlist or PlayerWatchlist()
+        self.present = {}
+
+    def _watched_players(self, record):
+        if not self.watchlist: return {}
+        watched = {}
+        for player in record.players:
+            pattern = self.watchlist.match(player.name)
+            if pattern is not None: watched[player.name] = pattern
+        return watched
+
+    def update(self, server_key, record):
+        if record is not None and record.ping is None: return []
+        previous = self.present.pop(server_key, {})
+        current = self._watched_players(record) if record is not None else {}
+        if current: self.present[server_key] = current
+        events = [(PRESENCE_LEFT, name, server_key, pattern) for name, pattern in previous.items() if name not in current]
+        events.extend((PRESENCE_JOINED, name, server_key, pattern) for name, pattern in current.items() if name not in previous)
+        return events
+
+    def reset(self, records, watchlist=None):
+        """Starts over from {key: ServerRecord} (and a new watchlist, if given) without reporting anything; servers not in `records` are dropped."""
+        if watchlist is not None: self.watchlist = watchlist
+        previous, self.present = self.present, {}
+        for server_key, record in records.items():
+            if record.ping is not None: self.update(server_key, record)
+            elif server_key in previous:
+                # No answer yet (e.g. cleared for a new scan): keep who was there, as update() would.
+                kept = {name: self.watchlist.match(name) for name in previous[server_key]}
+                kept = {name: pattern for name, pattern in kept.items() if pattern is not None}
+                if kept: self.present[server_key] = kept
+
+    def servers(self):
+        """Keys of the servers with a watched player on them."""
+        return set(self.present)
+
+
+def read_servers_from_file_raw(file_path):
+    """Reads an eu-sv.txt style file into (address_or_hostname, port) pairs. Raises OSError if it cannot be read."""
+    print(f"Attempting to read server list from local file: '{file_path}'")
+    with open(file_path, 'r') as f: servers = parse_server_list_lines(f)
+    print(f"Loaded {len(servers)} servers from local file '{file_path}'.")
+    return servers
+
+
+def iter_server_records(file_path):
+    """Reads servers_cache.json / favorites.json and returns an iterator building one ServerRecord at a time.
+
+    The file is read and decoded up front, so OSError and json.JSONDecodeError are raised
+    by this call; callers decide how a missing or broken file is reported.
+    """
+    with open(file_path, 'r') as f: return map(ServerRecord.from_dict, json.load(f))
+
+
+def load_server_records(file_path):
+    """Loads servers_cache.json / favorites.json into {key: ServerRecord}, in file order."""
+    return {record.key: record for record in iter_server_records(file_path)}
+
+
+def save_server_records(records, file_path):
+    """Writes ServerRecords in the servers_cache.json / favorites.json layout. Raises OSError."""
+    serializable = [record.to_dict() for record in records]
+    write_file_atomically(file_path, json.dumps(serializable, indent=2).encode('utf-8'))
+
+
+def write_file_atomically(file_path, data):
+    """Writes bytes to a temporary file next to file_path and renames it over file_path.
+
+    The data is fsynced before os.replace, so a crash or power loss during a save
+    leaves either the old or the new file, never a truncated one. Raises OSError.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + '.', suffix='.tmp', dir=directory)
+    try:
+        try: os.chmod(temp_path, os.stat(file_path).st_mode & 0o777)
+        except FileNotFoundError: os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try: os.unlink(temp_path)
+        except OSError: pass
+        raise
+
+
+class ServerListFetcher:
+    """Downloads eu-sv.txt over a pooled requests.Session, revalidating with ETag/Last-Modified.
+
+    The validators and the last downloaded lines are kept in SERVER_LIST_META_FILE,
+    next to servers_cache.json, so conditional requests survive restarts.
+    """
+
+    def __init__(self, meta_file=SERVER_LIST_META_FILE):
+        self.meta_file = meta_file
+        self._session = None
+        self._lock = Lock()
+        self._meta = None
+
+    @property
+    def meta(self):
+        if self._meta is None: self._meta = self._load_meta()
+        return self._meta
+
+    @meta.setter
+    def meta(self, meta): self._meta = meta
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_file, 'r') as f: return json.load(f)
+        except FileNotFoundError: return {}
+        except (json.JSONDecodeError, IOError) as e: print(f"Error reading server list metadata: {e}. Ignoring it."); return {}
+
+    def _save_meta(self):
+        try:
+            with open(self.meta_file, 'w') as f: json.dump(self.meta, f, indent=2)
+        except IOError as e: print(f"Error saving server list metadata to {self.meta_file}: {e}")
+
+    def _get_session(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+
+    def previous_lines(self, url):
+        return list(self.meta.get('lines', [])) if self.meta.get('url') == url else []
+
+    def fetch(self, url, timeout=HTTP_TIMEOUT):
+        """Returns the list's lines, or None if the server answered 304 Not Modified. Raises requests exceptions."""
+        with self._lock:
+            headers = {}
+            if self.meta.get('url') == url and self.meta.get('lines'):
+                if self.meta.get('etag'): headers['If-None-Match'] = self.meta['etag']
+                if self.meta.get('last_modified'): headers['If-Modified-Since'] = self.meta['last_modified']
+            response = self._get_session().get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304: return None
+            response.raise_for_status()
+            lines = response.text.splitlines()
+            self.meta = {
+                'url': url, 'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time(), 'lines': lines
+            }
+            self._save_meta()
+            return lines
+
+    def close(self):
+        if self._session is not None: self._session.close(); self._session = None
+
+
+def parse_server_list_lines(lines):
+    """Parses eu-sv.txt style 'host:port' lines into (address_or_hostname, port) pairs."""
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not line or ':' not in line: continue
+        address_or_hostname, _, port_str = line.rpartition(':')
+        try: port = int(port_str)
+        except ValueError: print(f"Warning: Invalid port for server '{line}'. Skipping."); continue
+        if port in IGNORED_SERVER_PORTS: continue
+        entries.append((address_or_hostname, port))
+    return entries
+
+
+def parse_address_list(text, default_port):
+    """Parses a comma/whitespace separated 'host[:port]' list, e.g. the master servers setting."""
+    addresses = []
+    for token in re.split(r'[\s,;]+', text.strip()):
+        if not token: continue
+        host, _, port_str = token.partition(':')
+        try: addresses.append((host, int(port_str) if port_str else default_port))
+        except ValueError: print(f"Warning: Invalid address '{token}'. Skipping.")
+    return addresses
+
+
+def decode_master_reply(data):
+    """Decodes one master server datagram into (ip, port) pairs; each record is 4 address bytes plus a big-endian port."""
+    if not data.startswith(MASTER_REPLY_HEADER): return []
+    records = data[len(MASTER_REPLY_HEADER):]
+    records = records[:len(records) - len(records) % 6]
+    return [(socket.inet_ntoa(ip), port) for ip, port in struct.iter_unpack('!4sH', records) if port]
+
+
+def query_master_servers(masters, timeout=MASTER_QUERY_TIMEOUT, idle_timeout=MASTER_IDLE_TIMEOUT):
+    """Asks every (host, port) master for its server list in parallel over one UDP socket.
+
+    A master may split its list over several datagrams, so replies are collected until
+    all masters have answered and the socket stayed quiet for `idle_timeout`, or until
+    `timeout`. Returns (entries, results): entries are the deduplicated (ip, port) pairs
+    in arrival order, results maps each master to its server count or an error string.
+    """
+    results = {}
+    addr_to_master = {}
+    for master in masters:
+        try: addr_to_master[(dns_resolver.resolve(master[0]), master[1])] = master
+        except socket.gaierror as e: results[master] = f"DNS resolution failed: {e}"
+    if not addr_to_master: return [], results
+
+    entries, seen = [], set()
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        if hasattr(socket, 'SIO_UDP_CONNRESET'):
+            try: client.ioctl(socket.SIO_UDP_CONNRESET, False)
+            except (OSError, ValueError): pass
+        client.bind(('', 0))
+        for addr, master in addr_to_master.items():
+            try: client.sendto(MASTER_QUERY, addr)
+            except socket.error as e: results[master] = str(e)
+        deadline = time.monotonic() + timeout
+        last_reply = None
+        while True:
+            now = time.monotonic()
+            all_answered = all(master in results for master in addr_to_master.values())
+            if now >= deadline or (all_answered and last_reply is not None and now - last_reply >= idle_timeout): break
+            client.settimeout(max(0.01, min(deadline - now, idle_timeout)))
+            try: msg, server_addr = client.recvfrom(MASTER_MAX_DATAGRAM)
+            except socket.timeout: continue
+            except ConnectionResetError: continue
+            master = addr_to_master.get(server_addr)
+            if master is None: continue
+            last_reply = time.monotonic()
+            decoded = decode_master_reply(msg)
+            results[master] = (results[master] if isinstance(results.get(master), int) else 0) + len(decoded)
+            for entry in decoded:
+                if entry[1] in IGNORED_SERVER_PORTS or entry in seen: continue
+                seen.add(entry)
+                entries.append(entry)
+    finally:
+        client.close()
+    for master in addr_to_master.values(): results.setdefault(master, "timeout")
+    return entries, results
+
+
+
+def scan_server_list(entries, probes=DEFAULT_PROBES_PER_SERVER, timeout=RTO_INITIAL, max_in_flight=None, stop_event=None, previous_records=None, pacer=None):
+    """Resolves and probes (address_or_hostname, port) entries, returning one ServerRecord per server in list order.
+
+    Hostnames are resolved up front (concurrently, through dns_resolver) and entries that
+    resolve to the same (ip, port) are probed once. `previous_records` ({key: ServerRecord},
+    e.g. from load_server_records) seeds the per-server RTT estimates and probe timeouts;
+    `timeout` applies to servers without an estimate and caps the others. `pacer` is
+    passed on to scan_servers.
+    """
+    previous_records = previous_records or {}
+    resolved_ips = dns_resolver.resolve_many(address_or_hostname for address_or_hostname, _ in entries)
+    display_names = {}
+    for address_or_hostname, port in entries:
+        display_names.setdefault((resolved_ips.get(address_or_hostname) or address_or_hostname, port), address_or_hostname)
+    timeouts = {key: min(timeout, probe_timeout(previous_records[key].rtt)) for key in display_names if key in previous_records}
+    results = scan_servers(list(display_names), 'status 31\0', timeout, None, stop_event, timeouts, probes, max_in_flight=max_in_flight, pacer=pacer)
+    records = []
+    for key, display_name in display_names.items():
+        if key not in results: continue
+        err, response, ping_time, ping_stats = results[key]
+        previous = previous_records.get(key)
+        rtt_state = next_rtt_state(previous.rtt if previous else None, err, ping_time)
+        records.append(ServerRecord.from_probe(key[0], key[1], previous.display_hostname if previous else display_name, err, response, ping_time, rtt_state, ping_stats))
+    return records
+
+# Sort keys of the server list columns, computed from the typed records instead of the display strings.
+SERVER_SORT_KEYS = {
+    'Name': lambda record: str(record.display_hostname).lower(),
+    'Port': lambda record: record.port,
+    'Ping': ping_sort_value,
+    'Map': lambda record: _or_na(record.map).lower(),
+    'Players': lambda record: record.players_count if record.players_count is not None else float('inf'),
+}
+
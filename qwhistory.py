@@ -0,0 +1,275 @@
+"""Ping history: every probe result appended to an embedded SQLite database, with hourly and daily rollups.
+
+PingHistoryStore.record() only copies the interesting fields of a ServerRecord onto a
+queue; a writer thread inserts them in batched transactions and folds each probe into
+the hourly/daily rollup rows (UPSERTs on their primary keys) in the same transaction.
+Raw probes and hourly rollups are pruned by age, daily rollups are kept. The query
+methods read the rollups or the (server_id, ts) index and take milliseconds even
+with weeks of history. The database runs in WAL mode, so reads never wait for the writer.
+"""
+import logging
+import queue
+import sqlite3
+import time
+from threading import Event, Lock, Thread, local
+
+logger = logging.getLogger(__name__)
+
+# Raised by the query methods; lets callers catch database errors without importing sqlite3 themselves.
+HistoryError = sqlite3.Error
+
+
+HISTORY_DB_FILE = 'ping_history.sqlite3'
+HISTORY_BATCH_SIZE = 500
+HISTORY_FLUSH_INTERVAL = 1.0
+HISTORY_PRUNE_INTERVAL = 3600.0
+HISTORY_RAW_RETENTION_DAYS = 7
+HISTORY_HOURLY_RETENTION_DAYS = 90
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS servers (
+    id INTEGER PRIMARY KEY,
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    UNIQUE (ip, port)
+);
+CREATE TABLE IF NOT EXISTS probes (
+    id INTEGER PRIMARY KEY,
+    server_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    rtt REAL,
+    loss REAL,
+    map TEXT,
+    players INTEGER,
+    spectators INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS probes_server_ts ON probes (server_id, ts);
+CREATE INDEX IF NOT EXISTS probes_ts ON probes (ts);
+CREATE TABLE IF NOT EXISTS probe_players (
+    probe_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    spectator INTEGER NOT NULL,
+    PRIMARY KEY (probe_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS probe_players_name ON probe_players (name);
+"""
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    server_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    answered INTEGER NOT NULL,
+    rtt_sum REAL NOT NULL,
+    rtt_min REAL,
+    rtt_max REAL,
+    loss_sum REAL NOT NULL,
+    players_sum INTEGER NOT NULL,
+    players_max INTEGER,
+    PRIMARY KEY (server_id, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS {table}_bucket ON {table} (bucket);
+"""
+ROLLUP_TABLES = (('rollup_hourly', 3600), ('rollup_daily', 86400))
+ROLLUP_UPSERT = """
+INSERT INTO {table} (server_id, bucket, samples, answered, rtt_sum, rtt_min, rtt_max, loss_sum, players_sum, players_max)
+VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (server_id, bucket) DO UPDATE SET
+    samples = samples + 1,
+    answered = answered + excluded.answered,
+    rtt_sum = rtt_sum + excluded.rtt_sum,
+    rtt_min = coalesce(min(rtt_min, excluded.rtt_min), rtt_min, excluded.rtt_min),
+    rtt_max = coalesce(max(rtt_max, excluded.rtt_max), rtt_max, excluded.rtt_max),
+    loss_sum = loss_sum + excluded.loss_sum,
+    players_sum = players_sum + excluded.players_sum,
+    players_max = coalesce(max(players_max, excluded.players_max), players_max, excluded.players_max)
+"""
+
+
+def probe_row(record, ts=None):
+    """The fields of one ServerRecord probe result that go into the history, as a plain tuple."""
+    stats = record.ping_stats or {}
+    players = tuple((player.name, player.is_spectator) for player in record.players)
+    return (
+        record.original_ip, record.port, time.time() if ts is None else ts, record.ping, stats.get('loss'), record.map,
+        record.players_count, record.spectators_count, record.error.value if record.error is not None else None, players
+    )
+
+
+class PingHistoryStore:
+    """Append-only probe history in SQLite, written from one background thread."""
+    _STOP = object()
+
+    def __init__(self, path=HISTORY_DB_FILE, raw_retention_days=HISTORY_RAW_RETENTION_DAYS, hourly_retention_days=HISTORY_HOURLY_RETENTION_DAYS):
+        self.path = path
+        self.raw_retention_days = raw_retention_days
+        self.hourly_retention_days = hourly_retention_days
+        self._queue = queue.Queue()
+        self._readers = local()
+        self._reader_connections = []  # Every thread's reader connection, so close() can close them all.
+        self._reader_lock = Lock()
+        self._server_ids = {}
+        self._opened = Event()
+        self._writer = Thread(target=self._writer_loop, name="PingHistoryWriter", daemon=True)
+        self._writer.start()
+
+    def _connect(self, check_same_thread=True):
+        connection = sqlite3.connect(self.path, timeout=10, check_same_thread=check_same_thread)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _create_schema(self, connection):
+        with connection:
+            connection.executescript(SCHEMA + ''.join(ROLLUP_SCHEMA.format(table=table) for table, _ in ROLLUP_TABLES))
+            connection.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    def record(self, record, ts=None):
+        """Queues one probe result (a ServerRecord); it is written within HISTORY_FLUSH_INTERVAL."""
+        self._queue.put(probe_row(record, ts))
+
+    def record_many(self, records, ts=None):
+        for record in records: self.record(record, ts)
+
+    def flush(self):
+        """Blocks until everything queued so far has been committed."""
+        self._queue.join()
+
+    def close(self):
+        """Writes what is still queued, stops the writer thread and closes the reader connections of all threads."""
+        self._queue.put(self._STOP)
+        self._writer.join(timeout=10)
+        with self._reader_lock: connections, self._reader_connections = self._reader_connections, []
+        for connection in connections: connection.close()
+        self._readers.connection = None
+
+    def _writer_loop(self):
+        try:
+            connection = self._connect()
+            self._create_schema(connection)
+            self._server_ids = dict(((ip, port), server_id) for server_id, ip, port in connection.execute('SELECT id, ip, port FROM servers'))
+        except sqlite3.Error as e:
+            logger.error(f"Ping history disabled, cannot open {self.path}: {e}")
+            self._opened.set()
+            while True:
+                item = self._queue.get(); self._queue.task_done()
+                if item is self._STOP: return
+        self._opened.set()
+        next_prune = time.monotonic()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + HISTORY_FLUSH_INTERVAL
+            while len(batch) < HISTORY_BATCH_SIZE and batch[-1] is not self._STOP:
+                try: batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty: break
+            if batch[-1] is self._STOP: running = False
+            rows = [row for row in batch if row is not self._STOP]
+            try:
+                if rows: self._write_batch(connection, rows)
+                if time.monotonic() >= next_prune or not running:
+                    self.prune(connection=connection)
+                    next_prune = time.monotonic() + HISTORY_PRUNE_INTERVAL
+            except sqlite3.Error as e:
+                logger.error(f"Error writing {len(rows)} probes to the ping history: {e}", exc_info=True)
+                self._server_ids = {}  # Ids assigned in the rolled back transaction are gone.
+            finally:
+                for _ in batch: self._queue.task_done()
+        connection.close()
+
+    def _server_id(self, connection, ip, port):
+        server_id = self._server_ids.get((ip, port))
+        if server_id is None:
+            connection.execute('INSERT OR IGNORE INTO servers (ip, port) VALUES (?, ?)', (ip, port))
+            server_id = self._server_ids[(ip, port)] = connection.execute('SELECT id FROM servers WHERE ip = ? AND port = ?', (ip, port)).fetchone()[0]
+        return server_id
+
+    def _write_batch(self, connection, rows):
+        with connection:
+            rollup_rows = []
+            for ip, port, ts, rtt, loss, map_name, players, spectators, error, player_names in rows:
+                server_id = self._server_id(connection, ip, port)
+                probe_id = connection.execute(
+                    'INSERT INTO probes (server_id, ts, rtt, loss, map, players, spectators, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (server_id, ts, rtt, loss, map_name, players, spectators, error)
+                ).lastrowid
+                if player_names:
+                    connection.executemany('INSERT OR IGNORE INTO probe_players (probe_id, name, spectator) VALUES (?, ?, ?)', [(probe_id, name, int(spectator)) for name, spectator in player_names])
+                answered = rtt is not None
+                rollup_rows.append((server_id, ts, int(answered), rtt or 0.0, rtt, rtt, loss or 0.0, (players or 0) if answered else 0, players if answered else None))
+            for table, width in ROLLUP_TABLES:
+                connection.executemany(ROLLUP_UPSERT.format(table=table), [(row[0], int(row[1] // width * width)) + row[2:] for row in rollup_rows])
+
+    def prune(self, now=None, connection=None):
+        """Drops raw probes older than raw_retention_days and hourly rollups older than hourly_retention_days."""
+        connection = connection or self._reader()
+        now = time.time() if now is None else now
+        raw_cutoff = now - self.raw_retention_days * 86400
+        with connection:
+            connection.execute('DELETE FROM probe_players WHERE probe_id IN (SELECT id FROM probes WHERE ts < ?)', (raw_cutoff,))
+            deleted = connection.execute('DELETE FROM probes WHERE ts < ?', (raw_cutoff,)).rowcount
+            connection.execute('DELETE FROM rollup_hourly WHERE bucket < ?', (now - self.hourly_retention_days * 86400,))
+        if deleted: print(f"Pruned {deleted} ping history entries older than {self.raw_retention_days} days.")
+
+    def _reader(self):
+        connection = getattr(self._readers, 'connection', None)
+        if connection is None:
+            self._opened.wait(10)
+            connection = self._readers.connection = self._connect(check_same_thread=False)  # Closed by close() from another thread.
+            with self._reader_lock: self._reader_connections.append(connection)
+        return connection
+
+    def _lookup_server_id(self, server_key):
+        server_id = self._server_ids.get(tuple(server_key))
+        if server_id is None:
+            row = self._reader().execute('SELECT id FROM servers WHERE ip = ? AND port = ?', tuple(server_key)).fetchone()
+            server_id = row[0] if row else None
+        return server_id
+
+    def average_ping(self, server_key, hours=24, now=None):
+        """Mean RTT in ms of the answered probes over the last `hours` (whole hours), or None."""
+        server_id = self._lookup_server_id(server_key)
+        if server_id is None: return None
+        since = int(((time.time() if now is None else now) - hours * 3600) // 3600 * 3600)
+        rtt_sum, answered = self._reader().execute(
+            'SELECT sum(rtt_sum), sum(answered) FROM rollup_hourly WHERE server_id = ? AND bucket >= ?', (server_id, since)
+        ).fetchone()
+        return rtt_sum / answered if answered else None
+
+    def average_pings(self, hours=24, now=None):
+        """{(ip, port): mean RTT in ms} for every server answering within the last `hours`."""
+        since = int(((time.time() if now is None else now) - hours * 3600) // 3600 * 3600)
+        rows = self._reader().execute(
+            'SELECT s.ip, s.port, sum(r.rtt_sum) / sum(r.answered) FROM rollup_hourly r INDEXED BY rollup_hourly_bucket JOIN servers s ON s.id = r.server_id '
+            'WHERE r.bucket >= ? GROUP BY r.server_id HAVING sum(r.answered) > 0', (since,)
+        )
+        return {(ip, port): rtt for ip, port, rtt in rows}
+
+    def peak_player_hours(self, server_key, days=30, top=3, now=None):
+        """The `top` local hours of the day with the most players on average, as [(hour, average players)]."""
+        server_id = self._lookup_server_id(server_key)
+        if server_id is None: return []
+        since = int((time.time() if now is None else now) - days * 86400)
+        rows = self._reader().execute(
+            "SELECT CAST(strftime('%H', bucket, 'unixepoch', 'localtime') AS INTEGER) AS hour, sum(players_sum) * 1.0 / sum(answered) AS average "
+            "FROM rollup_hourly WHERE server_id = ? AND bucket >= ? AND answered > 0 GROUP BY hour HAVING average > 0 ORDER BY average DESC LIMIT ?",
+            (server_id, since, top)
+        )
+        return [(hour, round(average, 1)) for hour, average in rows]
+
+    def ping_series(self, server_key, hours=24, now=None):
+        """Raw (timestamp, rtt or None, loss) samples of the last `hours`, oldest first."""
+        server_id = self._lookup_server_id(server_key)
+        if server_id is None: return []
+        since = (time.time() if now is None else now) - hours * 3600
+        return self._reader().execute('SELECT ts, rtt, loss FROM probes WHERE server_id = ? AND ts >= ? ORDER BY ts', (server_id, since)).fetchall()
+
+    def player_sightings(self, name, days=HISTORY_RAW_RETENTION_DAYS, now=None):
+        """[((ip, port), last seen timestamp)] of the servers `name` was seen on, most recent first."""
+        since = (time.time() if now is None else now) - days * 86400
+        rows = self._reader().execute(
+            'SELECT s.ip, s.port, max(p.ts) AS last_seen FROM probe_players pp JOIN probes p ON p.id = pp.probe_id JOIN servers s ON s.id = p.server_id '
+            'WHERE pp.name = ? AND p.ts >= ? GROUP BY p.server_id ORDER BY last_seen DESC', (name, since)
+        )
+        return [((ip, port), last_seen) for ip, port, last_seen in rows]
@@ -0,0 +1,110 @@
+"""Headless server scanner: probes a server list and writes the results as JSON or CSV to stdout.
+
+    python qwscan.py                                   # scan eu-sv.txt, JSON to stdout
+    python qwscan.py --url https://example.org/eu-sv.txt --format csv
+    python qwscan.py --masters --concurrency 200 --timeout 0.8 > scan.json
+    python qwscan.py --cache servers_cache.json --save-cache servers_cache.json
+    python qwscan.py --cache servers.qwsnap --format csv   # the GUI's saved server list
+    python qwscan.py --history ping_history.sqlite3 --format csv   # also append to the ping history
+
+Progress and warnings go to stderr, so stdout only carries the results. JSON output
+uses the servers_cache.json layout and can be fed back in with --cache.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import sys
+
+import requests
+
+from qwcore import (
+    RTO_INITIAL, DEFAULT_PROBES_PER_SERVER, HTTP_TIMEOUT, LOCAL_SERVER_LIST_FILE, MASTER_SERVER_PORT, DEFAULT_MASTER_SERVERS,
+    PACER_RATE, PACER_PER_IP_RATE, ProbePacer,
+    read_servers_from_file_raw, parse_server_list_lines, parse_address_list, query_master_servers,
+    save_server_records, scan_server_list
+)
+from qwhistory import PingHistoryStore
+from qwsnapshot import load_cache_records
+
+CSV_FIELDS = ('original_ip', 'port', 'display_hostname', 'ping', 'map', 'mode', 'players_count', 'spectators_count')
+
+
+def load_entries(args):
+    """Returns ((address_or_hostname, port) entries, {key: ServerRecord} from --cache) for the chosen source."""
+    if args.masters is not None:
+        masters = parse_address_list(args.masters, MASTER_SERVER_PORT)
+        entries, master_results = query_master_servers(masters)
+        for (host, port), result in master_results.items(): print(f"Master {host}:{port}: {result}")
+        return entries, {}
+    if args.cache:
+        records = load_cache_records(args.cache)
+        return list(records), records
+    if args.url:
+        response = requests.get(args.url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return parse_server_list_lines(response.text.splitlines()), {}
+    return read_servers_from_file_raw(args.list), {}
+
+
+def write_results(records, output_format, out):
+    if output_format == 'csv':
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        for record in records: writer.writerow(record.to_dict())
+    else:
+        json.dump([record.to_dict() for record in records], out, indent=2)
+        out.write('\n')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scan QuakeWorld servers without the GUI and print the results.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--list', default=LOCAL_SERVER_LIST_FILE, help=f"eu-sv.txt style host:port file (default: {LOCAL_SERVER_LIST_FILE})")
+    source.add_argument('--url', help="download the host:port list from this URL")
+    source.add_argument('--masters', nargs='?', const=DEFAULT_MASTER_SERVERS, help="query master servers (comma separated host[:port], default: the built-in list)")
+    source.add_argument('--cache', help="scan the servers in a servers.qwsnap snapshot or a servers_cache.json / favorites.json file, reusing its RTT estimates")
+    parser.add_argument('--format', choices=('json', 'csv'), default='json', help="output format (default: json)")
+    parser.add_argument('--concurrency', type=int, default=0, help="maximum probes in flight at once (default: 0, no limit)")
+    parser.add_argument('--timeout', type=float, default=RTO_INITIAL, help=f"per-probe timeout in seconds; with --cache, servers with an RTT estimate use a shorter one when it fits (default: {RTO_INITIAL})")
+    parser.add_argument('--rate', type=float, default=PACER_RATE, help=f"maximum probes per second, lowered automatically when loss rises (default: {PACER_RATE:g}, 0: no pacing)")
+    parser.add_argument('--per-ip-rate', type=float, default=PACER_PER_IP_RATE, help=f"maximum probes per second to one host (default: {PACER_PER_IP_RATE:g})")
+    parser.add_argument('--probes', type=int, default=DEFAULT_PROBES_PER_SERVER, help=f"probes per server (default: {DEFAULT_PROBES_PER_SERVER})")
+    parser.add_argument('--save-cache', metavar='FILE', help="also write the results to FILE in the servers_cache.json layout")
+    parser.add_argument('--history', metavar='FILE', help="also append the results to this ping history database (see qwhistory.py)")
+    args = parser.parse_args(argv)
+    if args.concurrency < 0: parser.error("--concurrency must be 0 or more")
+    if args.timeout <= 0: parser.error("--timeout must be positive")
+    if args.probes < 1: parser.error("--probes must be at least 1")
+    if args.rate < 0: parser.error("--rate must be 0 or more")
+    if args.per_ip_rate <= 0: parser.error("--per-ip-rate must be positive")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    with contextlib.redirect_stdout(sys.stderr):
+        try: entries, previous_records = load_entries(args)
+        except (OSError, ValueError, requests.exceptions.RequestException) as e: print(f"Could not load the server list: {e}"); return 1
+        if not entries: print("The server list is empty."); return 1
+        print(f"Scanning {len(entries)} servers ({args.probes} probes each, timeout {args.timeout}s, concurrency {args.concurrency or 'unlimited'}, rate {f'{args.rate:g}/s' if args.rate else 'unlimited'})...")
+        pacer = ProbePacer(args.rate or None, per_ip_rate=args.per_ip_rate) if args.rate else None
+        records = scan_server_list(entries, args.probes, args.timeout, args.concurrency or None, previous_records=previous_records, pacer=pacer)
+        if pacer is not None: print(f"Pacing: {pacer.describe()}.")
+        answered = sum(1 for record in records if record.ping is not None)
+        print(f"{answered} of {len(records)} servers answered.")
+        if args.save_cache:
+            try: save_server_records(records, args.save_cache)
+            except OSError as e: print(f"Error saving results to {args.save_cache}: {e}")
+        if args.history:
+            history = PingHistoryStore(args.history)
+            history.record_many(records)
+            history.close()
+    write_results(records, args.format, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Binary snapshot of the server list and favorites, replacing servers_cache.json + favorites.json.
+
+Layout (little-endian), version 1:
+    header     magic, version, CRC-32 of everything after the header, string count,
+               string table size, server count, favorite count
+    strings    end offset (in characters) of every pooled string, then the UTF-8 text
+               of all strings back to back; every hostname, map, mode and player block
+               is stored once and referenced by index
+    servers    one fixed-size SERVER struct per server, main list order first
+    favorites  server indices, in favorites order
+
+Each server is stored once: a favorite that is also in the main list is just its index,
+favorites that are not get their own entry without the LISTED flag. Players are kept as
+their 'status' reply lines and only parsed when a record's `players` is first read, so
+loading maps the file, decodes the string table in one call and unpacks the server
+structs without any per-field parsing. write_snapshot() goes through
+qwcore.write_file_atomically, so an interrupted save leaves the previous snapshot intact,
+and the CRC rejects a damaged file instead of loading garbage.
+
+    python qwsnapshot.py export   # servers.qwsnap -> servers_cache.json + favorites.json
+    python qwsnapshot.py import   # servers_cache.json + favorites.json -> servers.qwsnap
+"""
+import argparse
+import mmap
+import struct
+import sys
+import zlib
+
+from qwcore import (
+    FAVORITES_FILE, SERVERS_CACHE_FILE, ProbeError, ServerRecord,
+    load_server_records, save_server_records, write_file_atomically
+)
+
+SNAPSHOT_FILE = 'servers.qwsnap'
+SNAPSHOT_MAGIC = b'QWSNAP\r\n'
+SNAPSHOT_VERSION = 1
+
+HEADER = struct.Struct('<8sHHIIIII')
+# ip, hostname, error detail, map, mode, player lines (string indices); port, flags, error;
+# players, spectators; ping, srtt, rttvar, rto, min, median, p95, jitter, loss; probes sent, received
+SERVER = struct.Struct('<6IHBB2i9d2I')
+NO_STRING = 0xFFFFFFFF
+NAN = float('nan')
+
+LISTED, HAS_RTT, HAS_STATS = 1, 2, 4
+PROBE_ERRORS = tuple(ProbeError)
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this version can read, or it is damaged."""
+
+
+def _nan_if_none(value): return NAN if value is None else value
+def _none_if_nan(value): return None if value != value else value
+
+
+class _StringPool:
+    def __init__(self):
+        self.indices = {}
+        self.strings = []
+
+    def add(self, value):
+        if value is None: return NO_STRING
+        index = self.indices.get(value)
+        if index is None:
+            index = self.indices[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+def _pack_server(pool, record, flags):
+    rtt, stats = record.rtt or {}, record.ping_stats or {}
+    if record.rtt is not None: flags |= HAS_RTT
+    if record.ping_stats is not None: flags |= HAS_STATS
+    player_lines = record.player_lines()
+    return SERVER.pack(
+        pool.add(record.original_ip), pool.add(record.display_hostname), pool.add(record.error_detail or None),
+        pool.add(record.map), pool.add(record.mode), pool.add('\n'.join(player_lines) if player_lines else None),
+        record.port, flags, 0 if record.error is None else PROBE_ERRORS.index(record.error) + 1,
+        -1 if record.players_count is None else record.players_count, -1 if record.spectators_count is None else record.spectators_count,
+        _nan_if_none(record.ping), _nan_if_none(rtt.get('srtt')), _nan_if_none(rtt.get('rttvar')), _nan_if_none(rtt.get('rto')),
+        _nan_if_none(stats.get('min')), _nan_if_none(stats.get('median')), _nan_if_none(stats.get('p95')),
+        _nan_if_none(stats.get('jitter')), _nan_if_none(stats.get('loss')), stats.get('sent') or 0, stats.get('received') or 0
+    )
+
+
+def encode_snapshot(servers, favorites):
+    """Returns the snapshot bytes for ServerRecords in main list order and in favorites order."""
+    pool, packed, positions = _StringPool(), [], {}
+    for record in servers:
+        if record.key in positions: continue
+        positions[record.key] = len(packed)
+        packed.append(_pack_server(pool, record, LISTED))
+    favorite_indices = []
+    for record in favorites:
+        if record.key not in positions:
+            positions[record.key] = len(packed)
+            packed.append(_pack_server(pool, record, 0))
+        favorite_indices.append(positions[record.key])
+
+    ends, end = [], 0
+    for value in pool.strings:
+        end += len(value)
+        ends.append(end)
+    text = ''.join(pool.strings).encode('utf-8')
+    body = b''.join((struct.pack(f'<{len(ends)}I', *ends), text, *packed, struct.pack(f'<{len(favorite_indices)}I', *favorite_indices)))
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, zlib.crc32(body), len(ends), len(text), len(packed), len(favorite_indices))
+    return header + body
+
+
+def write_snapshot(file_path, servers, favorites):
+    """Atomically replaces file_path with a snapshot of `servers` and `favorites` (ServerRecords). Raises OSError."""
+    write_file_atomically(file_path, encode_snapshot(servers, favorites))
+
+
+def _unpack_server(strings, fields):
+    (ip, hostname, detail, map_name, mode, player_lines, port, flags, error,
+     players_count, spectators_count, ping, srtt, rttvar, rto, low, median, p95, jitter, loss, sent, received) = fields
+    # Built without __init__: the pooled strings are already shared between records, so there is nothing to intern.
+    record = ServerRecord.__new__(ServerRecord)
+    record.original_ip, record.port, record.display_hostname = strings[ip], port, strings[hostname]
+    record.ping = None if ping != ping else ping
+    record.error = PROBE_ERRORS[error - 1] if error else None
+    record.error_detail = '' if detail == NO_STRING else strings[detail]
+    record.map = None if map_name == NO_STRING else strings[map_name]
+    record.mode = None if mode == NO_STRING else strings[mode]
+    record.players_count = None if players_count < 0 else players_count
+    record.spectators_count = None if spectators_count < 0 else spectators_count
+    record.rtt = {'srtt': _none_if_nan(srtt), 'rttvar': _none_if_nan(rttvar), 'rto': _none_if_nan(rto)} if flags & HAS_RTT else None
+    record.ping_stats = {
+        'min': _none_if_nan(low), 'median': _none_if_nan(median), 'p95': _none_if_nan(p95), 'jitter': _none_if_nan(jitter),
+        'loss': _none_if_nan(loss), 'sent': sent, 'received': received
+    } if flags & HAS_STATS else None
+    record.defer_players(None if player_lines == NO_STRING else strings[player_lines].split('\n'))
+    return record
+
+
+def decode_snapshot(data):
+    """Decodes snapshot bytes (or any buffer) into ({key: ServerRecord} in list order, {key: ServerRecord} favorites).
+
+    Favorites that are also in the main list share its record object. Raises SnapshotError.
+    """
+    with memoryview(data) as view:
+        if len(view) < HEADER.size: raise SnapshotError("file is too short to be a snapshot")
+        magic, version, _, checksum, string_count, text_size, server_count, favorite_count = HEADER.unpack_from(view)
+        if magic != SNAPSHOT_MAGIC: raise SnapshotError("not a server list snapshot")
+        if version != SNAPSHOT_VERSION: raise SnapshotError(f"unsupported snapshot version {version}")
+        text_start = HEADER.size + 4 * string_count
+        servers_start = text_start + text_size
+        favorites_start = servers_start + SERVER.size * server_count
+        if len(view) != favorites_start + 4 * favorite_count: raise SnapshotError("snapshot is truncated or has trailing data")
+        if zlib.crc32(view[HEADER.size:]) != checksum: raise SnapshotError("snapshot checksum mismatch")
+
+        ends = struct.unpack_from(f'<{string_count}I', view, HEADER.size)
+        try: text = str(view[text_start:servers_start], 'utf-8')
+        except UnicodeDecodeError as e: raise SnapshotError(f"bad string table: {e}") from None
+        strings = [text[start:end] for start, end in zip((0,) + ends, ends)]
+        servers, records = {}, []
+        for fields in SERVER.iter_unpack(view[servers_start:favorites_start]):
+            record = _unpack_server(strings, fields)
+            records.append(record)
+            if fields[7] & LISTED: servers[record.key] = record
+        favorite_indices = struct.unpack_from(f'<{favorite_count}I', view, favorites_start)
+    if any(index >= server_count for index in favorite_indices): raise SnapshotError("favorite refers to a missing server")
+    favorites = {records[index].key: records[index] for index in favorite_indices}
+    return servers, favorites
+
+
+def read_snapshot(file_path):
+    """Memory-maps a snapshot file and decodes it (see decode_snapshot). Raises OSError or SnapshotError."""
+    with open(file_path, 'rb') as f:
+        try: mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: raise SnapshotError("snapshot file is empty") from None
+    try: return decode_snapshot(mapped)
+    finally: mapped.close()
+
+
+def is_snapshot_file(file_path):
+    """True if file_path starts with the snapshot magic. Raises OSError."""
+    with open(file_path, 'rb') as f: return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def load_cache_records(file_path):
+    """Loads the main list from either a snapshot or a servers_cache.json style file into {key: ServerRecord}."""
+    if is_snapshot_file(file_path): return read_snapshot(file_path)[0]
+    return load_server_records(file_path)
+
+
+def import_json(cache_path=SERVERS_CACHE_FILE, favorites_path=FAVORITES_FILE, snapshot_path=SNAPSHOT_FILE):
+    """Builds a snapshot from servers_cache.json and favorites.json; a missing favorites file means no favorites."""
+    servers = load_server_records(cache_path)
+    try: favorites = load_server_records(favorites_path)
+    except FileNotFoundError: favorites = {}
+    write_snapshot(snapshot_path, servers.values(), favorites.values())
+    return len(servers), len(favorites)
+
+
+def export_json(snapshot_path=SNAPSHOT_FILE, cache_path=SERVERS_CACHE_FILE, favorites_path=FAVORITES_FILE):
+    """Writes the snapshot back out as servers_cache.json and favorites.json."""
+    servers, favorites = read_snapshot(snapshot_path)
+    save_server_records(servers.values(), cache_path)
+    save_server_records(favorites.values(), favorites_path)
+    return len(servers), len(favorites)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between the binary server snapshot and the JSON cache/favorites files.")
+    parser.add_argument('command', choices=('import', 'export'), help="import: JSON -> snapshot, export: snapshot -> JSON")
+    parser.add_argument('--snapshot', default=SNAPSHOT_FILE, help=f"snapshot file (default: {SNAPSHOT_FILE})")
+    parser.add_argument('--cache', default=SERVERS_CACHE_FILE, help=f"server list JSON file (default: {SERVERS_CACHE_FILE})")
+    parser.add_argument('--favorites', default=FAVORITES_FILE, help=f"favorites JSON file (default: {FAVORITES_FILE})")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'import':
+            servers, favorites = import_json(args.cache, args.favorites, args.snapshot)
+            print(f"Wrote {servers} servers and {favorites} favorites to {args.snapshot}.")
+        else:
+            servers, favorites = export_json(args.snapshot, args.cache, args.favorites)
+            print(f"Wrote {servers} servers to {args.cache} and {favorites} favorites to {args.favorites}.")
+    except (OSError, ValueError) as e:
+        print(f"{args.command} failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())